@@ -0,0 +1,4 @@
+#!/bin/bash
+
+cd pera_fastapi
+celery --app=tasks.tasks:celery beat --loglevel=info --schedule=/var/lib/celery/celerybeat-schedule
\ No newline at end of file
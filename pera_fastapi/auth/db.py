@@ -1,23 +1,12 @@
 from typing import AsyncGenerator
 
 from fastapi import Depends
-from fastapi_users.db import SQLAlchemyBaseUserTableUUID, SQLAlchemyUserDatabase
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
-from pera_fastapi.settings import settings
-DATABASE_URL = 'mysql+aiomysql://{}:{}@{}:3306/{}'.format(settings.mysql_user,settings.mysql_password,settings.mysql_host,settings.mysql_database)
+from fastapi_users.db import SQLAlchemyUserDatabase
+from sqlalchemy.ext.asyncio import AsyncSession
+from pera_fastapi.models.database import SessionLocal, engine
 from pera_fastapi.models.models import Base, User
 
-# class Base(DeclarativeBase):
-#     pass
-
-
-# class User(SQLAlchemyBaseUserTableUUID, Base):
-#     pass
-
-
-engine = create_async_engine(DATABASE_URL)
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+async_session_maker = SessionLocal
 
 
 async def create_db_and_tables():
@@ -30,4 +19,4 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
-    yield SQLAlchemyUserDatabase(session, User)
\ No newline at end of file
+    yield SQLAlchemyUserDatabase(session, User)
@@ -0,0 +1,30 @@
+"""
+This module contains the authentication of the internal endpoints called by the Celery workers.
+
+Workers running in HTTP mode send `settings.worker_api_token` in the `X-Worker-Token` header. The
+endpoints handing out or replacing account secrets (Telegram sessions, account credentials) require
+it, and refuse every request while no token is configured.
+"""
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from pera_fastapi.settings import settings
+
+WORKER_TOKEN_HEADER = "X-Worker-Token"
+
+
+async def require_worker(token: Optional[str] = Header(default=None, alias=WORKER_TOKEN_HEADER)):
+    """
+    Check that a request comes from a worker.
+
+    Args:
+        token (Optional[str]): The worker token sent with the request.
+
+    Raises:
+        HTTPException: 403 if no worker token is configured or the request does not carry it.
+    """
+    expected = settings.worker_api_token
+    if not expected or token is None or not secrets.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Worker token required')
@@ -0,0 +1,34 @@
+"""
+This module contains the Redis keys shared by the API routes and the Celery workers.
+
+The routes invalidate cache entries that the workers fill, so both sides build the keys here instead
+of the routes importing the worker modules, and Telethon with them.
+"""
+MESSAGE_KEY_PREFIX = "pera:message:"
+MEDIA_KEY_PREFIX = "pera:media:"
+
+
+def message_key(id_group_senders: int) -> str:
+    """
+    Get the Redis key of the parsed message of a campaign.
+
+    Args:
+        id_group_senders (int): The ID of the group sender the message belongs to.
+
+    Returns:
+        str: The Redis key.
+    """
+    return f"{MESSAGE_KEY_PREFIX}{id_group_senders}"
+
+
+def media_info_key(id_media: int) -> str:
+    """
+    Get the Redis key of the cached details of a media file.
+
+    Args:
+        id_media (int): The ID of the media file.
+
+    Returns:
+        str: The Redis key.
+    """
+    return f"{MEDIA_KEY_PREFIX}info:{id_media}"
@@ -0,0 +1,174 @@
+"""
+This module contains the row counters behind the count endpoints.
+
+Counts are computed with SQL `COUNT(*)` instead of loading every row. The unfiltered count of a
+table is also kept in Redis under `pera:count:<table>`: it is filled from `COUNT(*)` on a miss,
+moved by the code inserting or deleting rows, and reset from `COUNT(*)` by `tasks.reconcile_counters`
+every `settings.counter_reconcile_interval` seconds, which also corrects the rows removed by
+cascades or by hand. A count endpoint without filters is then a single Redis read.
+
+A counter is only moved while it exists, so a miss is always refilled from the database. Filtered
+counts (status, category, account) always run `COUNT(*)` on the filtered columns.
+"""
+import logging
+from typing import Dict, Optional
+
+from redis import asyncio as aioredis
+from sqlalchemy import func, select
+
+from pera_fastapi.models import models
+from pera_fastapi.redis_client import get_async_redis, r
+from pera_fastapi.settings import settings
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEY_PREFIX = "pera:count:"
+
+# Moves the counter in KEYS[1] by ARGV[1] when it exists; a missing counter is refilled from the database.
+INCR_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+COUNTED_MODELS = (models.Group, models.Tasks)
+
+
+def counter_key(model) -> str:
+    """
+    Get the Redis key of the row counter of a table.
+
+    Args:
+        model: The model of the table.
+
+    Returns:
+        str: The Redis key.
+    """
+    return f"{COUNTER_KEY_PREFIX}{model.__tablename__}"
+
+
+async def count_rows(db, model, *conditions) -> int:
+    """
+    Count the rows of a table with SQL `COUNT(*)`.
+
+    Args:
+        db: The database session.
+        model: The model of the table.
+        *conditions: The filters of the count.
+
+    Returns:
+        int: The number of rows.
+    """
+    statement = select(func.count()).select_from(model)
+    if conditions:
+        statement = statement.where(*conditions)
+    return await db.scalar(statement)
+
+
+async def get_count(db, model, *conditions, redis: Optional[aioredis.Redis] = None) -> int:
+    """
+    Get the number of rows of a table, from the cached counter when there is no filter.
+
+    Args:
+        db: The database session.
+        model: The model of the table.
+        *conditions: The filters of the count.
+        redis (Optional[aioredis.Redis]): The Redis client, the shared asyncio client by default.
+
+    Returns:
+        int: The number of rows.
+    """
+    if conditions:
+        return await count_rows(db, model, *conditions)
+    redis = redis or get_async_redis()
+    key = counter_key(model)
+    try:
+        cached = await redis.get(key)
+        if cached is not None:
+            return int(cached)
+    except Exception as e:
+        logger.warning("Counter read failed for %s: %s", key, e)
+        return await count_rows(db, model)
+    count = await count_rows(db, model)
+    try:
+        await redis.set(key, count, ex=settings.counter_ttl, nx=True)
+    except Exception as e:
+        logger.warning("Counter write failed for %s: %s", key, e)
+    return count
+
+
+async def incr_count(model, amount: int = 1, redis: Optional[aioredis.Redis] = None):
+    """
+    Move the cached counter of a table after rows were inserted or deleted.
+
+    Args:
+        model: The model of the table.
+        amount (int): The rows inserted, negative for deleted rows.
+        redis (Optional[aioredis.Redis]): The Redis client, the shared asyncio client by default.
+    """
+    redis = redis or get_async_redis()
+    try:
+        await redis.eval(INCR_IF_EXISTS_SCRIPT, 1, counter_key(model), amount)
+    except Exception as e:
+        logger.warning("Counter update failed for %s: %s", counter_key(model), e)
+
+
+def incr_count_sync(model, amount: int = 1):
+    """
+    Synchronous version of `incr_count`, used by the Celery workers.
+
+    Args:
+        model: The model of the table.
+        amount (int): The rows inserted, negative for deleted rows.
+    """
+    try:
+        r.eval(INCR_IF_EXISTS_SCRIPT, 1, counter_key(model), amount)
+    except Exception as e:
+        logger.warning("Counter update failed for %s: %s", counter_key(model), e)
+
+
+async def count_tables(db) -> Dict[str, int]:
+    """
+    Count the rows of every table with a cached counter.
+
+    Args:
+        db: The database session.
+
+    Returns:
+        Dict[str, int]: The number of rows keyed by table name.
+    """
+    return {model.__tablename__: await count_rows(db, model) for model in COUNTED_MODELS}
+
+
+async def reconcile_counters(db, redis: Optional[aioredis.Redis] = None) -> Dict[str, int]:
+    """
+    Reset every cached counter from SQL `COUNT(*)`.
+
+    Args:
+        db: The database session.
+        redis (Optional[aioredis.Redis]): The Redis client, the shared asyncio client by default.
+
+    Returns:
+        Dict[str, int]: The number of rows keyed by table name.
+    """
+    redis = redis or get_async_redis()
+    counts = await count_tables(db)
+    pipe = redis.pipeline()
+    for table, count in counts.items():
+        pipe.set(f"{COUNTER_KEY_PREFIX}{table}", count, ex=settings.counter_ttl)
+    await pipe.execute()
+    return counts
+
+
+def store_counts_sync(counts: Dict[str, int]):
+    """
+    Synchronous counterpart of the write done by `reconcile_counters`, used by the Celery workers.
+
+    Args:
+        counts (Dict[str, int]): The number of rows keyed by table name.
+    """
+    pipe = r.pipeline()
+    for table, count in counts.items():
+        pipe.set(f"{COUNTER_KEY_PREFIX}{table}", count, ex=settings.counter_ttl)
+    pipe.execute()
@@ -11,7 +11,8 @@ from fastapi_users import FastAPIUsers
 from sqlalchemy.orm import Session
 from .models import models
 from .models.database import engine, get_db
-from .routes import account_router,group_router,history_routes,group_senders_router,tasks_router
+from .routes import account_router,group_router,history_routes,group_senders_router,tasks_router,media_router,stats_router
+from .routes.pagination import keyset_page, offset_page
 from fastapi.middleware.cors import CORSMiddleware
 
 from .auth.db import User, create_db_and_tables
@@ -113,6 +114,18 @@ app.include_router(
     # dependencies=[Depends(current_active_user)]
     )
 
+app.include_router(
+    media_router.router, 
+    prefix="/api/telegram", 
+    tags=["media"],
+    )
+
+app.include_router(
+    stats_router.router, 
+    prefix="/api/telegram", 
+    tags=["stats"],
+    )
+
 app.include_router(
     router_tasks, prefix="/tasks",
     tags=["tasks"],
@@ -157,10 +170,8 @@ async def websocket_endpoint(websocket: WebSocket, db: DBD):
 
             pag = data_json.get('pag')
             per_page = data_json.get('per_page')
-
-            if not isinstance(pag, int) or pag < 1:
-                await websocket.send_text("Invalid 'pag' value. Expected a positive integer.")
-                continue
+            after = data_json.get('after')
+            before = data_json.get('before')
 
             if per_page is None:
                 per_page = 10
@@ -168,10 +179,29 @@ async def websocket_endpoint(websocket: WebSocket, db: DBD):
                 await websocket.send_text("Invalid 'per_page' value. Expected a positive integer.")
                 continue
 
-            select_task = select(models.Tasks).order_by(desc(models.Tasks.id))
+            # Cursor mode: {"after": <next_cursor>} or {"before": <prev_cursor>}, or neither for the first page.
+            if pag is None:
+                if any(cursor is not None and not isinstance(cursor, str) for cursor in (after, before)):
+                    await websocket.send_text("Invalid 'after' or 'before' value. Expected a cursor string.")
+                    continue
+                try:
+                    page = await keyset_page(db, select(models.Tasks), models.Tasks.id, per_page, after, before)
+                except HTTPException as e:
+                    await websocket.send_text(str(e.detail))
+                    continue
+                page["items"] = [task_to_dict(task) for task in page["items"]]
+                await websocket.send_json(page)
+                continue
 
-            result = await db.execute(select_task.offset((pag - 1) * per_page).limit(per_page))
-            task_data = result.scalars().all()
+            if not isinstance(pag, int) or pag < 1:
+                await websocket.send_text("Invalid 'pag' value. Expected a positive integer.")
+                continue
+
+            try:
+                task_data = await offset_page(db, models.Tasks, pag, per_page)
+            except HTTPException as e:
+                await websocket.send_text(str(e.detail))
+                continue
 
             if not task_data:
                 await websocket.close(code=1000)
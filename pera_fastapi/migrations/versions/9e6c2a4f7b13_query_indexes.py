@@ -0,0 +1,66 @@
+"""Query indexes
+
+Indexes chosen from the filters of the hot endpoints:
+
+- history: the account listing and keyset pages (`id_account`), the campaign listing and its
+  status counts (`id_group_sender, status`), the status filter (`status`), the created_at range
+  filter and the rollup lag scan (`created_at`);
+- tasks: the stop and status callbacks by Celery task ID (`task_id`), the campaign callbacks and
+  the running check (`id_group_sender, status`), the running campaigns and counts (`status`);
+- group_senders: the campaigns of an account (`id_account, status`);
+- groups: the category filter (`category`).
+
+Every InnoDB secondary index ends with the primary key, so the `WHERE <filter> ORDER BY id`
+keyset pages read the index in order without a filesort. The composite indexes on
+`history.id_group_sender`, `tasks.id_group_sender` and `group_senders.id_account` replace the
+indexes MySQL created for their foreign keys.
+
+Revision ID: 9e6c2a4f7b13
+Revises: 5d8b1f3e9a27
+Create Date: 2026-10-18 18:40:12.113504
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e6c2a4f7b13'
+down_revision: Union[str, None] = '5d8b1f3e9a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_history_account', 'history', ['id_account'], unique=False)
+    op.create_index('ix_history_group_sender_status', 'history', ['id_group_sender', 'status'], unique=False)
+    op.create_index('ix_history_status', 'history', ['status'], unique=False)
+    op.create_index('ix_history_created_at', 'history', ['created_at'], unique=False)
+    op.create_index('ix_tasks_task_id', 'tasks', ['task_id'], unique=False)
+    op.create_index('ix_tasks_group_sender_status', 'tasks', ['id_group_sender', 'status'], unique=False)
+    op.create_index('ix_tasks_status', 'tasks', ['status'], unique=False)
+    op.create_index('ix_group_senders_account_status', 'group_senders', ['id_account', 'status'], unique=False)
+    op.create_index('ix_groups_category', 'groups', ['category'], unique=False)
+
+
+# The indexes that replaced the foreign key indexes created by MySQL, with their foreign key column.
+FOREIGN_KEY_INDEXES = (
+    ('history', 'id_account', 'ix_history_account'),
+    ('history', 'id_group_sender', 'ix_history_group_sender_status'),
+    ('tasks', 'id_group_sender', 'ix_tasks_group_sender_status'),
+    ('group_senders', 'id_account', 'ix_group_senders_account_status'),
+)
+
+
+def downgrade() -> None:
+    # MySQL refuses to drop the only index of a foreign key: put back the plain index it had created first.
+    for table, column, index in FOREIGN_KEY_INDEXES:
+        op.create_index(column, table, [column], unique=False)
+        op.drop_index(index, table_name=table)
+    op.drop_index('ix_groups_category', table_name='groups')
+    op.drop_index('ix_tasks_status', table_name='tasks')
+    op.drop_index('ix_tasks_task_id', table_name='tasks')
+    op.drop_index('ix_history_created_at', table_name='history')
+    op.drop_index('ix_history_status', table_name='history')
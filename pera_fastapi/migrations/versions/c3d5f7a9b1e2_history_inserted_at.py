@@ -0,0 +1,29 @@
+"""History insert time
+
+`history.inserted_at` is set by MySQL when the row is inserted, unlike `created_at` which the
+worker sets when it buffers the record. The rollup lag is measured on it.
+
+Revision ID: c3d5f7a9b1e2
+Revises: 9e6c2a4f7b13
+Create Date: 2026-10-18 21:12:37.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d5f7a9b1e2'
+down_revision: Union[str, None] = '9e6c2a4f7b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('history', sa.Column('inserted_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('history', 'inserted_at')
@@ -1,26 +1,43 @@
 """This module contains the database configuration and connection setup for the application.
 
-It defines the database engine, sessionmaker, and AsyncSession for the application to connect to the MySQL database.
-It also provides an async context manager function to get a database session for performing database operations.
+It defines the single async engine of the process and its session factory, shared by the routes,
+the authentication backend (`auth/db.py`) and the Celery workers (`tasks/worker_db.py`), and an
+async generator to get a database session for performing database operations.
+
+Every process (each uvicorn worker and each Celery child) holds at most
+`settings.db_pool_size + settings.db_max_overflow` connections, so the processes of all the
+services together must stay under the MySQL `max_connections`. Connections are checked before use
+and recycled after `settings.db_pool_recycle` seconds, before MySQL closes them as idle.
 """
-import dataclasses
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from typing import AsyncGenerator, Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from pera_fastapi.settings import settings
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+DATABASE_URL = "mysql+aiomysql://{}:{}@{}:{}/{}".format(
+    settings.mysql_user,
+    settings.mysql_password,
+    settings.mysql_host,
+    settings.mysql_port,
+    settings.mysql_database,
+)
 
 engine = create_async_engine(
-    f"mysql+aiomysql://{settings.mysql_user}:{settings.mysql_password}@{settings.mysql_host}:3306/{settings.mysql_database}"
+    DATABASE_URL,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=True,
 )
 
-SessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 Base = declarative_base()
 
-from contextlib import asynccontextmanager
 
-async def get_db() -> AsyncSession:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Get an AsyncSession object to perform database operations.
 
     Returns:
@@ -31,3 +48,19 @@ async def get_db() -> AsyncSession:
         yield db
     finally:
         await db.close()
+
+
+def pool_stats() -> Dict[str, int]:
+    """Get the connection counters of the engine pool of this process.
+
+    Returns:
+        Dict[str, int]: The pool size and overflow limit, and the connections idle, in use and in overflow.
+    """
+    pool = engine.sync_engine.pool
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.db_max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+    }
@@ -3,8 +3,9 @@ import dataclasses
 from sqlalchemy import Column, Integer, String,DateTime,JSON,MetaData,ForeignKey
 from pera_fastapi.models.database import Base
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Boolean, Table,TIMESTAMP
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Boolean, Table,TIMESTAMP, Float, LargeBinary, Text, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql import text
 from pera_fastapi.models.database import Base
 from datetime import datetime
 from fastapi_users.db import SQLAlchemyBaseUserTableUUID, SQLAlchemyUserDatabase
@@ -31,6 +32,8 @@ class Group(Base):
     category = Column(String(30))
     history = relationship("History", back_populates="group")
 
+    __table_args__ = (Index('ix_groups_category', 'category'),)
+
 
 class Account(Base):
     """
@@ -42,6 +45,7 @@ class Account(Base):
         phone (str): The phone number associated with the account.
         telegram_hash (str): The Telegram hash associated with the account.
         username (str): The username associated with the account.
+        rate_limit (float): The maximum messages per minute sent by the account, None for the default.
     """    
     __tablename__ = 'accounts'
     metadata = metadata
@@ -51,9 +55,27 @@ class Account(Base):
     phone = Column(String(120),unique=True)
     username = Column(String(120),unique=True)
     status = Column(String(30))
+    rate_limit = Column(Float, nullable=True)
     group_senders = relationship("Group_Senders", back_populates="account")
     history = relationship("History", back_populates="account")
 
+class TelegramSession(Base):
+    """
+    Represents the stored Telegram session of an account.
+
+    Attributes:
+        id (int): The unique identifier for the session.
+        id_account (int): The ID of the account the session belongs to.
+        data (str): The Fernet-encrypted session and entities.
+        updated_at (str): The date and time the session was last stored.
+    """
+    __tablename__ = 'telegram_sessions'
+    metadata = metadata
+    id = Column(Integer, primary_key=True)
+    id_account = Column(Integer, ForeignKey('accounts.id'), unique=True)
+    data = Column(Text(length=2**24 - 1))
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
 class History(Base):
     """
     Represents a history record in the database.
@@ -64,6 +86,8 @@ class History(Base):
         id_account (int): The identifier for the account associated with the history record.
         status (str): The status of the history record.
         created_at (str): The date and time when the history record was created.
+        inserted_at (str): The date and time MySQL inserted the history record, which may be much
+            later than created_at for records buffered or retried by a worker.
     """
     __tablename__ = 'history'
     metadata = metadata
@@ -76,6 +100,15 @@ class History(Base):
     group_sender = relationship("Group_Senders", back_populates="history")
     status = Column(String(30))
     created_at = Column(DateTime, default=datetime.now)
+    inserted_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP'))
+
+    # The implicit primary key suffix of every index serves the `ORDER BY id` keyset pages.
+    __table_args__ = (
+        Index('ix_history_account', 'id_account'),
+        Index('ix_history_group_sender_status', 'id_group_sender', 'status'),
+        Index('ix_history_status', 'status'),
+        Index('ix_history_created_at', 'created_at'),
+    )
 
 
 class Group_Senders(Base):
@@ -88,6 +121,7 @@ class Group_Senders(Base):
         group_list (str): A comma-separated list of sender email addresses.
         status (str): The status of the group.
         created_at (str): The date and time the group was created.
+        id_media (int): The ID of the media file sent with the message, if any.
     """
     __tablename__ = 'group_senders'
     metadata = metadata
@@ -101,8 +135,38 @@ class Group_Senders(Base):
     delay = Column(Integer)
     created_at = Column(DateTime, default=datetime.now)
     stopped_at = Column(DateTime)
+    id_media = Column(Integer, ForeignKey('media.id'), nullable=True)
+    media = relationship("Media", back_populates="group_senders")
     history = relationship("History", back_populates="group_sender")
     tasks = relationship("Tasks", back_populates="group_sender")
+
+    __table_args__ = (Index('ix_group_senders_account_status', 'id_account', 'status'),)
+
+class Media(Base):
+    """
+    Represents a media file attached to campaigns.
+
+    Attributes:
+        id (int): The unique identifier for the media file.
+        name (str): The file name.
+        mime_type (str): The MIME type of the file.
+        size (int): The size of the file in bytes.
+        sha256 (str): The SHA-256 digest of the file, which changes when the file is replaced.
+        data (bytes): The file content, only loaded when accessed.
+        created_at (str): The date and time the file was uploaded.
+        updated_at (str): The date and time the file was last replaced.
+    """
+    __tablename__ = 'media'
+    metadata = metadata
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255))
+    mime_type = Column(String(100))
+    size = Column(Integer)
+    sha256 = Column(String(64))
+    data = deferred(Column(LargeBinary(length=2**32 - 1)))
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime)
+    group_senders = relationship("Group_Senders", back_populates="media")
     
 class User(SQLAlchemyBaseUserTableUUID, Base):
     metadata = metadata
@@ -129,4 +193,92 @@ class Tasks(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime)
     stopped_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_tasks_task_id', 'task_id'),
+        Index('ix_tasks_group_sender_status', 'id_group_sender', 'status'),
+        Index('ix_tasks_status', 'status'),
+    )
     
+
+class Schedule(Base):
+    """
+    Represents the schedule of a recurring campaign.
+
+    Attributes:
+        id (int): The unique identifier for the schedule.
+        id_group_sender (int): The ID of the group sender run by the schedule.
+        interval_seconds (int): The seconds between two runs.
+        remaining_runs (int): The runs left, None to run until the schedule is paused or deleted.
+        next_run_at (str): The date and time of the next run.
+        status (str): The status of the schedule, 'active', 'paused' or 'finished'.
+        last_run_at (str): The date and time of the last run.
+        last_task_id (str): The task ID of the last run.
+        created_at (str): The date and time the schedule was created.
+    """
+    __tablename__ = 'campaign_schedules'
+    metadata = metadata
+    id = Column(Integer, primary_key=True)
+    id_group_sender = Column(Integer, ForeignKey('group_senders.id'), unique=True)
+    group_sender = relationship("Group_Senders")
+    interval_seconds = Column(Integer)
+    remaining_runs = Column(Integer, nullable=True)
+    next_run_at = Column(DateTime)
+    status = Column(String(30))
+    last_run_at = Column(DateTime)
+    last_task_id = Column(String(250))
+    created_at = Column(DateTime, default=datetime.now)
+
+    # The dispatcher scans `status = 'active' AND next_run_at <= now()` in next_run_at order.
+    __table_args__ = (Index('ix_campaign_schedules_due', 'status', 'next_run_at'),)
+
+
+class HistoryRollup(Base):
+    """
+    Represents the delivery counters of one account, group and group sender over one hour.
+
+    Attributes:
+        id (int): The unique identifier for the rollup.
+        bucket (str): The start of the hour the counters cover.
+        id_account (int): The ID of the sending account.
+        id_group (int): The ID of the destination group.
+        id_group_sender (int): The ID of the group sender.
+        success (int): The messages sent.
+        failed (int): The messages that could not be sent.
+        skipped (int): The groups skipped as unavailable.
+        total (int): Every history record, whatever its status.
+    """
+    __tablename__ = 'history_rollups'
+    metadata = metadata
+    id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, nullable=False)
+    id_account = Column(Integer)
+    id_group = Column(Integer)
+    id_group_sender = Column(Integer)
+    success = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    skipped = Column(Integer, default=0, nullable=False)
+    total = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('bucket', 'id_account', 'id_group', 'id_group_sender', name='uq_history_rollups_key'),
+        Index('ix_history_rollups_account_bucket', 'id_account', 'bucket'),
+        Index('ix_history_rollups_group_sender_bucket', 'id_group_sender', 'bucket'),
+        Index('ix_history_rollups_group_bucket', 'id_group', 'bucket'),
+    )
+
+
+class RollupWatermark(Base):
+    """
+    Represents the high-water mark of an incremental rollup job.
+
+    Attributes:
+        name (str): The name of the rollup.
+        last_id (int): The ID of the last source row included in the rollup.
+        updated_at (str): The date and time the rollup last moved forward.
+    """
+    __tablename__ = 'rollup_watermarks'
+    metadata = metadata
+    name = Column(String(50), primary_key=True)
+    last_id = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime)
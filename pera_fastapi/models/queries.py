@@ -0,0 +1,132 @@
+"""
+This module contains the campaign queries shared by the API routes and the Celery workers.
+
+The routes run them on the request session and `tasks/worker_db.py` on its own sessions, so both
+sides finish campaigns and list the running ones the same way without the workers importing the routes.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pera_fastapi.models import models
+from pera_fastapi.models.schemas import StatusAccount, StatusGroupSenders, StatusSchedule, StatusTasks
+
+
+async def get_running_campaigns(db: AsyncSession, limit: int = 10) -> List[Dict]:
+    """
+    Get the campaigns with a running task and the account sending them.
+
+    Args:
+        db (AsyncSession): The database session.
+        limit (int): The maximum number of campaigns.
+
+    Returns:
+        List[Dict]: The ID and group list of every campaign, with its account credentials.
+    """
+    result = await db.execute(
+        select(models.Group_Senders.id, models.Group_Senders.group_list, models.Account)
+        .join(models.Tasks, models.Tasks.id_group_sender == models.Group_Senders.id)
+        .join(models.Account, models.Account.id == models.Group_Senders.id_account)
+        .where(models.Tasks.status == StatusTasks.running.value)
+        .distinct()
+        .limit(limit)
+    )
+    return [
+        {
+            "id_group_sender": id_group_sender,
+            "group_list": group_list or [],
+            "account": {
+                "id": account.id,
+                "telegram_id": account.telegram_id,
+                "telegram_hash": account.telegram_hash,
+                "phone": account.phone,
+            },
+        }
+        for id_group_sender, group_list, account in result.all()
+    ]
+
+
+async def finish_group_sender(id_group_sender: int, task_status: str, db: AsyncSession, id_account: Optional[int] = None):
+    """
+    Mark a group sender as finished, its account as inactive and its tasks with `task_status`, in one transaction.
+
+    Args:
+        id_group_sender (int): The ID of the group sender.
+        task_status (str): The final status of the tasks.
+        db (AsyncSession): The database session.
+        id_account (int, optional): The account to mark as inactive, by default the account of the group sender.
+
+    Returns:
+        bool: False when the group sender does not exist.
+    """
+    now = datetime.now()
+    result = await db.execute(
+        update(models.Group_Senders)
+        .where(models.Group_Senders.id == id_group_sender)
+        .values(status=StatusGroupSenders.finished.value, stopped_at=now)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        return False
+    if id_account is None:
+        id_account = (
+            select(models.Group_Senders.id_account)
+            .where(models.Group_Senders.id == id_group_sender)
+            .scalar_subquery()
+        )
+    await db.execute(
+        update(models.Account)
+        .where(models.Account.id == id_account)
+        .values(status=StatusAccount.inactive.value)
+    )
+    await db.execute(
+        update(models.Tasks)
+        .where(models.Tasks.id_group_sender == id_group_sender)
+        .values(status=task_status, stopped_at=now)
+    )
+    await db.commit()
+    return True
+
+
+async def finish_scheduled_run(id_group_sender: int, task_id: str, task_status: str, db: AsyncSession, id_account: Optional[int] = None):
+    """
+    Mark one run of a recurring campaign as finished, and the campaign when its schedule is over.
+
+    Args:
+        id_group_sender (int): The ID of the group sender of the campaign.
+        task_id (str): The task ID of the run.
+        task_status (str): The final status of the run.
+        db (AsyncSession): The database session.
+        id_account (int, optional): The account to mark as inactive, by default the account of the group sender.
+
+    Returns:
+        bool: False when the task of the run does not exist.
+    """
+    result = await db.execute(
+        update(models.Tasks)
+        .where(models.Tasks.task_id == task_id)
+        .values(status=task_status, stopped_at=datetime.now())
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        return False
+    schedule_status = await db.scalar(
+        select(models.Schedule.status).where(models.Schedule.id_group_sender == id_group_sender)
+    )
+    if schedule_status in (None, StatusSchedule.finished.value):
+        return await finish_group_sender(id_group_sender, task_status, db, id_account)
+    if id_account is None:
+        id_account = (
+            select(models.Group_Senders.id_account)
+            .where(models.Group_Senders.id == id_group_sender)
+            .scalar_subquery()
+        )
+    await db.execute(
+        update(models.Account)
+        .where(models.Account.id == id_account)
+        .values(status=StatusAccount.inactive.value)
+    )
+    await db.commit()
+    return True
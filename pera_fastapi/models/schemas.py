@@ -31,12 +31,23 @@ class AccountBase(BaseModel):
         telegram_hash (str): The Telegram hash of the account.
         phone (str): The phone number of the account.
         username (str): The username of the account.
+        rate_limit (float, optional): The maximum messages per minute sent by the account.
     """
     telegram_id: int
     telegram_hash: str
     phone: str
     username: str
     status: str = Field(default=StatusAccount.inactive, description="The status of the account. Can be 'inactive', 'active'.")
+    rate_limit: Optional[float] = Field(default=None, gt=0, description="The maximum messages per minute sent by the account. Uses the default limit when empty.")
+
+class TelegramSessionBase(BaseModel):
+    """
+    Represents the stored Telegram session of an account.
+
+    Attributes:
+        data (str): The Fernet-encrypted session and entities.
+    """
+    data: str
 
 class StatusHistory(str, Enum):
     """
@@ -45,6 +56,7 @@ class StatusHistory(str, Enum):
     pending = "pending"
     success = "success"
     failed = "failed"
+    skipped = "skipped"
 
 class HistoryBase(BaseModel):
     """
@@ -59,8 +71,8 @@ class HistoryBase(BaseModel):
     id_group: int
     id_account: int
     id_group_sender: int
-    status: str = Field(default=StatusHistory.pending, description="The status of the history record. Can be 'pending', 'success', 'failed'.")
-    created_at: datetime = Field(default=datetime.now(), description="The date and time when the history record was created.")
+    status: str = Field(default=StatusHistory.pending, description="The status of the history record. Can be 'pending', 'success', 'failed', 'skipped'.")
+    created_at: datetime = Field(default_factory=datetime.now, description="The date and time when the history record was created.")
 
 class StatusGroupSenders(str, Enum):
     """
@@ -112,8 +124,37 @@ class GroupsSendersSelectBase(BaseModel):
     status: str = Field(default=StatusGroupSenders.sending, description="The status of the group of senders. Can be 'sending', 'finished'.")
     delay: int = Field(default=12, description="The delay between messages in hours.")
     created_at: datetime = Field(default=datetime.now(), description="The date and time when the group of senders was created.")
+    id_media: Optional[int] = Field(default=None, description="The ID of the media file sent with the message, the message becomes its caption.")
     # stopped_at: Optional[datetime] = Field(default=None, description="The date and time when the group of senders was stopped.")
 
+class GroupsSendersShardedBase(GroupsSendersSelectBase):
+    """
+    Represents a group of senders delivered by several accounts in parallel.
+
+    Attributes:
+        id_accounts (List[int]): The additional accounts the group list is split across, besides `id_account`.
+    """
+    id_accounts: List[int] = Field(default=[], description="The additional accounts the group list is split across.")
+
+class StatusSchedule(str, Enum):
+    """
+    Enum class representing the status of a schedule.
+    """
+    active = "active"
+    paused = "paused"
+    finished = "finished"
+
+class GroupsSendersScheduleBase(GroupsSendersSelectBase):
+    """
+    Represents a recurring group of senders, run by the scheduler every `delay` seconds.
+
+    Attributes:
+        start_at (datetime): The date and time of the first run, now when empty.
+        unlimited (bool): Run until the schedule is paused or deleted instead of `max_executions` times.
+    """
+    start_at: Optional[datetime] = Field(default=None, description="The date and time of the first run, now when empty.")
+    unlimited: bool = Field(default=False, description="Run until the schedule is paused or deleted instead of max_executions times.")
+
 class StatusTasks(str, Enum):
     """
     Enum class representing the status of a task.
@@ -162,4 +203,17 @@ class TaskUpdateStatusBase(BaseModel):
         status (str): The status of the task.
         created_at (str): The date and time when the task was created.
     """
-    status: str = Field(default=StatusTasks.running, description="The status of the task. Can be 'running', 'success', 'stopped'.")
\ No newline at end of file
+    status: str = Field(default=StatusTasks.running, description="The status of the task. Can be 'running', 'success', 'stopped'.")
+
+class TaskStatusByKeyBase(BaseModel):
+    """
+    Represents a status update of a task selected by task ID or by group sender ID.
+
+    Attributes:
+        id_group_sender (int, optional): The ID of the group of senders run by the task.
+        task_id (str, optional): The Celery ID of the task.
+        status (str): The new status of the task.
+    """
+    id_group_sender: Optional[int] = Field(default=None, description="The ID of the group of senders run by the task.")
+    task_id: Optional[str] = Field(default=None, description="The Celery ID of the task.")
+    status: str = Field(default=StatusTasks.running, description="The status of the task. Can be 'running', 'success', 'stopped'.")
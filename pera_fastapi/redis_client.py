@@ -0,0 +1,33 @@
+"""
+This module contains the shared Redis connections of the application.
+
+The synchronous client `r` is used by the Celery workers, the asynchronous client
+returned by `get_async_redis` is used by the API routes.
+"""
+import redis
+from redis import asyncio as aioredis
+from pera_fastapi.settings import settings
+
+redis_url = f"redis://:{settings.redis_password}@{settings.redis_host}:{settings.redis_port}/0"
+
+r = redis.Redis(
+    host=settings.redis_host,
+    port=settings.redis_port,
+    db=0,
+    password=settings.redis_password,
+    decode_responses=True,
+)
+
+_async_redis = None
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Get the process-wide asyncio Redis client.
+
+    Returns:
+        aioredis.Redis: The asyncio Redis client, created on first use.
+    """
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.from_url(redis_url, encoding="utf8", decode_responses=True)
+    return _async_redis
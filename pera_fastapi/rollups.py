@@ -0,0 +1,181 @@
+"""
+This module contains the incrementally maintained delivery statistics.
+
+`history_rollups` holds one row per hour bucket, account, group and group sender with the number
+of history records by status. `tasks.rollup_history` runs every `settings.rollup_interval` seconds
+and only reads the history rows newer than the high-water mark kept in `rollup_watermarks`:
+
+- the watermark row is locked with `SELECT ... FOR UPDATE`, so two jobs never count a row twice;
+- the next `settings.rollup_batch_size` history rows are aggregated by MySQL with one
+  `INSERT ... SELECT ... GROUP BY ... ON DUPLICATE KEY UPDATE` adding to the existing buckets;
+- the watermark is moved in the same transaction.
+
+A batch stops at the first row inserted less than `settings.rollup_lag` seconds ago, which is left
+for the next run, so a history INSERT still in flight with a lower ID is not skipped. The age is
+measured on `inserted_at`, set by MySQL, and not on `created_at`: a worker sets `created_at` when it
+buffers the record, which may be long before a retried flush inserts it. The statistics
+endpoints read a few hundred rollup rows instead of the history table.
+
+The rollups are rebuilt from the whole history with:
+
+    python -m pera_fastapi.rollups --backfill
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import case, delete, func, literal_column, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from pera_fastapi.models import models
+from pera_fastapi.models.schemas import StatusHistory
+from pera_fastapi.settings import settings
+
+HISTORY_ROLLUP = "history"
+ROLLUP_COLUMNS = ("bucket", "id_account", "id_group", "id_group_sender", "success", "failed", "skipped", "total")
+
+
+def _count_status(status: StatusHistory):
+    return func.sum(case((models.History.status == status.value, 1), else_=0))
+
+
+async def _lock_watermark(db) -> int:
+    await db.execute(
+        mysql_insert(models.RollupWatermark)
+        .values(name=HISTORY_ROLLUP, last_id=0)
+        .prefix_with("IGNORE")
+    )
+    return await db.scalar(
+        select(models.RollupWatermark.last_id)
+        .where(models.RollupWatermark.name == HISTORY_ROLLUP)
+        .with_for_update()
+    )
+
+
+async def rollup_batch(db, batch_size: int) -> Optional[Dict[str, int]]:
+    """
+    Add the next batch of history rows to the rollups and move the watermark, in one transaction.
+
+    Args:
+        db: The database session.
+        batch_size (int): The largest number of history rows read.
+
+    Returns:
+        Optional[Dict[str, int]]: The first and last history IDs of the batch, None when the rollups are up to date.
+    """
+    last_id = await _lock_watermark(db)
+    # Measured on the database clock, like inserted_at.
+    cutoff = literal_column(f"NOW() - INTERVAL {int(settings.rollup_lag)} SECOND")
+    # The batch stops before the first row that is too young, so no row is left behind the watermark.
+    first_young = await db.scalar(
+        select(func.min(models.History.id))
+        .where(models.History.id > last_id)
+        .where(models.History.inserted_at >= cutoff)
+    )
+    ids = select(models.History.id).where(models.History.id > last_id)
+    if first_young is not None:
+        ids = ids.where(models.History.id < first_young)
+    ids = ids.order_by(models.History.id).limit(batch_size).subquery()
+    upper = await db.scalar(select(func.max(ids.c.id)))
+    if upper is None:
+        await db.commit()
+        return None
+
+    bucket = func.date_format(models.History.created_at, "%Y-%m-%d %H:00:00")
+    aggregate = (
+        select(
+            bucket,
+            models.History.id_account,
+            models.History.id_group,
+            models.History.id_group_sender,
+            _count_status(StatusHistory.success),
+            _count_status(StatusHistory.failed),
+            _count_status(StatusHistory.skipped),
+            func.count(),
+        )
+        .where(models.History.id > last_id)
+        .where(models.History.id <= upper)
+        .group_by(bucket, models.History.id_account, models.History.id_group, models.History.id_group_sender)
+    )
+    statement = mysql_insert(models.HistoryRollup).from_select(ROLLUP_COLUMNS, aggregate)
+    statement = statement.on_duplicate_key_update({
+        column: getattr(models.HistoryRollup, column) + getattr(statement.inserted, column)
+        for column in ("success", "failed", "skipped", "total")
+    })
+    await db.execute(statement)
+    await db.execute(
+        update(models.RollupWatermark)
+        .where(models.RollupWatermark.name == HISTORY_ROLLUP)
+        .values(last_id=upper, updated_at=datetime.now())
+    )
+    await db.commit()
+    return {"from_id": last_id + 1, "to_id": upper}
+
+
+async def rollup_history(db, batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> Dict[str, int]:
+    """
+    Add every history row newer than the watermark to the rollups, one batch after the other.
+
+    Args:
+        db: The database session.
+        batch_size (Optional[int]): The history rows read per batch, `settings.rollup_batch_size` by default.
+        max_batches (Optional[int]): Stop after this many batches, the next run goes on from there.
+
+    Returns:
+        Dict[str, int]: The number of batches and the watermark reached.
+    """
+    batch_size = batch_size or settings.rollup_batch_size
+    batches = 0
+    last_id = None
+    while max_batches is None or batches < max_batches:
+        batch = await rollup_batch(db, batch_size)
+        if batch is None:
+            break
+        batches += 1
+        last_id = batch["to_id"]
+    if last_id is None:
+        last_id = await db.scalar(
+            select(models.RollupWatermark.last_id).where(models.RollupWatermark.name == HISTORY_ROLLUP)
+        ) or 0
+    return {"batches": batches, "last_id": last_id}
+
+
+async def backfill(db, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Rebuild the rollups from the whole history.
+
+    Args:
+        db: The database session.
+        batch_size (Optional[int]): The history rows read per batch, `settings.rollup_batch_size` by default.
+
+    Returns:
+        Dict[str, int]: The number of batches and the watermark reached.
+    """
+    await _lock_watermark(db)
+    await db.execute(delete(models.HistoryRollup))
+    await db.execute(
+        update(models.RollupWatermark)
+        .where(models.RollupWatermark.name == HISTORY_ROLLUP)
+        .values(last_id=0, updated_at=datetime.now())
+    )
+    await db.commit()
+    return await rollup_history(db, batch_size)
+
+
+async def _main(args: argparse.Namespace):
+    from pera_fastapi.models.database import SessionLocal
+
+    async with SessionLocal() as db:
+        if args.backfill:
+            report = await backfill(db, args.batch_size)
+        else:
+            report = await rollup_history(db, args.batch_size)
+    print(f"Rollups up to date: {report['batches']} batches, watermark at history ID {report['last_id']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the history rollups behind the delivery statistics.")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild the rollups from the whole history.")
+    parser.add_argument("--batch-size", type=int, default=None, help="History rows read per transaction.")
+    asyncio.run(_main(parser.parse_args()))
@@ -7,20 +7,24 @@ The routes include:
 - Retrieving an account by ID
 - Updating an account
 - Deleting an account
+- Reading and storing the encrypted Telegram session of an account, for the workers only
 
 All routes require a database session dependency.
 """
 from typing import Annotated
 from fastapi import APIRouter, HTTPException, Depends, status
-from pera_fastapi.models.schemas import AccountBase, StatusAccount, AccountBase
+from pera_fastapi.models.schemas import AccountBase, StatusAccount, AccountBase, TelegramSessionBase
 from sqlalchemy.orm import Session
 from pera_fastapi.models import models
 from pera_fastapi.models.database import engine, get_db, SessionLocal
+from pera_fastapi.auth.worker import require_worker
 from fastapi_cache.decorator import cache
 from sqlalchemy.future import select
+from sqlalchemy.dialects.mysql import insert
 from sqlalchemy.exc import IntegrityError
 from fastapi.responses import JSONResponse
 import logging
+from datetime import datetime
 
 DBD = Annotated[Session, Depends(get_db)]
 
@@ -267,6 +271,49 @@ async def get_account_by_group_sender(id_group_sender: int, db: DBD):
     except IntegrityError:
         raise HTTPException(status_code=400, detail='Database integrity constraint violated')
 
+@router.get("/account/{id_account}/session", status_code=status.HTTP_200_OK, dependencies=[Depends(require_worker)])
+async def get_account_session(id_account: int, db: DBD):
+    """
+    Retrieve the stored Telegram session of an account, still encrypted. Only the workers may call it.
+
+    Args:
+        id_account (int): The ID of the account.
+        db (DBD): The database session.
+
+    Returns:
+        Dict[str, str]: The encrypted session.
+
+    Raises:
+        HTTPException: If the account has no stored session.
+    """
+    result = await db.execute(select(models.TelegramSession.data).where(models.TelegramSession.id_account == id_account))
+    data = result.scalar_one_or_none()
+    if data is None:
+        raise HTTPException(status_code=404, detail='Session was not found')
+    return {"data": data}
+
+@router.put("/account/{id_account}/session", status_code=status.HTTP_200_OK, dependencies=[Depends(require_worker)])
+async def save_account_session(id_account: int, session: TelegramSessionBase, db: DBD):
+    """
+    Store the encrypted Telegram session of an account, replacing the previous one. Only the workers may call it.
+
+    Args:
+        id_account (int): The ID of the account.
+        session (TelegramSessionBase): The encrypted session.
+        db (DBD): The database session.
+
+    Returns:
+        str: A success message.
+    """
+    statement = insert(models.TelegramSession).values(id_account=id_account, data=session.data, updated_at=datetime.now())
+    statement = statement.on_duplicate_key_update(data=statement.inserted.data, updated_at=statement.inserted.updated_at)
+    try:
+        await db.execute(statement)
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail='Database integrity constraint violated')
+    return JSONResponse(content={"message": "Success save session"}, status_code=status.HTTP_200_OK)
+
 @router.delete("/account/{id_account}", status_code=status.HTTP_200_OK)
 async def delete_account(id_account: int, db: DBD):
     """
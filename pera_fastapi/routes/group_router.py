@@ -4,11 +4,13 @@ This module contains the group router.
 The group router provides the following endpoints:
 - POST /group/ - creates a new group in the database.
 - GET /groups/ - retrieves all groups.
+- GET /groups/cursor - retrieves one page of groups with keyset pagination.
+- GET /groups/count - counts the groups, optionally by category.
 - GET /group/{id_group} - retrieves a group by ID.
 - DELETE /group/{id_group} - deletes a group with the given id from the database.
 - PUT /group/{id_group} - updates a group with the given id in the database.
 """
-from typing import Annotated
+from typing import Annotated, Optional
 from fastapi import APIRouter, HTTPException, Depends, status
 from pera_fastapi.models.schemas import GroupBase
 from sqlalchemy.orm import Session
@@ -18,6 +20,8 @@ from fastapi_cache.decorator import cache
 from sqlalchemy.future import select
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import IntegrityError
+from pera_fastapi.counters import get_count, incr_count
+from pera_fastapi.routes.pagination import keyset_page, offset_page
 
 DBD = Annotated[Session, Depends(get_db)]
 
@@ -43,6 +47,7 @@ async def create_group(group: GroupBase, db: DBD):
         db_group = models.Group(**group.dict())
         db.add(db_group)
         await db.commit()
+        await incr_count(models.Group)
         return "Success add group"
     except IntegrityError:
         raise HTTPException(status_code=400, detail="Integrity error")
@@ -66,41 +71,73 @@ async def get_all_groups(db: DBD):
         raise HTTPException(status_code=404, detail='Groups was not found')
     return groups
 
+@router.get("/groups/cursor", status_code=status.HTTP_200_OK)
+async def get_groups_page(
+    db: DBD,
+    limit: int = 50,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    category: Optional[str] = None,
+    with_total: bool = False,
+):
+    """
+    Retrieve one page of groups in ID order, with keyset pagination.
+
+    Args:
+        db (DBD): The database session.
+        limit (int): The number of groups of the page.
+        after (str, optional): The `next_cursor` of the previous page.
+        before (str, optional): The `prev_cursor` of the next page.
+        category (str, optional): Only list the groups of this category.
+        with_total (bool): Also return the number of groups matching the filters.
+
+    Returns:
+        Dict: The groups under `items`, `next_cursor`, `prev_cursor` and `total` when requested.
+    """
+    conditions = [models.Group.category == category] if category is not None else []
+    page = await keyset_page(
+        db, select(models.Group).where(*conditions), models.Group.id, limit, after, before, descending=False
+    )
+    if with_total:
+        page["total"] = await get_count(db, models.Group, *conditions)
+    return page
+
 @router.get("/groups/{page}/{perPage}", status_code=status.HTTP_200_OK)
 async def get_all_groups_paginate(page: int, perPage: int, db: DBD):
     """
-    Retrieve all groups.
+    Retrieve one page of groups, kept for compatibility with page numbers; prefer `/groups/cursor`.
 
     Returns:
-        List[models.Group]: A list of all groups.
+        List[models.Group]: The groups of the page.
 
     Raises:
         HTTPException: If no groups are found.
     """
-    select_group = select(models.Group).limit(perPage).offset((page-1)*perPage)
-    result = await db.execute(select_group)
-    groups = result.scalars().all()
+    groups = await offset_page(db, models.Group, page, perPage, descending=False)
     if not groups:
         raise HTTPException(status_code=404, detail='Groups was not found')
     return groups
 
 @router.get("/groups/count", status_code=status.HTTP_200_OK)
-async def get_all_groups_count(db: DBD):
+async def get_all_groups_count(db: DBD, category: Optional[str] = None):
     """
-    Retrieve all groups.
+    Count the groups with SQL COUNT(*), from the cached counter when no filter is given.
+
+    Args:
+        db (DBD): The database session.
+        category (str, optional): Only count the groups of this category.
 
     Returns:
-        List[models.Group]: A list of all groups.
+        int: The number of groups.
 
     Raises:
         HTTPException: If no groups are found.
     """
-    select_group = select(models.Group)
-    result = await db.execute(select_group)
-    groups = result.scalars().all()
-    if not groups:
+    conditions = [models.Group.category == category] if category is not None else []
+    count = await get_count(db, models.Group, *conditions)
+    if not count:
         raise HTTPException(status_code=404, detail='Groups was not found')
-    return len(groups)
+    return count
 
 @router.get("/group/{id_group}", status_code=status.HTTP_200_OK)
 async def get_group(id_group: int, db: DBD):
@@ -147,6 +184,7 @@ async def delete_group(id_group: int, db: DBD):
         raise HTTPException(status_code=404, detail='Group was not found')
     await db.delete(group)
     await db.commit()
+    await incr_count(models.Group, -1)
     return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Success delete group"})
 
 
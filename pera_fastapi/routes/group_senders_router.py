@@ -3,12 +3,15 @@ This module contains the API routes for managing group senders.
 """
 from typing import Dict, List, Annotated
 from fastapi import APIRouter, HTTPException, Depends, status
-from pera_fastapi.models.schemas import Group_SendersBase, GroupsSendersSelectBase
+from pera_fastapi.models.schemas import Group_SendersBase, GroupsSendersSelectBase, StatusGroupSenders
 from sqlalchemy.orm import Session
 from pera_fastapi.models import models
 from pera_fastapi.models.database import get_db
+from pera_fastapi.cache_keys import message_key
+from pera_fastapi.redis_client import get_async_redis
 from sqlalchemy.future import select
 from fastapi.responses import JSONResponse
+from datetime import datetime
 
 DBD = Annotated[Session, Depends(get_db)]
 router = APIRouter()
@@ -71,7 +74,7 @@ async def get_group_senders(id_group_senders: int, db: DBD):
         HTTPException: If the group_senders with the specified ID is not found.
     """
     try:
-        select_group_senders = select(models.Group_Senders).where(models.Group_Senders.id_group_senders == id_group_senders)
+        select_group_senders = select(models.Group_Senders).where(models.Group_Senders.id == id_group_senders)
         result = await db.execute(select_group_senders)
         group_senders = result.scalars().first()
         if not group_senders:
@@ -83,7 +86,8 @@ async def get_group_senders(id_group_senders: int, db: DBD):
 @router.put("/group_senders/{id_group_senders}", status_code=status.HTTP_200_OK)
 async def update_group_senders(id_group_senders: int, group_senders: GroupsSendersSelectBase, db: DBD):
     """
-    Update a group_senders.
+    Update a group_senders. The cached parsed message of the campaign is dropped, so the workers
+    load and parse the new message on their next send.
 
     Args:
         id_group_senders (int): The ID of the group_senders to update.
@@ -105,14 +109,41 @@ async def update_group_senders(id_group_senders: int, group_senders: GroupsSende
         update_group_senders = models.Group_Senders(**group_senders.dict(), id=id_group_senders)
         await db.merge(update_group_senders)
         await db.commit()
+        await get_async_redis().delete(message_key(id_group_senders))
         return JSONResponse(content={"message": "Success update group_senders"}, status_code=status.HTTP_200_OK)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.patch("/group_senders/{id_group_senders}", status_code=status.HTTP_200_OK)
+async def update_group_senders_status(id_group_senders: int, group_senders: StatusGroupSenders, db: DBD):
+    """
+    Update the status of a group_senders.
+
+    Args:
+        id_group_senders (int): The ID of the group_senders to update.
+        group_senders (StatusGroupSenders): The new status.
+        db (Session): The database session.
+
+    Returns:
+        Dict[str, str]: A success message.
+
+    Raises:
+        HTTPException: If the group_senders with the specified ID is not found.
+    """
+    select_group_senders = select(models.Group_Senders).where(models.Group_Senders.id == id_group_senders)
+    result = await db.execute(select_group_senders)
+    db_group_senders = result.scalars().first()
+    if not db_group_senders:
+        raise HTTPException(status_code=404, detail='Group_senders was not found')
+    db_group_senders.status = group_senders.value
+    db_group_senders.stopped_at = datetime.now()
+    await db.commit()
+    return JSONResponse(content={"message": "Success update group_senders"}, status_code=status.HTTP_200_OK)
+
 @router.delete("/group_senders/{id_group_senders}", status_code=status.HTTP_200_OK)
 async def delete_group_senders(id_group_senders: int, db: DBD):
     """
-    Delete a group_senders by ID.
+    Delete a group_senders by ID, and its cached parsed message.
 
     Args:
         id_group_senders (int): The ID of the group_senders to delete.
@@ -125,13 +156,14 @@ async def delete_group_senders(id_group_senders: int, db: DBD):
         HTTPException: If the group_senders with the specified ID is not found.
     """
     try:
-        select_group_senders = select(models.Group_Senders).where(models.Group_Senders.id_group_senders == id_group_senders)
+        select_group_senders = select(models.Group_Senders).where(models.Group_Senders.id == id_group_senders)
         result = await db.execute(select_group_senders)
         db_group_senders = result.scalars().first()
         if not db_group_senders:
             raise HTTPException(status_code=404, detail='Group_senders was not found')
-        db.delete(db_group_senders)
+        await db.delete(db_group_senders)
         await db.commit()
+        await get_async_redis().delete(message_key(id_group_senders))
         return JSONResponse(content={"message": "Success delete group_senders"}, status_code=status.HTTP_200_OK)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
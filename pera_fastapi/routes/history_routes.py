@@ -3,21 +3,34 @@ This module contains the routes for the history API endpoints.
 
 Functions:
 - create_history: Create a new history in the database.
-- get_all_histories: Retrieve all histories.
+- create_histories: Create many histories with a single multi-row INSERT.
+- get_all_histories: Retrieve a capped list of histories.
+- get_histories_page: Retrieve one filtered page of histories with keyset pagination.
+- export_histories: Stream the filtered histories as NDJSON or CSV.
 - get_history: Retrieve a history by ID.
 - update_history: Update a history by ID.
 - delete_history: Delete a history by ID.
 """
-from typing import Annotated
-from fastapi import APIRouter, HTTPException, Depends, status
-from pera_fastapi.models.schemas import HistoryBase
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Response, status
+from fastapi.responses import StreamingResponse
+from pera_fastapi.models.schemas import HistoryBase, StatusHistory
 from sqlalchemy.orm import Session
 from pera_fastapi.models import models
 from pera_fastapi.models.database import engine, get_db, SessionLocal
 from fastapi_cache.decorator import cache
 from sqlalchemy.future import select
+from sqlalchemy import insert
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import IntegrityError
+from pera_fastapi.routes.pagination import keyset_page
+from pera_fastapi.counters import count_rows
+from pera_fastapi.settings import settings
 
 
 
@@ -25,6 +38,103 @@ DBD = Annotated[Session, Depends(get_db)]
 
 router = APIRouter()
 
+HISTORY_COLUMNS = ("id", "id_group", "id_account", "id_group_sender", "status", "created_at")
+HISTORY_LIST_LIMIT = 100
+
+
+class ExportFormat(str, Enum):
+    """
+    Enum class representing the format of a history export.
+    """
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+def history_filters(
+    id_account: Optional[int] = None,
+    id_group: Optional[int] = None,
+    id_group_sender: Optional[int] = None,
+    status_history: Optional[StatusHistory] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> List:
+    """
+    Build the filters of a history listing from its query parameters.
+
+    Args:
+        id_account (int, optional): Only keep the histories of this account.
+        id_group (int, optional): Only keep the histories of this group.
+        id_group_sender (int, optional): Only keep the histories of this group sender.
+        status_history (StatusHistory, optional): Only keep the histories with this status.
+        created_from (datetime, optional): Only keep the histories created at or after this time.
+        created_to (datetime, optional): Only keep the histories created before this time.
+
+    Returns:
+        List: The SQL conditions.
+    """
+    conditions = []
+    if id_account is not None:
+        conditions.append(models.History.id_account == id_account)
+    if id_group is not None:
+        conditions.append(models.History.id_group == id_group)
+    if id_group_sender is not None:
+        conditions.append(models.History.id_group_sender == id_group_sender)
+    if status_history is not None:
+        conditions.append(models.History.status == status_history.value)
+    if created_from is not None:
+        conditions.append(models.History.created_at >= created_from)
+    if created_to is not None:
+        conditions.append(models.History.created_at < created_to)
+    return conditions
+
+
+HistoryFilters = Annotated[List, Depends(history_filters)]
+
+
+async def list_histories(
+    db,
+    conditions: List,
+    response: Response,
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> List:
+    """
+    Read one capped page of histories, newest first, for the endpoints returning a plain list.
+
+    The list keeps the response shape of these endpoints, and the cursors of the neighbour pages are
+    sent in the `X-Next-Cursor` and `X-Prev-Cursor` headers, to pass back as `after` or `before`.
+
+    Args:
+        db: The database session.
+        conditions (List): The filters of the histories.
+        response (Response): The response, to set the cursor headers on.
+        limit (int): The number of histories, at most `MAX_PAGE_SIZE`.
+        after (str, optional): The `X-Next-Cursor` of the previous page.
+        before (str, optional): The `X-Prev-Cursor` of the next page.
+
+    Returns:
+        List: The histories of the page.
+
+    Raises:
+        HTTPException: 404 if no history matches the filters, 400 for an invalid cursor or limit.
+    """
+    page = await keyset_page(db, select(models.History).where(*conditions), models.History.id, limit, after, before)
+    if not page["items"] and after is None and before is None:
+        raise HTTPException(status_code=404, detail='History was not found')
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    if page["prev_cursor"] is not None:
+        response.headers["X-Prev-Cursor"] = page["prev_cursor"]
+    return page["items"]
+
+
+def history_to_dict(history) -> dict:
+    """ Serialize a history row for the exports. """
+    data = {column: getattr(history, column) for column in HISTORY_COLUMNS}
+    data["created_at"] = data["created_at"].isoformat() if data["created_at"] else None
+    return data
+
 @router.post("/history/", status_code=status.HTTP_201_CREATED)
 async def create_history(history: HistoryBase, db: DBD):
     """
@@ -49,23 +159,135 @@ async def create_history(history: HistoryBase, db: DBD):
         await db.rollback()
         raise HTTPException(status_code=400, detail="Integrity error")
 
+@router.post("/history/bulk", status_code=status.HTTP_201_CREATED)
+async def create_histories(histories: List[HistoryBase], db: DBD):
+    """
+    Create many histories in the database with a single multi-row INSERT.
+
+    Args:
+        histories (List[HistoryBase]): The history records to be added.
+        db (DBD): The database session.
+
+    Returns:
+        Dict[str, Union[str, int]]: A success message and the number of added histories.
+    """
+    if not histories:
+        return JSONResponse(content={"message": "No history to add", "count": 0}, status_code=status.HTTP_201_CREATED)
+    try:
+        await db.execute(insert(models.History).values([history.dict() for history in histories]))
+        await db.commit()
+
+        return JSONResponse(content={"message": "Success add histories", "count": len(histories)}, status_code=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Integrity error")
+
 @router.get("/histories/",status_code=status.HTTP_200_OK)
-async def get_all_histories(db: DBD):
+async def get_all_histories(
+    db: DBD,
+    conditions: HistoryFilters,
+    response: Response,
+    limit: int = HISTORY_LIST_LIMIT,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+):
     """
-    Retrieve all histories.
+    Retrieve the histories, newest first, `limit` at a time. Use `/histories/export` to read them all.
+
+    Args:
+        db (DBD): The database dependency.
+        conditions (HistoryFilters): The filters, as accepted by `/histories/page`.
+        response (Response): The response, carrying the `X-Next-Cursor` and `X-Prev-Cursor` headers.
+        limit (int): The number of histories, at most `MAX_PAGE_SIZE`.
+        after (str, optional): The `X-Next-Cursor` of the previous page.
+        before (str, optional): The `X-Prev-Cursor` of the next page.
 
     Returns:
-        List[models.History]: A list of all histories.
+        List[models.History]: The histories of the page.
     
     Raises:
         HTTPException: If no histories are found.
     """
-    select_history = select(models.History)
-    result = await db.execute(select_history)
-    histories = result.scalars().all()
-    if not histories:
-        raise HTTPException(status_code=404,detail='Histories was not found')
-    return histories
+    return await list_histories(db, conditions, response, limit, after, before)
+
+@router.get("/histories/page",status_code=status.HTTP_200_OK)
+async def get_histories_page(
+    db: DBD,
+    conditions: HistoryFilters,
+    limit: int = 100,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    with_total: bool = False,
+):
+    """
+    Retrieve one page of histories, newest first, with filters and keyset pagination.
+
+    Args:
+        db (DBD): The database dependency.
+        conditions (HistoryFilters): The filters, from the account, group, group sender, status and
+            created_at range query parameters.
+        limit (int): The number of histories of the page.
+        after (str, optional): The `next_cursor` of the previous page.
+        before (str, optional): The `prev_cursor` of the next page.
+        with_total (bool): Also return the number of histories matching the filters, with SQL COUNT(*).
+
+    Returns:
+        Dict: The histories under `items`, `next_cursor`, `prev_cursor` and `total` when requested.
+    """
+    page = await keyset_page(
+        db, select(models.History).where(*conditions), models.History.id, limit, after, before
+    )
+    if with_total:
+        page["total"] = await count_rows(db, models.History, *conditions)
+    return page
+
+@router.get("/histories/export",status_code=status.HTTP_200_OK)
+async def export_histories(conditions: HistoryFilters, format: ExportFormat = ExportFormat.ndjson):
+    """
+    Stream the histories matching the filters, oldest first, as NDJSON or CSV.
+
+    The rows are read with a server-side cursor, `settings.history_export_batch_size` rows at a
+    time, and written to the response as they are read, so memory stays flat whatever the number
+    of rows. The export uses its own session, which lives as long as the response.
+
+    Args:
+        conditions (HistoryFilters): The filters, as accepted by `/histories/page`.
+        format (ExportFormat): `ndjson` for one JSON object per line, `csv` for a CSV file with a header.
+
+    Returns:
+        StreamingResponse: The histories.
+    """
+    statement = (
+        select(models.History)
+        .where(*conditions)
+        .order_by(models.History.id)
+        .execution_options(yield_per=settings.history_export_batch_size)
+    )
+
+    def encode(rows: List[dict]) -> str:
+        if format == ExportFormat.ndjson:
+            return "".join(json.dumps(row) + "\n" for row in rows)
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=HISTORY_COLUMNS).writerows(rows)
+        return buffer.getvalue()
+
+    async def stream_rows():
+        if format == ExportFormat.csv:
+            yield ",".join(HISTORY_COLUMNS) + "\r\n"
+        async with SessionLocal() as db:
+            result = await db.stream(statement)
+            async for partition in result.scalars().partitions():
+                yield encode([history_to_dict(history) for history in partition])
+                db.expunge_all()
+
+    if format == ExportFormat.csv:
+        return StreamingResponse(
+            stream_rows(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=histories.csv"},
+        )
+    return StreamingResponse(stream_rows(), media_type="application/x-ndjson")
 
 @router.get("/history/{id_history}",status_code=status.HTTP_200_OK)
 async def get_history(id_history: int, db: DBD):
@@ -172,45 +394,57 @@ async def get_history_group(id_history: int, db: DBD):
     return history.group
 
 @router.get("/history/{id_account}/accounts",status_code=status.HTTP_200_OK)
-async def get_history_account(id_account: int, db: DBD):
+async def get_history_account(
+    id_account: int,
+    db: DBD,
+    response: Response,
+    limit: int = HISTORY_LIST_LIMIT,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+):
     """
-    Retrieve the account of an history by ID.
+    Retrieve the histories of an account, newest first, `limit` at a time.
 
     Args:
-        id_account (int): The ID of the history to retrieve.
+        id_account (int): The ID of the account.
         db (DBD): The database dependency.
+        response (Response): The response, carrying the `X-Next-Cursor` and `X-Prev-Cursor` headers.
+        limit (int): The number of histories, at most `MAX_PAGE_SIZE`.
+        after (str, optional): The `X-Next-Cursor` of the previous page.
+        before (str, optional): The `X-Prev-Cursor` of the next page.
 
     Returns:
-        The account of the history with the specified ID.
+        The histories of the page.
 
     Raises:
-        HTTPException: If the history with the specified ID is not found.
+        HTTPException: If the account has no history.
     """
-    select_history = select(models.History).where(models.History.id_account == id_account)
-    result = await db.execute(select_history)
-    history = result.scalars().all()
-    if not history:
-        raise HTTPException(status_code=404,detail='History was not found')
-    return history
+    return await list_histories(db, history_filters(id_account=id_account), response, limit, after, before)
 
 @router.get("/history/{id_group_sender}/group_senders",status_code=status.HTTP_200_OK)
-async def get_history_group_senders(id_group_sender: int, db: DBD):
+async def get_history_group_senders(
+    id_group_sender: int,
+    db: DBD,
+    response: Response,
+    limit: int = HISTORY_LIST_LIMIT,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+):
     """
-    Retrieve the group_senders of an history by ID.
+    Retrieve the histories of a group sender, newest first, `limit` at a time.
 
     Args:
-        id_group_sender (int): The ID of the history to retrieve.
+        id_group_sender (int): The ID of the group sender.
         db (DBD): The database dependency.
+        response (Response): The response, carrying the `X-Next-Cursor` and `X-Prev-Cursor` headers.
+        limit (int): The number of histories, at most `MAX_PAGE_SIZE`.
+        after (str, optional): The `X-Next-Cursor` of the previous page.
+        before (str, optional): The `X-Prev-Cursor` of the next page.
 
     Returns:
-        The group_senders of the history with the specified ID.
+        The histories of the page.
 
     Raises:
-        HTTPException: If the history with the specified ID is not found.
+        HTTPException: If the group sender has no history.
     """
-    select_history = select(models.History).where(models.History.id_group_sender == id_group_sender)
-    result = await db.execute(select_history)
-    history = result.scalars().all()
-    if not history:
-        raise HTTPException(status_code=404,detail='History was not found')
-    return history
+    return await list_histories(db, history_filters(id_group_sender=id_group_sender), response, limit, after, before)
@@ -0,0 +1,176 @@
+"""
+This module contains the API routes for managing the media files attached to campaigns.
+
+Files are uploaded as the raw request body, with the file name in the `name` query parameter and
+the MIME type in the `Content-Type` header, and stored once in the `media` table. A campaign refers
+to a file by `id_media`; the workers upload it to Telegram once per account and reuse the reference.
+"""
+import hashlib
+from datetime import datetime
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, undefer
+
+from pera_fastapi.models import models
+from pera_fastapi.models.database import get_db
+from pera_fastapi.redis_client import get_async_redis
+from pera_fastapi.settings import settings
+from pera_fastapi.cache_keys import media_info_key
+
+DBD = Annotated[Session, Depends(get_db)]
+router = APIRouter()
+
+
+def media_to_dict(media: models.Media):
+    return {
+        "id": media.id,
+        "name": media.name,
+        "mime_type": media.mime_type,
+        "size": media.size,
+        "sha256": media.sha256,
+        "created_at": str(media.created_at),
+        "updated_at": str(media.updated_at) if media.updated_at else None,
+    }
+
+
+async def read_upload(request: Request) -> bytes:
+    """
+    Read an uploaded file from the request body.
+
+    Raises:
+        HTTPException: If the body is empty or larger than `settings.media_max_size`.
+    """
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail='The file is empty')
+    if len(data) > settings.media_max_size:
+        raise HTTPException(status_code=413, detail=f'The file is larger than {settings.media_max_size} bytes')
+    return data
+
+
+async def get_media_or_404(id_media: int, db: DBD, with_data: bool = False) -> models.Media:
+    query = select(models.Media).where(models.Media.id == id_media)
+    if with_data:
+        query = query.options(undefer(models.Media.data))
+    result = await db.execute(query)
+    media = result.scalars().first()
+    if not media:
+        raise HTTPException(status_code=404, detail='Media was not found')
+    return media
+
+
+@router.post("/media/", status_code=status.HTTP_201_CREATED)
+async def create_media(name: str, request: Request, db: DBD):
+    """
+    Upload a media file.
+
+    Args:
+        name (str): The file name.
+        request (Request): The request, whose body is the file content.
+        db (Session): The database session.
+
+    Returns:
+        Dict[str, Union[str, int]]: A success message, the ID and the SHA-256 digest of the file.
+    """
+    data = await read_upload(request)
+    db_media = models.Media(
+        name=name,
+        mime_type=request.headers.get('content-type', 'application/octet-stream'),
+        size=len(data),
+        sha256=hashlib.sha256(data).hexdigest(),
+        data=data,
+    )
+    db.add(db_media)
+    await db.commit()
+    return JSONResponse(
+        content={"message": "Success add media", "id": db_media.id, "sha256": db_media.sha256},
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+@router.get("/media/", status_code=status.HTTP_200_OK)
+async def get_all_media(db: DBD):
+    """
+    Retrieve every media file, without its content.
+
+    Returns:
+        List[Dict]: The media files.
+    """
+    result = await db.execute(select(models.Media))
+    return [media_to_dict(media) for media in result.scalars().all()]
+
+
+@router.get("/media/{id_media}", status_code=status.HTTP_200_OK)
+async def get_media(id_media: int, db: DBD):
+    """
+    Retrieve a media file by ID, without its content.
+
+    Raises:
+        HTTPException: If the media file is not found.
+    """
+    return media_to_dict(await get_media_or_404(id_media, db))
+
+
+@router.get("/media/{id_media}/content", status_code=status.HTTP_200_OK)
+async def get_media_content(id_media: int, db: DBD):
+    """
+    Download the content of a media file.
+
+    Raises:
+        HTTPException: If the media file is not found.
+    """
+    media = await get_media_or_404(id_media, db, with_data=True)
+    return Response(content=media.data, media_type=media.mime_type)
+
+
+@router.put("/media/{id_media}", status_code=status.HTTP_200_OK)
+async def update_media(id_media: int, request: Request, db: DBD, name: str = None):
+    """
+    Replace the content of a media file.
+
+    The campaigns using the file send the new content from their next group on: the workers key
+    their Telegram references by the SHA-256 digest of the file.
+
+    Raises:
+        HTTPException: If the media file is not found.
+    """
+    media = await get_media_or_404(id_media, db)
+    data = await read_upload(request)
+    media.data = data
+    media.size = len(data)
+    media.sha256 = hashlib.sha256(data).hexdigest()
+    media.mime_type = request.headers.get('content-type', media.mime_type)
+    media.name = name or media.name
+    media.updated_at = datetime.now()
+    await db.commit()
+    await get_async_redis().delete(media_info_key(id_media))
+    return JSONResponse(content={"message": "Success update media", "sha256": media.sha256}, status_code=status.HTTP_200_OK)
+
+
+@router.delete("/media/{id_media}", status_code=status.HTTP_200_OK)
+async def delete_media(id_media: int, db: DBD):
+    """
+    Delete a media file by ID.
+
+    Raises:
+        HTTPException: 404 if the media file is not found, 409 if a campaign still refers to it.
+    """
+    media = await get_media_or_404(id_media, db)
+    in_use = await db.scalar(
+        select(func.count()).select_from(models.Group_Senders).where(models.Group_Senders.id_media == id_media)
+    )
+    if in_use:
+        raise HTTPException(status_code=409, detail=f'The media is used by {in_use} campaigns')
+    try:
+        await db.delete(media)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail='The media is used by a campaign')
+    await get_async_redis().delete(media_info_key(id_media))
+    return JSONResponse(content={"message": "Success delete media"}, status_code=status.HTTP_200_OK)
@@ -0,0 +1,149 @@
+"""
+This module contains the keyset (cursor) pagination shared by the list endpoints.
+
+A page is read with `WHERE id < :cursor ORDER BY id DESC LIMIT :limit` (or the ascending form)
+instead of `OFFSET`, so MySQL seeks the primary key to the cursor and reads `limit` rows: page N
+costs the same as page 1. Cursors are opaque strings: clients get `next_cursor` and `prev_cursor`
+with every page and send one back as `after` or `before`.
+
+The page/perPage endpoints are kept for compatibility through `offset_page`, which skips the
+earlier rows on the primary key index only and then loads the rows of the page by ID.
+"""
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(id_value: int) -> str:
+    """
+    Encode a row ID into an opaque cursor.
+
+    Args:
+        id_value (int): The ID of the row.
+
+    Returns:
+        str: The cursor.
+    """
+    return base64.urlsafe_b64encode(f"id:{id_value}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode an opaque cursor into a row ID.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        int: The ID of the row.
+
+    Raises:
+        HTTPException: 400 if the cursor is invalid or is not a string.
+    """
+    if not isinstance(cursor, str):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, id_value = value.split(":", 1)
+        if prefix != "id":
+            raise ValueError(prefix)
+        return int(id_value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+
+
+async def keyset_page(
+    db,
+    statement,
+    id_column,
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    descending: bool = True,
+) -> Dict[str, Any]:
+    """
+    Read one page of a query ordered by its ID column.
+
+    Args:
+        db: The database session.
+        statement: The query, with its filters and without ORDER BY or LIMIT.
+        id_column: The unique, indexed column the pages are ordered by.
+        limit (int): The number of rows of the page.
+        after (Optional[str]): The cursor of the row after which the page starts.
+        before (Optional[str]): The cursor of the row before which the page ends.
+        descending (bool): Order the rows by decreasing ID, newest first.
+
+    Returns:
+        Dict[str, Any]: The rows under `items`, and the cursors of the next and previous pages,
+        None when there is no such page.
+
+    Raises:
+        HTTPException: 400 if both cursors are given, a cursor is invalid or the limit is out of range.
+    """
+    if after is not None and before is not None:
+        raise HTTPException(status_code=400, detail='Only one of after or before can be given')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f'The limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    backward = before is not None
+    # Reading backward walks the index in the opposite direction and flips the rows afterwards.
+    forward_order = id_column.desc() if descending else id_column.asc()
+    reverse_order = id_column.asc() if descending else id_column.desc()
+    if after is not None:
+        cursor = decode_cursor(after)
+        statement = statement.where(id_column < cursor if descending else id_column > cursor)
+    elif before is not None:
+        cursor = decode_cursor(before)
+        statement = statement.where(id_column > cursor if descending else id_column < cursor)
+
+    result = await db.execute(statement.order_by(reverse_order if backward else forward_order).limit(limit + 1))
+    rows: List = list(result.scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    key = id_column.key
+    first = encode_cursor(getattr(rows[0], key)) if rows else None
+    last = encode_cursor(getattr(rows[-1], key)) if rows else None
+    if backward:
+        next_cursor, prev_cursor = last, first if has_more else None
+    else:
+        next_cursor, prev_cursor = last if has_more else None, first if after is not None else None
+    return {"items": rows, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+
+async def offset_page(db, model, page: int, per_page: int, descending: bool = True, conditions: Sequence = ()) -> List:
+    """
+    Read one page/perPage page, for the endpoints kept for compatibility.
+
+    The rows before the page are skipped on the primary key index only, without reading them, and
+    the rows of the page are then loaded by ID.
+
+    Args:
+        db: The database session.
+        model: The model of the table.
+        page (int): The page number, starting at 1.
+        per_page (int): The number of rows per page.
+        descending (bool): Order the rows by decreasing ID, newest first.
+        conditions (Sequence): The filters of the query.
+
+    Returns:
+        List: The rows of the page.
+    """
+    if page < 1 or not 1 <= per_page <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f'page must be at least 1 and perPage between 1 and {MAX_PAGE_SIZE}')
+    order = model.id.desc() if descending else model.id.asc()
+    ids_statement = select(model.id).order_by(order).offset((page - 1) * per_page).limit(per_page)
+    if conditions:
+        ids_statement = ids_statement.where(*conditions)
+    ids = list((await db.execute(ids_statement)).scalars().all())
+    if not ids:
+        return []
+    result = await db.execute(select(model).where(model.id.in_(ids)).order_by(order))
+    return result.scalars().all()
@@ -0,0 +1,140 @@
+"""
+This module contains the API routes for the delivery statistics.
+
+The statistics are read from the hourly `history_rollups` maintained by `tasks.rollup_history`
+(see `pera_fastapi/rollups.py`), never from the history table, so a dashboard query reads a few
+hundred rollup rows. They lag behind the history by up to `settings.rollup_interval` plus
+`settings.rollup_lag` seconds.
+"""
+from datetime import datetime
+from enum import Enum
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from pera_fastapi.models import models
+from pera_fastapi.models.database import get_db
+from pera_fastapi.rollups import HISTORY_ROLLUP, rollup_history
+
+DBD = Annotated[Session, Depends(get_db)]
+router = APIRouter()
+
+
+class StatsGroupBy(str, Enum):
+    """
+    Enum class representing the key the delivery statistics are grouped by.
+    """
+    account = "account"
+    group = "group"
+    group_sender = "group_sender"
+    hour = "hour"
+    day = "day"
+
+
+GROUP_BY_COLUMNS = {
+    StatsGroupBy.account: models.HistoryRollup.id_account,
+    StatsGroupBy.group: models.HistoryRollup.id_group,
+    StatsGroupBy.group_sender: models.HistoryRollup.id_group_sender,
+    StatsGroupBy.hour: models.HistoryRollup.bucket,
+    StatsGroupBy.day: func.date(models.HistoryRollup.bucket),
+}
+
+
+@router.get("/stats/delivery", status_code=status.HTTP_200_OK)
+async def get_delivery_stats(
+    db: DBD,
+    group_by: StatsGroupBy = StatsGroupBy.account,
+    id_account: Optional[int] = None,
+    id_group: Optional[int] = None,
+    id_group_sender: Optional[int] = None,
+    bucket_from: Optional[datetime] = None,
+    bucket_to: Optional[datetime] = None,
+    limit: int = 500,
+):
+    """
+    Retrieve the delivery counters and success rate grouped by account, group, group sender, hour or day.
+
+    Args:
+        db (DBD): The database session.
+        group_by (StatsGroupBy): The key of the statistics.
+        id_account (int, optional): Only count the messages of this account.
+        id_group (int, optional): Only count the messages to this group.
+        id_group_sender (int, optional): Only count the messages of this group sender.
+        bucket_from (datetime, optional): Only count the hours starting at or after this time.
+        bucket_to (datetime, optional): Only count the hours starting before this time.
+        limit (int): The maximum number of keys, the busiest first unless grouped by time.
+
+    Returns:
+        List[Dict]: The success, failed, skipped and total counters and the success rate of every key.
+    """
+    if not 1 <= limit <= 5000:
+        raise HTTPException(status_code=400, detail='The limit must be between 1 and 5000')
+    key = GROUP_BY_COLUMNS[group_by].label("stats_key")
+    total = func.sum(models.HistoryRollup.total)
+    statement = select(
+        key,
+        func.sum(models.HistoryRollup.success).label("success"),
+        func.sum(models.HistoryRollup.failed).label("failed"),
+        func.sum(models.HistoryRollup.skipped).label("skipped"),
+        total.label("total"),
+    )
+    if id_account is not None:
+        statement = statement.where(models.HistoryRollup.id_account == id_account)
+    if id_group is not None:
+        statement = statement.where(models.HistoryRollup.id_group == id_group)
+    if id_group_sender is not None:
+        statement = statement.where(models.HistoryRollup.id_group_sender == id_group_sender)
+    if bucket_from is not None:
+        statement = statement.where(models.HistoryRollup.bucket >= bucket_from)
+    if bucket_to is not None:
+        statement = statement.where(models.HistoryRollup.bucket < bucket_to)
+    order = key if group_by in (StatsGroupBy.hour, StatsGroupBy.day) else total.desc()
+    result = await db.execute(statement.group_by(key).order_by(order).limit(limit))
+
+    stats = []
+    for row in result.all():
+        success, failed, skipped, row_total = (int(value or 0) for value in (row.success, row.failed, row.skipped, row.total))
+        attempted = success + failed
+        stats.append({
+            group_by.value: row.stats_key.isoformat() if hasattr(row.stats_key, "isoformat") else row.stats_key,
+            "success": success,
+            "failed": failed,
+            "skipped": skipped,
+            "total": row_total,
+            "success_rate": round(success / attempted, 4) if attempted else None,
+        })
+    return stats
+
+
+@router.get("/stats/rollup", status_code=status.HTTP_200_OK)
+async def get_rollup_state(db: DBD):
+    """
+    Retrieve how far the rollups have read the history.
+
+    Returns:
+        Dict: The last history ID included in the rollups, the newest history ID and the time the rollups last moved.
+    """
+    watermark = await db.get(models.RollupWatermark, HISTORY_ROLLUP)
+    newest = await db.scalar(select(func.max(models.History.id)))
+    return {
+        "last_id": watermark.last_id if watermark else 0,
+        "newest_id": newest or 0,
+        "updated_at": watermark.updated_at.isoformat() if watermark and watermark.updated_at else None,
+    }
+
+
+@router.post("/stats/rollup", status_code=status.HTTP_200_OK)
+async def run_rollup(db: DBD, max_batches: int = 10):
+    """
+    Add the history rows newer than the watermark to the rollups, used by the workers in HTTP mode.
+
+    Args:
+        db (DBD): The database session.
+        max_batches (int): The largest number of batches of `settings.rollup_batch_size` rows.
+
+    Returns:
+        Dict: The number of batches and the watermark reached.
+    """
+    return await rollup_history(db, max_batches=max_batches)
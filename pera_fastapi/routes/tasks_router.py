@@ -1,15 +1,20 @@
 """ This module contains the routes for the tasks. """
 
-from typing import Dict, List, Annotated
+from typing import Dict, List, Annotated, Optional
 from fastapi import APIRouter, HTTPException, Depends, status,WebSocket
-from pera_fastapi.models.schemas import TasksBase, TasksUpdateBase,TaskUpdateStatusBase
+from pera_fastapi.models.schemas import TasksBase, TasksUpdateBase,TaskUpdateStatusBase,TaskStatusByKeyBase,StatusGroupSenders,StatusAccount,StatusTasks,StatusSchedule
 from sqlalchemy.orm import Session
 from pera_fastapi.models import models
 from pera_fastapi.models.database import get_db
+from pera_fastapi.auth.worker import require_worker
 from sqlalchemy.future import select
+from sqlalchemy import update
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+from pera_fastapi.counters import get_count, incr_count, reconcile_counters
+from pera_fastapi.routes.pagination import keyset_page, offset_page
+from pera_fastapi.models.queries import finish_group_sender, finish_scheduled_run, get_running_campaigns
 
 DBD = Annotated[Session, Depends(get_db)]
 router = APIRouter()
@@ -31,6 +36,7 @@ async def create_task(task: TasksBase, db: DBD):
         db.add(db_task)
         await db.commit()
         await db.refresh(db_task)
+        await incr_count(models.Tasks)
         return JSONResponse(content={"message": "Success create task", "id": db_task.id}, status_code=status.HTTP_201_CREATED)
     except IntegrityError:
         raise HTTPException(status_code=400, detail='Database integrity constraint violated')
@@ -47,24 +53,89 @@ async def get_all_tasks(db: DBD):
     except IntegrityError:
         raise HTTPException(status_code=400, detail='Database integrity constraint violated')
 
+@router.get("/tasks/running", status_code=status.HTTP_200_OK, dependencies=[Depends(require_worker)])
+async def get_running_tasks(db: DBD, limit: int = 10):
+    """ Get the campaigns with a running task and their account credentials, for the workers only to warm up """
+    return await get_running_campaigns(db, limit)
+
 @router.get("/tasks/count", status_code=status.HTTP_200_OK)
-async def get_all_tasks_count(db: DBD):
-    try:
-        select_tasks = select(models.Tasks)
-        result = await db.execute(select_tasks)
-        tasks = result.scalars().all()
-        if not tasks:
-            raise HTTPException(status_code=404, detail='Tasks was not found')
-        return len(tasks)
-    except IntegrityError:
-        raise HTTPException(status_code=400, detail='Database integrity constraint violated')
+async def get_all_tasks_count(
+    db: DBD,
+    status_task: Optional[StatusTasks] = None,
+    id_account: Optional[int] = None,
+    id_group_sender: Optional[int] = None,
+):
+    """
+    Count the tasks with SQL COUNT(*), from the cached counter when no filter is given.
+
+    Args:
+        db (DBD): The database session.
+        status_task (StatusTasks, optional): Only count the tasks with this status.
+        id_account (int, optional): Only count the tasks of the campaigns of this account.
+        id_group_sender (int, optional): Only count the tasks of this group sender.
+
+    Returns:
+        int: The number of tasks.
+    """
+    conditions = []
+    if status_task is not None:
+        conditions.append(models.Tasks.status == status_task.value)
+    if id_group_sender is not None:
+        conditions.append(models.Tasks.id_group_sender == id_group_sender)
+    if id_account is not None:
+        conditions.append(models.Tasks.id_group_sender.in_(
+            select(models.Group_Senders.id).where(models.Group_Senders.id_account == id_account)
+        ))
+    count = await get_count(db, models.Tasks, *conditions)
+    if not count:
+        raise HTTPException(status_code=404, detail='Tasks was not found')
+    return count
+
+@router.post("/counters/reconcile", status_code=status.HTTP_200_OK)
+async def reconcile_row_counters(db: DBD):
+    """ Reset the cached row counters from SQL COUNT(*), used by the workers in HTTP mode """
+    return await reconcile_counters(db)
+
+@router.get("/tasks/cursor", status_code=status.HTTP_200_OK)
+async def get_tasks_page(
+    db: DBD,
+    limit: int = 50,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    status_task: Optional[StatusTasks] = None,
+    id_group_sender: Optional[int] = None,
+    with_total: bool = False,
+):
+    """
+    Retrieve one page of tasks, newest first, with keyset pagination.
+
+    Args:
+        db (DBD): The database session.
+        limit (int): The number of tasks of the page.
+        after (str, optional): The `next_cursor` of the previous page.
+        before (str, optional): The `prev_cursor` of the next page.
+        status_task (StatusTasks, optional): Only list the tasks with this status.
+        id_group_sender (int, optional): Only list the tasks of this group sender.
+        with_total (bool): Also return the number of tasks matching the filters.
+
+    Returns:
+        Dict: The tasks under `items`, `next_cursor`, `prev_cursor` and `total` when requested.
+    """
+    conditions = []
+    if status_task is not None:
+        conditions.append(models.Tasks.status == status_task.value)
+    if id_group_sender is not None:
+        conditions.append(models.Tasks.id_group_sender == id_group_sender)
+    page = await keyset_page(db, select(models.Tasks).where(*conditions), models.Tasks.id, limit, after, before)
+    if with_total:
+        page["total"] = await get_count(db, models.Tasks, *conditions)
+    return page
 
 @router.get("/tasks/{page}/{perPage}", status_code=status.HTTP_200_OK)
 async def get_all_tasks_paginate(page: int, perPage: int, db: DBD):
+    """ Get one page of tasks, kept for compatibility with page numbers; prefer /tasks/cursor """
     try:
-        select_tasks = select(models.Tasks).order_by(models.Tasks.id.desc())
-        result = await db.execute(select_tasks.offset((page - 1) * perPage).limit(perPage))
-        tasks = result.scalars().all()
+        tasks = await offset_page(db, models.Tasks, page, perPage)
         if not tasks:
             raise HTTPException(status_code=404, detail='Tasks was not found')
         return tasks
@@ -128,6 +199,49 @@ async def update_task_work(task_id: str, task_update: TaskUpdateStatusBase, db:
     except IntegrityError:
         raise HTTPException(status_code=400, detail='Database integrity constraint violated')
 
+@router.put("/task/status", status_code=status.HTTP_200_OK)
+async def update_task_status(task_update: TaskStatusByKeyBase, db: DBD):
+    """ Update the status of a task by task id or group sender id with a single UPDATE """
+    if (task_update.task_id is None) == (task_update.id_group_sender is None):
+        raise HTTPException(status_code=400, detail='Exactly one of task_id or id_group_sender is required')
+    if task_update.task_id is not None:
+        condition = models.Tasks.task_id == task_update.task_id
+    else:
+        condition = models.Tasks.id_group_sender == task_update.id_group_sender
+    try:
+        result = await db.execute(
+            update(models.Tasks)
+            .where(condition)
+            .values(status=task_update.status, stopped_at=datetime.now())
+        )
+        if result.rowcount == 0:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail='Task was not found')
+        await db.commit()
+        return JSONResponse(content={"message": "Success update task"}, status_code=status.HTTP_200_OK)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail='Database integrity constraint violated')
+
+@router.post("/group_sender/{id_group_sender}/finish", status_code=status.HTTP_200_OK)
+async def finish_campaign(id_group_sender: int, task_update: TaskUpdateStatusBase, db: DBD):
+    """ Finish a campaign: group sender, account and task status in one transaction """
+    try:
+        if not await finish_group_sender(id_group_sender, task_update.status, db):
+            raise HTTPException(status_code=404, detail='Group_senders was not found')
+        return JSONResponse(content={"message": "Success finish campaign"}, status_code=status.HTTP_200_OK)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail='Database integrity constraint violated')
+
+@router.post("/group_sender/{id_group_sender}/run/{task_id}/finish", status_code=status.HTTP_200_OK)
+async def finish_scheduled_campaign_run(id_group_sender: int, task_id: str, task_update: TaskUpdateStatusBase, db: DBD):
+    """ Finish one run of a recurring campaign, and the campaign when its schedule is over """
+    try:
+        if not await finish_scheduled_run(id_group_sender, task_id, task_update.status, db):
+            raise HTTPException(status_code=404, detail='Task was not found')
+        return JSONResponse(content={"message": "Success finish run"}, status_code=status.HTTP_200_OK)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail='Database integrity constraint violated')
+
 @router.delete("/task/{id}", status_code=status.HTTP_200_OK)
 async def delete_Task(id: int, db: DBD):
     try:
@@ -136,8 +250,9 @@ async def delete_Task(id: int, db: DBD):
         db_task = result.scalars().first()
         if not db_task:
             raise HTTPException(status_code=404, detail='Task was not found')
-        db.delete(db_task)
+        await db.delete(db_task)
         await db.commit()
+        await incr_count(models.Tasks, -1)
         return JSONResponse(content={"message": "Success delete task"}, status_code=status.HTTP_200_OK)
     except IntegrityError:
         raise HTTPException(status_code=400, detail='Database integrity constraint violated')
@@ -21,6 +21,112 @@ class Settings(BaseSettings):
         The password for MySQL.
     mysql_host : str
         The host for MySQL.
+    client_pool_idle_timeout : int
+        Seconds after which an unused pooled Telegram client is disconnected.
+    client_pool_health_check_interval : int
+        Seconds between authorization checks of a pooled Telegram client.
+    peer_cache_ttl : int
+        Seconds a resolved group peer is kept in the peer cache.
+    celery_visibility_timeout : int
+        Seconds the Redis broker waits before redelivering an unacknowledged or scheduled task.
+    rate_limit_account_per_minute : float
+        Default messages per minute of an account without its own `rate_limit`.
+    rate_limit_account_burst : int
+        Messages an account may send back to back before the rate applies.
+    rate_limit_group_per_minute : float
+        Messages per minute a single group may receive from all accounts.
+    rate_limit_group_burst : int
+        Messages a group may receive back to back before the rate applies.
+    rate_limit_min_factor : float
+        Lowest factor the adaptive limiter may apply to an account rate.
+    rate_limit_decrease_factor : float
+        Multiplier applied to the account rate after a flood error.
+    rate_limit_increase_step : float
+        Amount added back to the account rate factor after each successful send.
+    flood_wait_account_threshold : int
+        Flood waits of at least this many seconds block the whole account instead of a single group.
+    flood_inline_wait_max : int
+        Longest account block, in seconds, a cycle waits for before deferring the group send instead.
+    peer_flood_defer_seconds : int
+        Seconds a group send is deferred after a `PeerFloodError`, which carries no wait time.
+    flood_defer_max_attempts : int
+        Number of times a deferred group send is retried before it is recorded as failed.
+    api_base_url : str
+        Base URL the workers use to call the API.
+    api_timeout : float
+        Seconds before a worker call to the API times out.
+    api_retries : int
+        Number of retries of a worker call to the API after a transient failure.
+    api_retry_backoff : float
+        Base delay in seconds of the exponential backoff between retries.
+    api_pool_size : int
+        Number of keep-alive connections a worker process keeps to the API.
+    worker_db_mode : str
+        How workers store their results: "direct" writes to MySQL, "http" calls the API.
+    message_cache_ttl : int
+        Seconds a parsed campaign message is kept in the message cache.
+    history_buffer_size : int
+        Number of history records a worker buffers before writing them in one request.
+    history_buffer_max_age : float
+        Seconds after which buffered history records are written even if the buffer is not full.
+    checkpoint_ttl : int
+        Seconds the progress checkpoint of a campaign is kept after its last update.
+    stop_grace_period : int
+        Seconds a campaign chain has to stop by itself before its task is terminated.
+    negative_cache_permanent_ttl : int
+        Seconds a group that permanently rejects sends (deleted, banned) is skipped.
+    negative_cache_transient_ttl : int
+        Seconds a group that temporarily rejects sends (writing restricted) is skipped.
+    media_max_size : int
+        Largest media file, in bytes, that may be attached to a campaign.
+    media_ref_ttl : int
+        Seconds the Telegram reference of an uploaded campaign media file is reused.
+    media_upload_ttl : int
+        Seconds an uploaded media file is reused before the first send returns its reference.
+    telegram_session_store : str
+        Where the Telegram sessions are kept: "file" in session files (the default), "db" in the encrypted
+        session table.
+    session_encryption_key : str
+        Fernet key encrypting the stored Telegram sessions, required when telegram_session_store is "db".
+        The workers refuse to load a session without it.
+    worker_api_token : str
+        Shared secret the workers send in the X-Worker-Token header to the internal endpoints handing
+        out account secrets. Those endpoints refuse every request when it is empty.
+    worker_warmup_enabled : bool
+        Whether a new worker process connects clients and fills the caches before accepting tasks.
+    worker_warmup_max_accounts : int
+        Number of accounts with a running campaign a worker process connects when it starts.
+    worker_warmup_max_peers : int
+        Number of uncached groups a worker process resolves when it starts.
+    worker_warmup_timeout : int
+        Seconds after which the warm-up stops and the worker process accepts tasks.
+    bulk_max_campaigns : int
+        Largest number of campaigns accepted by one bulk campaign request.
+    scheduler_interval : int
+        Seconds between two dispatches of the due recurring campaigns by Celery beat.
+    scheduler_batch_size : int
+        Number of due schedules claimed by one dispatcher transaction.
+    counter_ttl : int
+        Seconds a cached row counter is kept without being reconciled.
+    counter_reconcile_interval : int
+        Seconds between two resets of the cached row counters from SQL COUNT(*).
+    history_export_batch_size : int
+        Number of history rows fetched from the server-side cursor at a time by the history export.
+    rollup_interval : int
+        Seconds between two runs of the job adding the new history rows to the delivery rollups.
+    rollup_batch_size : int
+        Number of history rows added to the rollups by one transaction.
+    rollup_lag : int
+        Age in seconds a history row must reach before it is added to the rollups.
+    db_pool_size : int
+        Number of MySQL connections kept open by the engine of every process (uvicorn worker or Celery child).
+        The processes of all the services times db_pool_size + db_max_overflow must stay under the MySQL max_connections.
+    db_max_overflow : int
+        Number of connections a process can open above db_pool_size under load, closed when given back.
+    db_pool_timeout : int
+        Seconds a request waits for a free connection before failing.
+    db_pool_recycle : int
+        Age in seconds after which a connection is replaced, kept under the MySQL wait_timeout.
     """
     main_url: str
     mysql_root_password: str
@@ -35,7 +141,76 @@ class Settings(BaseSettings):
     redis_password: str
     
     secret_auth: str
-    
-    
+
+    client_pool_idle_timeout: int = 900
+    client_pool_health_check_interval: int = 60
+    peer_cache_ttl: int = 604800
+    celery_visibility_timeout: int = 86400
+
+    rate_limit_account_per_minute: float = 20
+    rate_limit_account_burst: int = 3
+    rate_limit_group_per_minute: float = 2
+    rate_limit_group_burst: int = 1
+    rate_limit_min_factor: float = 0.05
+    rate_limit_decrease_factor: float = 0.5
+    rate_limit_increase_step: float = 0.02
+
+    flood_wait_account_threshold: int = 300
+    flood_inline_wait_max: int = 30
+    peer_flood_defer_seconds: int = 3600
+    flood_defer_max_attempts: int = 3
+
+    api_base_url: str = "https://www.api.ionrusu114.me"
+    api_timeout: float = 10
+    api_retries: int = 3
+    api_retry_backoff: float = 0.5
+    api_pool_size: int = 10
+
+    worker_db_mode: str = "direct"
+
+    message_cache_ttl: int = 604800
+
+    history_buffer_size: int = 50
+    history_buffer_max_age: float = 10
+
+    checkpoint_ttl: int = 604800
+
+    stop_grace_period: int = 10
+
+    negative_cache_permanent_ttl: int = 604800
+    negative_cache_transient_ttl: int = 3600
+
+    media_max_size: int = 20971520
+    media_ref_ttl: int = 86400
+    media_upload_ttl: int = 3600
+
+    telegram_session_store: str = "file"
+    session_encryption_key: str = ""
+    worker_api_token: str = ""
+
+    worker_warmup_enabled: bool = True
+    worker_warmup_max_accounts: int = 10
+    worker_warmup_max_peers: int = 50
+    worker_warmup_timeout: int = 60
+
+    bulk_max_campaigns: int = 500
+
+    scheduler_interval: int = 5
+    scheduler_batch_size: int = 100
+
+    counter_ttl: int = 3600
+    counter_reconcile_interval: int = 300
+
+    history_export_batch_size: int = 1000
+
+    rollup_interval: int = 60
+    rollup_batch_size: int = 20000
+    rollup_lag: int = 30
+
+    db_pool_size: int = 5
+    db_max_overflow: int = 5
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+
 
 settings = Settings()
@@ -15,25 +15,47 @@ Functions:
 - Sender(api_id: int, api_hash: str, phone_number: str, groups: List[Dict[int, str]], id_group_sender: int, id_account: int, message: str) -> str:
     Initializes the Telegram client and calls the Loop_Message function to send messages to the groups.
 """
+import logging
 from telethon import TelegramClient
-from telethon.errors.rpcerrorlist import PeerFloodError
-from telethon.tl.functions.messages import SendMessageRequest
-from telethon.tl.types import InputPeerChannel
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException
-from pera_fastapi.models.database import get_db
-from pera_fastapi.models.schemas import GroupSelect, HistoryBase, StatusHistory
+from telethon.errors.rpcerrorlist import FloodWaitError, PeerFloodError
+from pera_fastapi.models.schemas import StatusHistory
 from datetime import datetime
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 import asyncio
-from pera_fastapi.settings import settings
-from typing import Dict, List,Annotated
-from pera_fastapi.routes.history_routes import create_history
-import asyncio
-from .requests import call_create_history
+from typing import Dict, List
+from .history_buffer import history_buffer
+from .peer_cache import INVALID_PEER_ERRORS, invalidate_peer, resolve_peer_async
+from .rate_limiter import rate_limiter
+from .message_cache import ParsedMessage, build_send_request, get_message
+from .negative_cache import is_stale_peer, negative_cache
+
+logger = logging.getLogger(__name__)
 
 
-async def send_message(client: TelegramClient, group_name: str, group_id: int, account_id: int, id_group_sender: int, message: str):
+async def send_to_peer(client: TelegramClient, group_name: str, account_id: int, message: ParsedMessage):
+    """
+    Resolve a group and send the message to it.
+
+    An invalid or unknown peer may be a stale cached access hash or an entity missing from the
+    account's session: the cached peer is dropped and the group resolved and sent to once more.
+    """
+    for attempt in range(2):
+        try:
+            peer = await resolve_peer_async(client, account_id, group_name)
+            if message.raw:
+                await client(build_send_request(peer, message))
+            else:
+                await client.send_message(
+                    entity=peer,
+                    message=message.html,
+                    parse_mode='html',
+                )
+            return
+        except Exception as e:
+            if attempt or not is_stale_peer(e):
+                raise
+            invalidate_peer(account_id, group_name)
+
+async def send_message(client: TelegramClient, group_name: str, group_id: int, account_id: int, id_group_sender: int, message: ParsedMessage):
     """
     Sends a message to a Telegram group using the given TelegramClient instance.
 
@@ -43,7 +65,7 @@ async def send_message(client: TelegramClient, group_name: str, group_id: int, a
         group_id (int): The ID of the Telegram group to send the message to.
         account_id (int): The ID of the Telegram account that is sending the message.
         id_group_sender (int): The ID of the group sender.
-        message (str): The message to send.
+        message (ParsedMessage): The parsed message to send.
 
     Raises:
         PeerFloodError: If too many requests are made to the Telegram API.
@@ -51,14 +73,9 @@ async def send_message(client: TelegramClient, group_name: str, group_id: int, a
     Returns:
         None
     """
-    group = await client.get_entity(group_name)
     try:
-        # await client(SendMessageRequest(peer=InputPeerChannel(group.id, group.access_hash), message=message))
-        await client.send_message(
-            entity=InputPeerChannel(group.id, group.access_hash),
-            message=message,
-            parse_mode='html',
-        )
+        await send_to_peer(client, group_name, account_id, message)
+        rate_limiter.on_success(account_id)
 
         history_json = {
             "id_group": group_id,
@@ -68,16 +85,25 @@ async def send_message(client: TelegramClient, group_name: str, group_id: int, a
             "created_at": str(datetime.now()),
         }
         print(f'history_json: {history_json}')
-        rs_history = call_create_history(history_json)
-        print(f'rs_history: {rs_history}')
+        history_buffer.add(history_json)
 
         
+    except FloodWaitError as e:
+        rate_limiter.on_flood(account_id, e.seconds)
+        logger.warning("Too many requests, wait %s seconds", e.seconds)
     except PeerFloodError:
-        print('Error: Too many requests')
+        rate_limiter.on_flood(account_id)
+        logger.warning("Too many requests")
+    except Exception as e:
+        if isinstance(e, INVALID_PEER_ERRORS):
+            invalidate_peer(account_id, group_name)
+        if negative_cache.record(group_id, account_id, group_name, e) is None:
+            raise
+        logger.info("Unavailable group %s -> %s", group_name, e)
 
 async def Loop_Message(account_id: int, api_id: int, api_hash: str, phone_number: str, groups: List[Dict[int, str]], id_group_sender: int, client: TelegramClient, message: str):
     """
-    Sends a message to multiple Telegram groups, with a delay of 5 seconds between each message.
+    Sends a message to multiple Telegram groups, paced by the account and group rate limiter.
 
     Args:
         account_id (int): The ID of the Telegram account.
@@ -98,11 +124,20 @@ async def Loop_Message(account_id: int, api_id: int, api_hash: str, phone_number
     try:
         # await client.connect()
         flag_history_status = True
+        parsed = get_message(id_group_sender, message)
         for group in groups:
             print(f'group: {group}')
-            await asyncio.sleep(3)
-            await send_message(client, group.get('name'), group.get('id_group'), account_id, id_group_sender, message)
-            await asyncio.sleep(3)
+            if negative_cache.lookup(group.get('id_group'), account_id) is not None:
+                history_buffer.add({
+                    "id_group": group.get('id_group'),
+                    "id_account": account_id,
+                    "id_group_sender": id_group_sender,
+                    "status": StatusHistory.skipped,
+                    "created_at": str(datetime.now()),
+                })
+                continue
+            await rate_limiter.acquire_async(account_id, group.get('id_group'))
+            await send_message(client, group.get('name'), group.get('id_group'), account_id, id_group_sender, parsed)
             print('Message sent to', group_name)
         await client.disconnect()
     except Exception as e:
@@ -138,6 +173,7 @@ async def Sender(api_id: int, api_hash: str, phone_number: str, groups: List[Dic
     except Exception as e:
         print(f"An error occurred: Sender interior -> {e}")
     finally:
+        history_buffer.flush()
         await client.disconnect()
     return "Success"
 
@@ -16,23 +16,80 @@ Functions:
     Initializes the Telegram client and calls the Loop_Message function to send messages to the groups.
 """
 # from telethon import TelegramClient
+import logging
 from telethon.sync import TelegramClient
-from telethon.errors.rpcerrorlist import PeerFloodError
-from telethon.tl.functions.messages import SendMessageRequest
-from telethon.tl.types import InputPeerChannel
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException
-from pera_fastapi.models.database import get_db
-from pera_fastapi.models.schemas import GroupSelect, HistoryBase, StatusHistory
+from telethon.errors.rpcerrorlist import FloodWaitError, PeerFloodError, SlowModeWaitError
+from celery import current_app
+from pera_fastapi.models.schemas import StatusHistory
 from datetime import datetime
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
 
 from pera_fastapi.settings import settings
-from typing import Dict, List,Annotated
-from pera_fastapi.routes.history_routes import create_history
+from typing import Dict, List, Optional, Set
 
-from .requests import call_create_history
-import time
+from .history_buffer import history_buffer
+from .client_pool import client_pool
+from .peer_cache import INVALID_PEER_ERRORS, invalidate_peer, resolve_peer
+from .rate_limiter import rate_limiter
+from .message_cache import ParsedMessage, build_send_media_request, build_send_request, get_message
+from .media_cache import MEDIA_REFERENCE_ERRORS, media_cache
+from .checkpoints import CampaignProgress
+from .stop_flag import CampaignStopped, StopFlag
+from .negative_cache import GroupUnavailable, is_stale_peer, negative_cache
+
+logger = logging.getLogger(__name__)
+
+DEFERRABLE_ERRORS = (FloodWaitError, PeerFloodError, SlowModeWaitError)
+
+
+def send_media(client: TelegramClient, peer, account_id: int, message: ParsedMessage):
+    """
+    Send a message as the caption of its media file, reusing the media already uploaded by the account.
+
+    A cached reference that Telegram rejects as expired is dropped and the file is uploaded again once.
+    """
+    for attempt in range(2):
+        media, sha256 = media_cache.get_input_media(client, account_id, message.id_media)
+        try:
+            if message.raw:
+                result = client(build_send_media_request(peer, media, message))
+            else:
+                result = client.send_file(peer, media, caption=message.html, parse_mode='html')
+        except MEDIA_REFERENCE_ERRORS:
+            media_cache.invalidate(account_id, message.id_media, sha256)
+            if attempt:
+                raise
+            continue
+        media_cache.remember(account_id, message.id_media, sha256, result)
+        return
+
+
+def send_to_peer(client: TelegramClient, group_name: str, account_id: int, message: ParsedMessage):
+    """
+    Resolve a group and send the message to it.
+
+    An invalid or unknown peer may be a stale cached access hash or an entity missing from the
+    account's session: the cached peer is dropped and the group resolved and sent to once more.
+    """
+    for attempt in range(2):
+        try:
+            peer = resolve_peer(client, account_id, group_name)
+            if message.id_media is not None:
+                send_media(client, peer, account_id, message)
+            elif message.raw:
+                client(build_send_request(peer, message))
+            else:
+                client.send_message(
+                    entity=peer,
+                    message=message.html,
+                    parse_mode='html',
+                    link_preview=False
+                )
+            return
+        except Exception as e:
+            if attempt or not is_stale_peer(e):
+                raise
+            invalidate_peer(account_id, group_name)
 
 
 def send_message(
@@ -41,30 +98,111 @@ def send_message(
     group_id: int, 
     account_id: int, 
     id_group_sender: int, 
-    message: str):
+    message: ParsedMessage):
     
-    group = client.get_entity(group_name)
     try:
-        client.send_message(
-            entity=InputPeerChannel(group.id, group.access_hash),
-            message=message,
-            parse_mode='html',
-            link_preview=False
-        )
-        history_json = {
-            "id_group": group_id,
-            "id_account": account_id,
-            "id_group_sender": id_group_sender,
-            "status": StatusHistory.success,
-            "created_at": str(datetime.now()),
-        }
-        rs_history = call_create_history(history_json)
-        print(f'rs_history: {rs_history}')
+        send_to_peer(client, group_name, account_id, message)
+        rate_limiter.on_success(account_id)
+        history_buffer.add(history_row(group_id, account_id, id_group_sender, StatusHistory.success))
      
+    except FloodWaitError as e:
+        rate_limiter.on_flood(account_id, e.seconds, group_id)
+        raise
     except PeerFloodError:
-        raise HTTPException(status_code=429, detail="Too many requests to the Telegram API.")
+        rate_limiter.on_flood(account_id)
+        raise
+    except SlowModeWaitError:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        if isinstance(e, INVALID_PEER_ERRORS):
+            invalidate_peer(account_id, group_name)
+        if negative_cache.record(group_id, account_id, group_name, e) is None:
+            raise
+        history_buffer.add(history_row(group_id, account_id, id_group_sender, StatusHistory.failed))
+        raise GroupUnavailable(f"{group_name}: {e}") from e
+
+
+def history_row(group_id: int, account_id: int, id_group_sender: int, status: StatusHistory) -> Dict:
+    """
+    Build a history record of a group send.
+
+    Args:
+        group_id (int): The ID of the group.
+        account_id (int): The ID of the sending account.
+        id_group_sender (int): The ID of the group sender.
+        status (StatusHistory): The outcome of the send.
+
+    Returns:
+        Dict: The history record, as accepted by `HistoryBase`.
+    """
+    return {
+        "id_group": group_id,
+        "id_account": account_id,
+        "id_group_sender": id_group_sender,
+        "status": status,
+        "created_at": str(datetime.now()),
+    }
+
+
+def skip_unavailable_group(group_id: int, account_id: int, id_group_sender: int) -> bool:
+    """
+    Check the negative cache before sending to a group, recording a skipped send on a hit.
+
+    Args:
+        group_id (int): The ID of the group.
+        account_id (int): The ID of the sending account.
+        id_group_sender (int): The ID of the group sender.
+
+    Returns:
+        bool: True when the group must be skipped.
+    """
+    if negative_cache.lookup(group_id, account_id) is None:
+        return False
+    history_buffer.add(history_row(group_id, account_id, id_group_sender, StatusHistory.skipped))
+    return True
+
+def defer_seconds(error: Exception) -> int:
+    """
+    Get the number of seconds Telegram asked to wait before sending again.
+
+    Args:
+        error (Exception): A `FloodWaitError`, `SlowModeWaitError` or `PeerFloodError`.
+
+    Returns:
+        int: The seconds to defer the send by.
+    """
+    seconds = getattr(error, 'seconds', None)
+    return int(seconds) if seconds else settings.peer_flood_defer_seconds
+
+
+def defer_group_send(
+    account: Dict,
+    group: Dict[int, str],
+    id_group_sender: int,
+    message: str,
+    seconds: float,
+    attempt: int = 1,
+    task_id: Optional[str] = None):
+    """
+    Schedule a single group send to be retried after `seconds`, without holding the worker.
+
+    Args:
+        account (Dict): The account data (`id`, `telegram_id`, `telegram_hash`, `phone`, `rate_limit`).
+        group (Dict[int, str]): The group (`id_group`, `name`) to send to.
+        id_group_sender (int): The ID of the group sender.
+        message (str): The HTML message, empty to use the cached parsed message.
+        seconds (float): The seconds to wait before retrying.
+        attempt (int): The number of the retry.
+        task_id (Optional[str]): The task ID of the campaign chain, whose stop flag cancels the retry.
+    """
+    logger.info("Deferring send to %s by %ss (attempt %s)", group.get('name'), seconds, attempt)
+    current_app.send_task(
+        "tasks.send_deferred_group",
+        args=(account, message, group, id_group_sender, attempt),
+        kwargs={"task_id": task_id},
+        countdown=seconds + 1,
+    )
+
 
 def Sender_simple(
     api_id: int, 
@@ -73,14 +211,33 @@ def Sender_simple(
     groups: List[Dict[int, str]], 
     id_group_sender: int, 
     id_account: int, 
-    message: str):
-    
+    message: str,
+    rate_limit: Optional[float] = None,
+    progress: Optional[CampaignProgress] = None,
+    sent: Optional[Set[int]] = None,
+    stop: Optional[StopFlag] = None):
+    """
+    Send one cycle of a campaign to every group.
+
+    When a `progress` checkpoint is given, every group is recorded once it was sent or deferred, and
+    the groups in `sent` (already handled by an interrupted run of the same cycle) are skipped.
+    When a `stop` flag is given, it is checked before every group and interrupts the rate limiter
+    waits, and `CampaignStopped` is raised once a stop is requested.
+    Groups in the negative cache are skipped, and a group failing with a cached error does not end the cycle.
+    Any other error ends the cycle: it is recorded as a failed send and raised again, so the cycle is
+    not taken for done.
+    """
+    sent = sent or set()
+    account = {
+        "id": id_account,
+        "telegram_id": api_id,
+        "telegram_hash": api_hash,
+        "phone": phone_number,
+        "rate_limit": rate_limit,
+    }
     try:
-        client = TelegramClient(phone_number, api_id, api_hash)
-        client.connect()
-        if not client.is_user_authorized():
-            client.send_code_request(phone_number)
-            client.sign_in(phone_number, input('Enter the code: '))
+        parsed = get_message(id_group_sender, message)
+        client = client_pool.acquire(id_account, api_id, api_hash, phone_number)
     
         group_name = ""
         group_id = 0      
@@ -88,24 +245,89 @@ def Sender_simple(
         for group in groups:
             group_name = group.get('name')
             group_id = group.get('id_group')
-            send_message(client, group_name, group_id, id_account, id_group_sender, message)
-            time.sleep(5)
-        client.disconnect()
+            if group_id in sent:
+                continue
+            if stop is not None:
+                stop.check()
+            if skip_unavailable_group(group_id, id_account, id_group_sender):
+                if progress is not None:
+                    progress.mark_sent(group_id)
+                continue
+            blocked_for = rate_limiter.blocked_for(id_account, group_id)
+            if blocked_for > settings.flood_inline_wait_max:
+                defer_group_send(account, group, id_group_sender, message, blocked_for, task_id=stop.task_id if stop else None)
+            else:
+                rate_limiter.acquire(id_account, group_id, rate_limit, sleep=stop.sleep if stop else time.sleep)
+                try:
+                    send_message(client, group_name, group_id, id_account, id_group_sender, parsed)
+                except DEFERRABLE_ERRORS as e:
+                    defer_group_send(account, group, id_group_sender, message, defer_seconds(e), task_id=stop.task_id if stop else None)
+                except GroupUnavailable as e:
+                    logger.info("Skipping unavailable group -> %s", e)
+            if progress is not None:
+                progress.mark_sent(group_id)
+    except CampaignStopped:
+        raise
     except Exception as e:
-        print(f"An error occurred: Sender -> {e}")
-        history_json = {
-            "id_group": 99999,
-            "id_account": id_account,
-            "id_group_sender": id_group_sender,
-            "status": StatusHistory.failed,
-            "created_at": str(datetime.now()),
-        }
-        rs_history = call_create_history(history_json)
-        print(f'rs_history: {rs_history}')
-        client.disconnect()
-        
+        logger.warning("An error occurred: Sender -> %s", e)
+        history_buffer.add(history_row(99999, id_account, id_group_sender, StatusHistory.failed))
+        raise
+    finally:
+        history_buffer.flush()
+        client_pool.publish_stats()
 
 
-    
-    
+def Sender_deferred(
+    account: Dict,
+    group: Dict[int, str],
+    id_group_sender: int,
+    message: str,
+    attempt: int,
+    stop: Optional[StopFlag] = None):
+    """
+    Retry a group send that was deferred after a flood error.
+
+    The send is deferred again while Telegram keeps asking to wait, up to
+    `settings.flood_defer_max_attempts` attempts, and then recorded as failed for that group.
+    When a `stop` flag is given, a stop of the campaign chain cancels the retry: the flag is checked
+    before the send, during the rate limiter wait and before deferring it again.
+    """
+    id_account = account.get('id')
+    group_id = group.get('id_group')
+    task_id = stop.task_id if stop else None
+    try:
+        if stop is not None:
+            stop.check()
+        if skip_unavailable_group(group_id, id_account, id_group_sender):
+            return
+        blocked_for = rate_limiter.blocked_for(id_account, group_id)
+        if blocked_for > settings.flood_inline_wait_max:
+            defer_group_send(account, group, id_group_sender, message, blocked_for, attempt, task_id)
+            return
+        parsed = get_message(id_group_sender, message)
+        client = client_pool.acquire(id_account, account.get('telegram_id'), account.get('telegram_hash'), account.get('phone'))
+        rate_limiter.acquire(id_account, group_id, account.get('rate_limit'), sleep=stop.sleep if stop else time.sleep)
+        try:
+            send_message(client, group.get('name'), group_id, id_account, id_group_sender, parsed)
+            return
+        except DEFERRABLE_ERRORS as e:
+            if attempt < settings.flood_defer_max_attempts:
+                if stop is not None:
+                    stop.check()
+                defer_group_send(account, group, id_group_sender, message, defer_seconds(e), attempt + 1, task_id)
+                return
+            logger.warning("Deferred send to %s gave up -> %s", group.get('name'), e)
+    except CampaignStopped:
+        logger.info("Deferred send to %s cancelled, the campaign was stopped", group.get('name'))
+        return
+    except GroupUnavailable as e:
+        logger.info("Skipping unavailable group -> %s", e)
+        return
+    except Exception as e:
+        logger.warning("An error occurred: deferred send to %s -> %s", group.get('name'), e)
+    finally:
+        history_buffer.flush()
+        client_pool.publish_stats()
 
+    history_buffer.add(history_row(group_id, id_account, id_group_sender, StatusHistory.failed))
+    history_buffer.flush()
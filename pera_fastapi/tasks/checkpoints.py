@@ -0,0 +1,161 @@
+"""
+This module contains the progress checkpoints of running campaigns.
+
+Every campaign chain (one per account, so every shard of a sharded campaign has its own) keeps a
+Redis hash under `pera:campaign:progress:<id_group_senders>:<id_account>` (followed by `:<run>` for
+the runs of a recurring campaign, which all start at the same cycle) holding:
+
+- `cycle`: the remaining executions when the current cycle started, which identifies the cycle;
+- `state`: the task arguments, used to resume the chain after it was stopped or lost. The account
+  is kept as its ID only, its credentials are loaded again on resume;
+- `group:<id_group>`: one field per group already handled in the current cycle;
+- `done`: set once every group of the cycle was handled;
+- `closed`: set once the next cycle was published or the campaign was finished.
+
+A redelivered or resumed cycle skips the groups already handled, a cycle whose groups were all
+handled is not sent again, and a closed cycle is not scheduled twice.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY_PREFIX = "pera:campaign:progress:"
+GROUP_FIELD_PREFIX = "group:"
+
+
+def progress_key(id_group_senders: int, id_account: int, run: Optional[str] = None) -> str:
+    """
+    Get the Redis key of the progress checkpoint of a campaign chain.
+
+    Args:
+        id_group_senders (int): The ID of the group sender of the campaign.
+        id_account (int): The account running the chain.
+        run (Optional[str]): The scheduled run of a recurring campaign, if any.
+
+    Returns:
+        str: The Redis key.
+    """
+    key = f"{PROGRESS_KEY_PREFIX}{id_group_senders}:{id_account}"
+    return f"{key}:{run}" if run else key
+
+
+@dataclass
+class Checkpoint:
+    """
+    The progress of a campaign chain.
+
+    Attributes:
+        cycle (int): The remaining executions when the cycle started.
+        state (Dict): The task arguments of the chain.
+        sent (Set[int]): The groups already handled in the cycle.
+        done (bool): True when every group of the cycle was handled.
+        closed (bool): True when the next cycle was published or the campaign was finished.
+    """
+    cycle: int
+    state: Dict = field(default_factory=dict)
+    sent: Set[int] = field(default_factory=set)
+    done: bool = False
+    closed: bool = False
+
+    @property
+    def id_account(self) -> Optional[int]:
+        """ The account running the chain, also read from the checkpoints that stored the whole account. """
+        return self.state.get("id_account", self.state.get("account", {}).get("id"))
+
+    @classmethod
+    def from_hash(cls, data: Dict[str, str]) -> "Checkpoint":
+        return cls(
+            cycle=int(data.get("cycle", 0)),
+            state=json.loads(data.get("state", "{}")),
+            sent={int(key[len(GROUP_FIELD_PREFIX):]) for key in data if key.startswith(GROUP_FIELD_PREFIX)},
+            done=data.get("done") == "1",
+            closed=data.get("closed") == "1",
+        )
+
+
+class CampaignProgress:
+    """
+    The progress checkpoint of one campaign chain.
+    """
+
+    def __init__(self, id_group_senders: int, id_account: int, run: Optional[str] = None):
+        self.key = progress_key(id_group_senders, id_account, run)
+
+    def load(self) -> Optional[Checkpoint]:
+        """
+        Get the checkpoint.
+
+        Returns:
+            Optional[Checkpoint]: The checkpoint, or None when the chain has none.
+        """
+        data = r.hgetall(self.key)
+        return Checkpoint.from_hash(data) if data else None
+
+    def start_cycle(self, cycle: int, state: Dict) -> Checkpoint:
+        """
+        Start a cycle, or pick up the checkpoint when the cycle was already started.
+
+        Args:
+            cycle (int): The remaining executions of the chain.
+            state (Dict): The task arguments of the chain.
+
+        Returns:
+            Checkpoint: The checkpoint of the cycle, empty when the cycle is new.
+        """
+        checkpoint = self.load()
+        if checkpoint is not None and checkpoint.cycle == cycle:
+            logger.info("Resuming %s at cycle %s, %s groups already sent", self.key, cycle, len(checkpoint.sent))
+            r.hset(self.key, "state", json.dumps(state, default=str))
+            checkpoint.state = state
+            return checkpoint
+
+        pipe = r.pipeline()
+        pipe.delete(self.key)
+        pipe.hset(self.key, mapping={"cycle": cycle, "state": json.dumps(state, default=str)})
+        pipe.expire(self.key, settings.checkpoint_ttl)
+        pipe.execute()
+        return Checkpoint(cycle=cycle, state=state)
+
+    def mark_sent(self, id_group: int):
+        """
+        Record that a group of the current cycle was handled.
+
+        Args:
+            id_group (int): The ID of the group.
+        """
+        r.hset(self.key, f"{GROUP_FIELD_PREFIX}{id_group}", 1)
+
+    def mark_done(self):
+        """ Record that every group of the current cycle was handled. """
+        r.hset(self.key, "done", 1)
+
+    def mark_closed(self):
+        """ Record that the next cycle was published or the campaign was finished. """
+        pipe = r.pipeline()
+        pipe.hset(self.key, "closed", 1)
+        pipe.expire(self.key, settings.checkpoint_ttl)
+        pipe.execute()
+
+
+def get_campaign_progress(id_group_senders: int) -> List[Checkpoint]:
+    """
+    Get the checkpoints of every chain of a campaign.
+
+    Args:
+        id_group_senders (int): The ID of the group sender of the campaign.
+
+    Returns:
+        List[Checkpoint]: The checkpoints, one per account running the campaign or per scheduled run.
+    """
+    checkpoints = []
+    for key in r.scan_iter(match=f"{PROGRESS_KEY_PREFIX}{id_group_senders}:*"):
+        data = r.hgetall(key)
+        if data:
+            checkpoints.append(Checkpoint.from_hash(data))
+    return checkpoints
@@ -0,0 +1,294 @@
+"""
+This module contains the worker-level pool of Telegram clients.
+
+Every Celery worker process keeps one connected `TelegramClient` per account and reuses it
+across cycles and campaigns, so a cycle does not pay for the MTProto handshake and the session
+load again. Sessions come from the session store and are written back when they change. Clients are health-checked before reuse, disconnected after
+`settings.client_pool_idle_timeout` seconds without use and closed when the worker process shuts down.
+
+Idle clients are reaped on every acquire, when the stats are published and by a reaper thread started
+with the worker process, so a process that stops receiving tasks does not keep its Telegram connections
+open. The reaper only runs between tasks, never while a task may be using a client.
+
+The pool counters (hits, misses, connect latency), with the MySQL connection pool counters of the
+process prefixed by `db_`, are published to Redis under `pera:client_pool:<hostname>:<pid>` and can be read with `GET /api/telegram/tasks/pool/stats`.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+from celery.signals import task_postrun, task_prerun, worker_process_init, worker_process_shutdown
+from telethon.sync import TelegramClient
+
+from pera_fastapi.models.database import pool_stats
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+from .session_store import load_session, save_session
+
+logger = logging.getLogger(__name__)
+
+POOL_STATS_KEY_PREFIX = "pera:client_pool:"
+POOL_STATS_TTL = 3600
+REAPER_MIN_INTERVAL = 30
+
+
+@dataclass
+class PooledClient:
+    """
+    A connected client kept in the pool.
+
+    Attributes:
+        client (TelegramClient): The connected Telegram client.
+        phone_number (str): The phone number (session name) of the account.
+        last_used (float): Monotonic time of the last acquire.
+        last_checked (float): Monotonic time of the last authorization check.
+    """
+    client: TelegramClient
+    phone_number: str
+    last_used: float
+    last_checked: float
+
+
+class ClientPool:
+    """
+    Pool of connected Telegram clients keyed by account ID.
+    """
+
+    def __init__(self, idle_timeout: int, health_check_interval: int):
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._clients: Dict[int, PooledClient] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connect_count = 0
+        self.connect_time_total = 0.0
+        self.connect_time_last = 0.0
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._reaper_stop = threading.Event()
+
+    def acquire(self, id_account: int, api_id: int, api_hash: str, phone_number: str,
+                interactive: bool = True) -> TelegramClient:
+        """
+        Get a connected and authorized client for an account, connecting it on first use.
+
+        Args:
+            id_account (int): The ID of the account.
+            api_id (int): The Telegram API ID of the account.
+            api_hash (str): The Telegram API hash of the account.
+            phone_number (str): The phone number of the account, used as session name.
+            interactive (bool): Ask for a login code when the session is not authorized.
+
+        Returns:
+            TelegramClient: The connected client.
+
+        Raises:
+            PermissionError: If the session is not authorized and `interactive` is False.
+        """
+        self.reap_idle()
+        entry = self._clients.get(id_account)
+        if entry is not None and entry.phone_number == phone_number and self._is_healthy(entry):
+            self.hits += 1
+            entry.last_used = time.monotonic()
+            self._save_session(id_account, entry)
+            return entry.client
+
+        if entry is not None:
+            self.discard(id_account)
+
+        self.misses += 1
+        client = self._connect(id_account, api_id, api_hash, phone_number, interactive)
+        now = time.monotonic()
+        entry = PooledClient(client, phone_number, now, now)
+        self._clients[id_account] = entry
+        self._save_session(id_account, entry)
+        return client
+
+    def _connect(self, id_account: int, api_id: int, api_hash: str, phone_number: str,
+                 interactive: bool = True) -> TelegramClient:
+        started = time.monotonic()
+        client = TelegramClient(load_session(id_account, phone_number), api_id, api_hash)
+        client.connect()
+        if not client.is_user_authorized():
+            if not interactive:
+                client.disconnect()
+                raise PermissionError(f"The session of {phone_number} is not authorized")
+            client.send_code_request(phone_number)
+            client.sign_in(phone_number, input('Enter the code: '))
+
+        elapsed = time.monotonic() - started
+        self.connect_count += 1
+        self.connect_time_total += elapsed
+        self.connect_time_last = elapsed
+        logger.info("Telegram client %s connected in %.3fs", phone_number, elapsed)
+        return client
+
+    def _is_healthy(self, entry: PooledClient) -> bool:
+        if not entry.client.is_connected():
+            return False
+        now = time.monotonic()
+        if now - entry.last_checked < self.health_check_interval:
+            return True
+        try:
+            authorized = entry.client.is_user_authorized()
+        except Exception as e:
+            logger.warning("Health check failed for %s: %s", entry.phone_number, e)
+            return False
+        entry.last_checked = now
+        return authorized
+
+    def discard(self, id_account: int):
+        """
+        Disconnect and remove the client of an account from the pool.
+
+        Args:
+            id_account (int): The ID of the account.
+        """
+        entry = self._clients.pop(id_account, None)
+        if entry is None:
+            return
+        self.evictions += 1
+        try:
+            entry.client.disconnect()
+        except Exception as e:
+            logger.warning("Disconnect failed for %s: %s", entry.phone_number, e)
+        self._save_session(id_account, entry)
+
+    def _save_session(self, id_account: int, entry: PooledClient):
+        # Called outside the client's event loop, where the session store may block on the database.
+        try:
+            save_session(id_account, entry.client.session)
+        except Exception as e:
+            logger.warning("Could not store the session of %s: %s", entry.phone_number, e)
+
+    def reap_idle(self):
+        """
+        Disconnect the clients that were not used for longer than the idle timeout.
+        """
+        now = time.monotonic()
+        idle = [id_account for id_account, entry in self._clients.items()
+                if now - entry.last_used > self.idle_timeout]
+        for id_account in idle:
+            self.discard(id_account)
+
+    def task_started(self):
+        """
+        Mark a task as running in this process, so the reaper thread leaves the clients alone.
+        """
+        with self._lock:
+            self._busy += 1
+
+    def task_finished(self):
+        """
+        Mark a task of this process as finished.
+        """
+        with self._lock:
+            self._busy = max(self._busy - 1, 0)
+
+    def start_reaper(self):
+        """
+        Start the thread reaping the idle clients while no task is running.
+
+        Telethon sync clients run on the event loop of the thread that created them, so the
+        reaper uses that loop, and holds the pool lock so no task starts while it disconnects.
+        """
+        self._reaper_stop.clear()
+        loop = asyncio.get_event_loop()
+        interval = max(self.idle_timeout / 2, REAPER_MIN_INTERVAL)
+
+        def run():
+            asyncio.set_event_loop(loop)
+            while not self._reaper_stop.wait(interval):
+                with self._lock:
+                    if self._busy or loop.is_running():
+                        continue
+                    try:
+                        self.reap_idle()
+                    except Exception as e:
+                        logger.warning("Could not reap the idle clients: %s", e)
+
+        threading.Thread(target=run, name="client-pool-reaper", daemon=True).start()
+
+    def stop_reaper(self):
+        """
+        Stop the reaper thread.
+        """
+        self._reaper_stop.set()
+
+    def close_all(self):
+        """
+        Disconnect every pooled client.
+        """
+        for id_account in list(self._clients):
+            self.discard(id_account)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the pool counters.
+
+        Returns:
+            Dict[str, float]: The hit/miss counters, the connect latency and the pool size.
+        """
+        requests_total = self.hits + self.misses
+        return {
+            "size": len(self._clients),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests_total, 4) if requests_total else 0.0,
+            "evictions": self.evictions,
+            "connect_count": self.connect_count,
+            "connect_time_last": round(self.connect_time_last, 4),
+            "connect_time_avg": round(self.connect_time_total / self.connect_count, 4) if self.connect_count else 0.0,
+        }
+
+    def publish_stats(self):
+        """
+        Publish the pool counters of this worker process to Redis, after reaping the idle clients.
+        """
+        self.reap_idle()
+        key = f"{POOL_STATS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+        try:
+            pipe = r.pipeline()
+            db_stats = {f"db_{name}": value for name, value in pool_stats().items()}
+            pipe.hset(key, mapping={**self.stats(), **db_stats})
+            pipe.expire(key, POOL_STATS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Could not publish client pool stats: %s", e)
+
+
+client_pool = ClientPool(
+    idle_timeout=settings.client_pool_idle_timeout,
+    health_check_interval=settings.client_pool_health_check_interval,
+)
+
+
+@worker_process_init.connect
+def start_client_pool_reaper(**kwargs):
+    """ Start reaping the idle clients of the worker process. """
+    client_pool.start_reaper()
+
+
+@task_prerun.connect
+def mark_client_pool_busy(**kwargs):
+    """ Keep the reaper away from the clients while a task runs. """
+    client_pool.task_started()
+
+
+@task_postrun.connect
+def mark_client_pool_idle(**kwargs):
+    """ Let the reaper disconnect the idle clients once the task is done. """
+    client_pool.task_finished()
+
+
+@worker_process_shutdown.connect
+def close_client_pool(**kwargs):
+    """ Disconnect the pooled clients when the worker process exits. """
+    client_pool.stop_reaper()
+    client_pool.close_all()
@@ -0,0 +1,85 @@
+"""
+This module contains the buffer that batches the history records written by the workers.
+
+Instead of one request and one transaction per sent message, records are collected and written
+with a single bulk request once `settings.history_buffer_size` records are buffered or the oldest
+record is `settings.history_buffer_max_age` seconds old. The senders flush the buffer when a cycle
+ends, and the buffer is flushed when the worker process shuts down.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from celery.signals import worker_process_shutdown
+
+from pera_fastapi.settings import settings
+from .worker_db import create_histories
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryBuffer:
+    """
+    Buffer of history records flushed by size, by age or on demand.
+    """
+
+    def __init__(self, max_size: int, max_age: float, write: Callable[[List[Dict]], object]):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._write = write
+        self._rows: List[Dict] = []
+        self._first_added: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, row: Dict):
+        """
+        Add a history record, flushing the buffer when it is full or too old.
+
+        Args:
+            row (Dict): The history record, as accepted by `HistoryBase`.
+        """
+        with self._lock:
+            if not self._rows:
+                self._first_added = time.monotonic()
+            self._rows.append(row)
+            due = len(self._rows) >= self.max_size or time.monotonic() - self._first_added >= self.max_age
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write every buffered history record.
+
+        Records are kept for the next flush when the write fails, up to ten times the buffer size.
+
+        Returns:
+            int: The number of records written.
+        """
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._first_added = None
+        if not rows:
+            return 0
+        try:
+            self._write(rows)
+            return len(rows)
+        except Exception as e:
+            logger.warning("Could not write %s history records: %s", len(rows), e)
+            with self._lock:
+                self._rows = (rows + self._rows)[-self.max_size * 10:]
+                self._first_added = time.monotonic()
+            return 0
+
+
+history_buffer = HistoryBuffer(
+    max_size=settings.history_buffer_size,
+    max_age=settings.history_buffer_max_age,
+    write=create_histories,
+)
+
+
+@worker_process_shutdown.connect
+def flush_history_buffer(**kwargs):
+    """ Write the buffered history records when the worker process exits. """
+    history_buffer.flush()
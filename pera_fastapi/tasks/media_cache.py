@@ -0,0 +1,174 @@
+"""
+This module contains the cache of the campaign media uploaded to Telegram.
+
+A campaign media file is stored once in the `media` table. The first send of an account uploads it
+with `client.upload_file`, and the photo or document Telegram creates from it is stored in Redis
+under `pera:media:ref:<id_account>:<id_media>:<sha256>` (id, access_hash and file_reference), so every
+following group and cycle sends the existing media instead of uploading the file again.
+
+References are keyed by the SHA-256 digest of the file, so replacing the file invalidates them. A
+reference Telegram reports as expired is dropped and the file is uploaded again. The file details
+are cached under `pera:media:info:<id_media>`, which the media routes delete when the file changes.
+"""
+import base64
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+
+from telethon.errors.rpcerrorlist import FilePartMissingError, FileReferenceExpiredError, MediaEmptyError
+from telethon.tl.types import (
+    DocumentAttributeFilename,
+    InputDocument,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaUploadedDocument,
+    InputMediaUploadedPhoto,
+    InputPhoto,
+    MessageMediaDocument,
+    MessageMediaPhoto,
+    TypeInputMedia,
+)
+
+from pera_fastapi.cache_keys import MEDIA_KEY_PREFIX, media_info_key
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+from . import worker_db
+
+logger = logging.getLogger(__name__)
+
+PHOTO_MIME_TYPES = ("image/jpeg", "image/png", "image/webp")
+
+# Errors meaning the cached reference or the uploaded file is no longer valid.
+MEDIA_REFERENCE_ERRORS = (FilePartMissingError, FileReferenceExpiredError, MediaEmptyError)
+
+
+def _ref_key(id_account: int, id_media: int, sha256: str) -> str:
+    return f"{MEDIA_KEY_PREFIX}ref:{id_account}:{id_media}:{sha256}"
+
+
+def _extract_media(result):
+    """ Find the photo or document media in the message or updates returned by a send. """
+    media = getattr(result, "media", None)
+    if media is not None:
+        return media
+    for update in getattr(result, "updates", []):
+        message = getattr(update, "message", None)
+        if getattr(message, "media", None) is not None:
+            return message.media
+    return None
+
+
+class MediaCache:
+    """
+    Cache of the Telegram references of the campaign media files, per account.
+    """
+
+    def __init__(self):
+        self._uploads: Dict[Tuple[int, int, str], Tuple[object, float]] = {}
+        self._lock = threading.Lock()
+
+    def get_info(self, id_media: int) -> Dict[str, str]:
+        """
+        Get the details of a media file.
+
+        Args:
+            id_media (int): The ID of the media file.
+
+        Returns:
+            Dict[str, str]: The name, MIME type and SHA-256 digest of the file.
+        """
+        key = media_info_key(id_media)
+        info = r.hgetall(key)
+        if info:
+            return info
+        media = worker_db.get_media_info(id_media)
+        if media is None:
+            raise ValueError(f"Media {id_media} was not found")
+        info = {"name": media["name"] or "", "mime_type": media["mime_type"] or "", "sha256": media["sha256"]}
+        pipe = r.pipeline()
+        pipe.hset(key, mapping=info)
+        pipe.expire(key, settings.media_ref_ttl)
+        pipe.execute()
+        return info
+
+    def get_input_media(self, client, id_account: int, id_media: int) -> Tuple[TypeInputMedia, str]:
+        """
+        Get the input media to send a media file with an account, uploading the file if needed.
+
+        Args:
+            client (TelegramClient): The synchronous Telegram client of the account.
+            id_account (int): The ID of the account.
+            id_media (int): The ID of the media file.
+
+        Returns:
+            Tuple[TypeInputMedia, str]: The input media and the SHA-256 digest of the file it was built for.
+        """
+        info = self.get_info(id_media)
+        sha256 = info["sha256"]
+        ref = r.hgetall(_ref_key(id_account, id_media, sha256))
+        if ref:
+            file_reference = base64.b64decode(ref["file_reference"])
+            if ref["type"] == "photo":
+                return InputMediaPhoto(InputPhoto(int(ref["id"]), int(ref["access_hash"]), file_reference)), sha256
+            return InputMediaDocument(InputDocument(int(ref["id"]), int(ref["access_hash"]), file_reference)), sha256
+
+        key = (id_account, id_media, sha256)
+        with self._lock:
+            upload = self._uploads.get(key)
+        if upload is None or time.monotonic() - upload[1] > settings.media_upload_ttl:
+            data = worker_db.get_media_content(id_media)
+            uploaded = client.upload_file(data, file_name=info["name"] or None)
+            with self._lock:
+                self._uploads[key] = (uploaded, time.monotonic())
+        else:
+            uploaded = upload[0]
+
+        mime_type = info["mime_type"] or "application/octet-stream"
+        if mime_type in PHOTO_MIME_TYPES:
+            return InputMediaUploadedPhoto(uploaded), sha256
+        attributes = [DocumentAttributeFilename(info["name"])] if info["name"] else []
+        return InputMediaUploadedDocument(uploaded, mime_type, attributes), sha256
+
+    def remember(self, id_account: int, id_media: int, sha256: str, result):
+        """
+        Store the reference of the media created by a send, so later sends reuse it.
+
+        Args:
+            id_account (int): The ID of the account.
+            id_media (int): The ID of the media file.
+            sha256 (str): The SHA-256 digest of the file that was sent.
+            result: The message or updates returned by the send.
+        """
+        media = _extract_media(result)
+        if isinstance(media, MessageMediaPhoto) and media.photo is not None:
+            data = {"type": "photo", "id": media.photo.id, "access_hash": media.photo.access_hash,
+                    "file_reference": base64.b64encode(media.photo.file_reference).decode()}
+        elif isinstance(media, MessageMediaDocument) and media.document is not None:
+            data = {"type": "document", "id": media.document.id, "access_hash": media.document.access_hash,
+                    "file_reference": base64.b64encode(media.document.file_reference).decode()}
+        else:
+            return
+        key = _ref_key(id_account, id_media, sha256)
+        pipe = r.pipeline()
+        pipe.hset(key, mapping=data)
+        pipe.expire(key, settings.media_ref_ttl)
+        pipe.execute()
+        with self._lock:
+            self._uploads.pop((id_account, id_media, sha256), None)
+
+    def invalidate(self, id_account: int, id_media: int, sha256: str):
+        """
+        Drop the reference and the uploaded file of a media file for an account.
+
+        Args:
+            id_account (int): The ID of the account.
+            id_media (int): The ID of the media file.
+            sha256 (str): The SHA-256 digest of the file.
+        """
+        r.delete(_ref_key(id_account, id_media, sha256), media_info_key(id_media))
+        with self._lock:
+            self._uploads.pop((id_account, id_media, sha256), None)
+
+
+media_cache = MediaCache()
@@ -0,0 +1,196 @@
+"""
+This module contains the cache of pre-parsed campaign messages.
+
+Campaign messages are HTML. Instead of letting `client.send_message(..., parse_mode='html')` parse
+the same HTML for every group and every cycle, the message is parsed once when the campaign is
+created, and the text and entities are stored in Redis under `pera:message:<id_group_senders>`.
+The senders then send the parsed form with a raw `SendMessageRequest`, and the Celery payloads
+no longer need to carry the message itself.
+
+On a cache miss the message is loaded from `group_senders` and parsed again. Editing or deleting a
+campaign drops its cached message. A message with a
+media file (`id_media`) is sent as the caption of the file with a raw `SendMediaRequest`.
+"""
+import base64
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from telethon.extensions import html
+from telethon.extensions.binaryreader import BinaryReader
+from telethon.tl.functions.messages import SendMediaRequest, SendMessageRequest
+from telethon.tl.types import MessageEntityMentionName, TypeInputMedia, TypeMessageEntity
+
+from pera_fastapi.cache_keys import message_key
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+from . import worker_db
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_CAPTION_LENGTH = 1024
+
+
+class MessageParseError(ValueError):
+    """ Raised when a campaign message cannot be parsed or is too long once parsed. """
+
+
+@dataclass
+class ParsedMessage:
+    """
+    A campaign message parsed into text and entities.
+
+    Attributes:
+        html (str): The original HTML message.
+        text (str): The plain text of the message.
+        entities (List[TypeMessageEntity]): The formatting entities of the text.
+        raw (bool): False when the entities need the client to resolve users, so the
+            message must be sent with `client.send_message` instead of a raw request.
+        id_media (Optional[int]): The ID of the media file the message is the caption of, if any.
+    """
+    html: str
+    text: str
+    entities: List[TypeMessageEntity] = field(default_factory=list)
+    raw: bool = True
+    id_media: Optional[int] = None
+
+
+def parse_message(message: str, id_media: Optional[int] = None) -> ParsedMessage:
+    """
+    Parse an HTML campaign message.
+
+    Args:
+        message (str): The HTML message.
+        id_media (Optional[int]): The ID of the media file the message is the caption of, if any.
+
+    Returns:
+        ParsedMessage: The parsed message.
+
+    Raises:
+        MessageParseError: If the message cannot be parsed, is empty or is too long.
+    """
+    try:
+        text, entities = html.parse(message)
+    except Exception as e:
+        raise MessageParseError(f"Invalid HTML message: {e}") from e
+    if not text and id_media is None:
+        raise MessageParseError("The message is empty")
+    max_length = MAX_MESSAGE_LENGTH if id_media is None else MAX_CAPTION_LENGTH
+    if len(text) > max_length:
+        raise MessageParseError(f"The message is longer than {max_length} characters")
+    raw = not any(isinstance(entity, MessageEntityMentionName) for entity in entities)
+    return ParsedMessage(message, text, entities, raw, id_media)
+
+
+def _serialize(parsed: ParsedMessage) -> Dict:
+    return {
+        "html": parsed.html,
+        "text": parsed.text,
+        "entities": json.dumps([base64.b64encode(bytes(entity)).decode() for entity in parsed.entities]),
+        "raw": int(parsed.raw),
+        "id_media": parsed.id_media if parsed.id_media is not None else "",
+    }
+
+
+def cache_message(id_group_senders: int, parsed: ParsedMessage):
+    """
+    Store a parsed message in the cache.
+
+    Args:
+        id_group_senders (int): The ID of the group sender the message belongs to.
+        parsed (ParsedMessage): The parsed message.
+    """
+    cache_messages({id_group_senders: parsed})
+
+
+def cache_messages(messages: Dict[int, ParsedMessage]):
+    """
+    Store many parsed messages in the cache with one pipelined Redis call.
+
+    Args:
+        messages (Dict[int, ParsedMessage]): The parsed messages keyed by the ID of their group sender.
+    """
+    try:
+        pipe = r.pipeline()
+        for id_group_senders, parsed in messages.items():
+            key = message_key(id_group_senders)
+            pipe.hset(key, mapping=_serialize(parsed))
+            pipe.expire(key, settings.message_cache_ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Message cache write failed for %s: %s", list(messages), e)
+
+
+def get_cached_message(id_group_senders: int) -> Optional[ParsedMessage]:
+    """
+    Get a parsed message from the cache.
+
+    Args:
+        id_group_senders (int): The ID of the group sender the message belongs to.
+
+    Returns:
+        Optional[ParsedMessage]: The parsed message, or None on a cache miss.
+    """
+    try:
+        data = r.hgetall(message_key(id_group_senders))
+    except Exception as e:
+        logger.warning("Message cache read failed for %s: %s", id_group_senders, e)
+        return None
+    if not data:
+        return None
+    entities = [BinaryReader(base64.b64decode(entity)).tgread_object() for entity in json.loads(data["entities"])]
+    id_media = int(data["id_media"]) if data.get("id_media") else None
+    return ParsedMessage(data["html"], data["text"], entities, bool(int(data["raw"])), id_media)
+
+
+def get_message(id_group_senders: int, message: Optional[str] = None) -> ParsedMessage:
+    """
+    Get the parsed message of a campaign.
+
+    Args:
+        id_group_senders (int): The ID of the group sender the message belongs to.
+        message (Optional[str]): The HTML message the caller has, parsed on a cache miss when the
+            group sender has no message. The media file is always read from the group sender.
+
+    Returns:
+        ParsedMessage: The parsed message, from the cache or parsed and cached on a miss.
+    """
+    parsed = get_cached_message(id_group_senders)
+    if parsed is not None:
+        return parsed
+    stored_message, id_media = worker_db.get_group_senders_message(id_group_senders)
+
+    parsed = parse_message(stored_message or message, id_media)
+    cache_message(id_group_senders, parsed)
+    return parsed
+
+
+def build_send_request(peer, parsed: ParsedMessage) -> SendMessageRequest:
+    """
+    Build the raw request sending a parsed message, without link previews.
+
+    Args:
+        peer: The input peer of the destination.
+        parsed (ParsedMessage): The parsed message.
+
+    Returns:
+        SendMessageRequest: The request, to be called with `client(request)`.
+    """
+    return SendMessageRequest(peer=peer, message=parsed.text, entities=parsed.entities or None, no_webpage=True)
+
+
+def build_send_media_request(peer, media: TypeInputMedia, parsed: ParsedMessage) -> SendMediaRequest:
+    """
+    Build the raw request sending a media file with a parsed message as its caption.
+
+    Args:
+        peer: The input peer of the destination.
+        media (TypeInputMedia): The uploaded or cached media.
+        parsed (ParsedMessage): The parsed caption.
+
+    Returns:
+        SendMediaRequest: The request, to be called with `client(request)`.
+    """
+    return SendMediaRequest(peer=peer, media=media, message=parsed.text, entities=parsed.entities or None)
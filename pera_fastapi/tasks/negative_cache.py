@@ -0,0 +1,219 @@
+"""
+This module contains the negative cache of groups that cannot receive messages.
+
+Groups that are deleted, private, banned or write-forbidden fail on every cycle of every campaign,
+each time costing a resolve, a send attempt and a failed history write. When a send fails with one
+of these errors, the group is stored in Redis and skipped by the senders until the entry expires:
+
+- errors about the group itself (the username does not exist or is invalid) are cached for every
+  account under `pera:badgroup:<id_group>`;
+- errors about the account in the group (banned, not a member of a private group, writing not
+  allowed) are cached for that account only under `pera:badgroup:<id_group>:<id_account>`;
+- an invalid or unknown peer (`PeerIdInvalidError`, `ChannelInvalidError`, an entity `get_entity`
+  cannot find) usually comes from a stale cached access hash or an entity missing from the
+  account's session. The senders drop the cached peer and retry once, and only a second failure is
+  cached, as a transient entry for that account only.
+
+Permanent errors are kept for `settings.negative_cache_permanent_ttl` seconds and transient ones for
+`settings.negative_cache_transient_ttl` seconds. Skipped sends are recorded with the `skipped` status.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from telethon.errors.rpcerrorlist import (
+    ChannelInvalidError,
+    ChannelPrivateError,
+    ChatAdminRequiredError,
+    ChatIdInvalidError,
+    ChatRestrictedError,
+    ChatWriteForbiddenError,
+    PeerIdInvalidError,
+    UserBannedInChannelError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
+
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+
+logger = logging.getLogger(__name__)
+
+NEGATIVE_KEY_PREFIX = "pera:badgroup:"
+
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+
+GROUP_ERRORS = (
+    ChatIdInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
+STALE_PEER_ERRORS = (
+    ChannelInvalidError,
+    PeerIdInvalidError,
+)
+ACCOUNT_PERMANENT_ERRORS = (
+    ChannelPrivateError,
+    UserBannedInChannelError,
+)
+ACCOUNT_TRANSIENT_ERRORS = (
+    ChatAdminRequiredError,
+    ChatRestrictedError,
+    ChatWriteForbiddenError,
+)
+
+# `client.get_entity` reports unknown usernames with a ValueError starting with one of these.
+UNRESOLVABLE_MESSAGES = ("No user has", "Cannot find any entity")
+
+
+class GroupUnavailable(Exception):
+    """ Raised by the senders when a group failed with an error stored in the negative cache. """
+
+
+def is_stale_peer(error: Exception) -> bool:
+    """
+    Check whether an error may come from a stale cached peer or a session missing the entity.
+
+    Args:
+        error (Exception): The error raised while resolving or sending to a group.
+
+    Returns:
+        bool: True when resolving the group again may fix the send.
+    """
+    if isinstance(error, STALE_PEER_ERRORS):
+        return True
+    return isinstance(error, ValueError) and str(error).startswith(UNRESOLVABLE_MESSAGES)
+
+
+def classify(error: Exception) -> Optional[Tuple[str, bool]]:
+    """
+    Classify a send error.
+
+    Args:
+        error (Exception): The error raised while resolving or sending to a group.
+
+    Returns:
+        Optional[Tuple[str, bool]]: The kind (`permanent` or `transient`) and whether the error only
+        concerns the sending account, or None when the error says nothing about the group.
+    """
+    if isinstance(error, GROUP_ERRORS):
+        return PERMANENT, False
+    if is_stale_peer(error):
+        return TRANSIENT, True
+    if isinstance(error, ACCOUNT_PERMANENT_ERRORS):
+        return PERMANENT, True
+    if isinstance(error, ACCOUNT_TRANSIENT_ERRORS):
+        return TRANSIENT, True
+    return None
+
+
+def _key(id_group: int, id_account: Optional[int] = None) -> str:
+    if id_account is None:
+        return f"{NEGATIVE_KEY_PREFIX}{id_group}"
+    return f"{NEGATIVE_KEY_PREFIX}{id_group}:{id_account}"
+
+
+class NegativeCache:
+    """
+    Redis cache of the groups a send is known to fail for.
+    """
+
+    def lookup(self, id_group: int, id_account: int) -> Optional[Dict[str, str]]:
+        """
+        Get the cached failure of a group for an account.
+
+        Args:
+            id_group (int): The ID of the group.
+            id_account (int): The ID of the sending account.
+
+        Returns:
+            Optional[Dict[str, str]]: The cached entry, or None when the group should be sent to.
+        """
+        try:
+            pipe = r.pipeline()
+            pipe.hgetall(_key(id_group))
+            pipe.hgetall(_key(id_group, id_account))
+            group_entry, account_entry = pipe.execute()
+        except Exception as e:
+            logger.warning("Negative cache read failed for group %s: %s", id_group, e)
+            return None
+        return group_entry or account_entry or None
+
+    def record(self, id_group: int, id_account: int, group_name: str, error: Exception) -> Optional[str]:
+        """
+        Store a failed group when the error is one the negative cache knows.
+
+        Args:
+            id_group (int): The ID of the group.
+            id_account (int): The ID of the sending account.
+            group_name (str): The name of the group.
+            error (Exception): The error raised while resolving or sending to the group.
+
+        Returns:
+            Optional[str]: The kind of the stored entry, or None when the error was not cached.
+        """
+        classification = classify(error)
+        if classification is None:
+            return None
+        kind, account_scoped = classification
+        key = _key(id_group, id_account if account_scoped else None)
+        data = {
+            "id_group": id_group,
+            "id_account": id_account if account_scoped else "",
+            "name": group_name or "",
+            "kind": kind,
+            "error": type(error).__name__,
+            "detail": str(error)[:255],
+            "created_at": str(datetime.now()),
+        }
+        ttl = settings.negative_cache_permanent_ttl if kind == PERMANENT else settings.negative_cache_transient_ttl
+        try:
+            pipe = r.pipeline()
+            pipe.hset(key, mapping=data)
+            pipe.expire(key, ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Negative cache write failed for group %s: %s", id_group, e)
+        return kind
+
+    def entries(self) -> List[Dict[str, str]]:
+        """
+        Get every cached failure.
+
+        Returns:
+            List[Dict[str, str]]: The entries, each with the seconds left before it expires in `ttl`.
+        """
+        entries = []
+        for key in r.scan_iter(match=f"{NEGATIVE_KEY_PREFIX}*"):
+            pipe = r.pipeline()
+            pipe.hgetall(key)
+            pipe.ttl(key)
+            data, ttl = pipe.execute()
+            if data:
+                entries.append({**data, "ttl": ttl})
+        return entries
+
+    def clear(self, id_group: Optional[int] = None, id_account: Optional[int] = None) -> int:
+        """
+        Remove cached failures.
+
+        Args:
+            id_group (Optional[int]): Only remove the entries of this group.
+            id_account (Optional[int]): Only remove the entries of this account.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        removed = 0
+        for key in r.scan_iter(match=f"{NEGATIVE_KEY_PREFIX}{id_group if id_group is not None else '*'}*"):
+            parts = key[len(NEGATIVE_KEY_PREFIX):].split(":")
+            if id_group is not None and parts[0] != str(id_group):
+                continue
+            if id_account is not None and (len(parts) < 2 or parts[1] != str(id_account)):
+                continue
+            removed += r.delete(key)
+        return removed
+
+
+negative_cache = NegativeCache()
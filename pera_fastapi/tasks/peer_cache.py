@@ -0,0 +1,152 @@
+"""
+This module contains the resolved-peer cache used by the group senders.
+
+Resolving a group name with `client.get_entity` costs a network round trip and often a
+`ResolveUsernameRequest`, which Telegram rate-limits heavily. The resolved peer
+(type, id and access_hash) is stored in Redis under `pera:peer:<id_account>:<group_name>`
+with a TTL of `settings.peer_cache_ttl` seconds, so a campaign to N groups over K cycles
+resolves every group at most once. Access hashes are only valid for the account that
+resolved them, which is why the cache is keyed by account.
+
+Entries are invalidated when Telegram reports the cached peer as invalid.
+"""
+import logging
+from typing import Optional, Union
+
+from telethon import TelegramClient, utils
+from telethon.errors.rpcerrorlist import (
+    ChannelInvalidError,
+    ChannelPrivateError,
+    PeerIdInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PEER_KEY_PREFIX = "pera:peer:"
+
+INVALID_PEER_ERRORS = (
+    ChannelInvalidError,
+    ChannelPrivateError,
+    PeerIdInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
+
+InputPeer = Union[InputPeerChannel, InputPeerChat, InputPeerUser]
+
+
+def _key(id_account: int, group_name: str) -> str:
+    return f"{PEER_KEY_PREFIX}{id_account}:{group_name.lower()}"
+
+
+def get_cached_peer(id_account: int, group_name: str) -> Optional[InputPeer]:
+    """
+    Get the cached input peer of a group.
+
+    Args:
+        id_account (int): The ID of the account that resolved the group.
+        group_name (str): The name of the group.
+
+    Returns:
+        Optional[InputPeer]: The cached input peer, or None on a cache miss.
+    """
+    try:
+        data = r.hgetall(_key(id_account, group_name))
+    except Exception as e:
+        logger.warning("Peer cache read failed for %s: %s", group_name, e)
+        return None
+    if not data:
+        return None
+
+    peer_id = int(data["id"])
+    if data["type"] == "channel":
+        return InputPeerChannel(peer_id, int(data["access_hash"]))
+    if data["type"] == "chat":
+        return InputPeerChat(peer_id)
+    return InputPeerUser(peer_id, int(data["access_hash"]))
+
+
+def cache_peer(id_account: int, group_name: str, peer: InputPeer):
+    """
+    Store the input peer of a group in the cache.
+
+    Args:
+        id_account (int): The ID of the account that resolved the group.
+        group_name (str): The name of the group.
+        peer (InputPeer): The resolved input peer.
+    """
+    if isinstance(peer, InputPeerChannel):
+        data = {"type": "channel", "id": peer.channel_id, "access_hash": peer.access_hash}
+    elif isinstance(peer, InputPeerChat):
+        data = {"type": "chat", "id": peer.chat_id, "access_hash": 0}
+    elif isinstance(peer, InputPeerUser):
+        data = {"type": "user", "id": peer.user_id, "access_hash": peer.access_hash}
+    else:
+        return
+
+    key = _key(id_account, group_name)
+    try:
+        pipe = r.pipeline()
+        pipe.hset(key, mapping=data)
+        pipe.expire(key, settings.peer_cache_ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Peer cache write failed for %s: %s", group_name, e)
+
+
+def invalidate_peer(id_account: int, group_name: str):
+    """
+    Remove the cached input peer of a group.
+
+    Args:
+        id_account (int): The ID of the account that resolved the group.
+        group_name (str): The name of the group.
+    """
+    try:
+        r.delete(_key(id_account, group_name))
+    except Exception as e:
+        logger.warning("Peer cache invalidation failed for %s: %s", group_name, e)
+
+
+def resolve_peer(client: TelegramClient, id_account: int, group_name: str) -> InputPeer:
+    """
+    Resolve a group name with a `telethon.sync` client, using the cache when possible.
+
+    Args:
+        client (TelegramClient): The synchronous Telegram client.
+        id_account (int): The ID of the account owning the client.
+        group_name (str): The name of the group.
+
+    Returns:
+        InputPeer: The input peer of the group.
+    """
+    peer = get_cached_peer(id_account, group_name)
+    if peer is None:
+        peer = utils.get_input_peer(client.get_entity(group_name))
+        cache_peer(id_account, group_name, peer)
+    return peer
+
+
+async def resolve_peer_async(client: TelegramClient, id_account: int, group_name: str) -> InputPeer:
+    """
+    Resolve a group name with an asyncio client, using the cache when possible.
+
+    Args:
+        client (TelegramClient): The asyncio Telegram client.
+        id_account (int): The ID of the account owning the client.
+        group_name (str): The name of the group.
+
+    Returns:
+        InputPeer: The input peer of the group.
+    """
+    peer = get_cached_peer(id_account, group_name)
+    if peer is None:
+        peer = utils.get_input_peer(await client.get_entity(group_name))
+        cache_peer(id_account, group_name, peer)
+    return peer
@@ -0,0 +1,283 @@
+"""
+This module contains the adaptive rate limiter used to pace the group senders.
+
+Every send takes one token from two buckets stored in Redis, so all workers agree on the pace:
+
+- the account bucket `pera:rl:account:<id_account>`, refilled at the account rate
+  (`Account.rate_limit` messages per minute, or `settings.rate_limit_account_per_minute`);
+- the group bucket `pera:rl:group:<id_group>`, refilled at `settings.rate_limit_group_per_minute`.
+
+The account rate is multiplied by an adaptive factor under `pera:rl:factor:<id_account>`: it is cut
+after a `FloodWaitError` or a `PeerFloodError` and grows back slowly while sends succeed. Both
+changes are made by a Lua script, so a success in one worker cannot overwrite a cut made by another. A flood wait also blocks the group for
+the account (or the whole account, for long waits) until the time Telegram asked for.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY_PREFIX = "pera:rl:"
+STATE_TTL = 86400
+
+# Takes one token from every bucket in KEYS, or none of them. ARGV holds a (rate per second, capacity)
+# pair per bucket. Returns the number of seconds to wait before a token is available, 0 when granted.
+TAKE_TOKENS_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local ttl = tonumber(ARGV[1])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+end
+if wait == 0 then
+    for i, key in ipairs(KEYS) do
+        redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+        redis.call('EXPIRE', key, ttl)
+    end
+end
+return tostring(wait)
+"""
+
+# Multiplies (ARGV[1] == 'mul') or increases (ARGV[1] == 'add') the factor in KEYS[1] by ARGV[2] and
+# clamps it between ARGV[3] and 1. An increase of a factor already at 1 writes nothing.
+ADJUST_FACTOR_SCRIPT = """
+local factor = tonumber(redis.call('GET', KEYS[1])) or 1
+if ARGV[1] == 'add' and factor >= 1 then
+    return tostring(factor)
+end
+if ARGV[1] == 'mul' then
+    factor = factor * tonumber(ARGV[2])
+else
+    factor = factor + tonumber(ARGV[2])
+end
+factor = math.max(tonumber(ARGV[3]), math.min(1, factor))
+redis.call('SET', KEYS[1], tostring(factor), 'EX', ARGV[4])
+return tostring(factor)
+"""
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter per account and per destination group.
+    """
+
+    def __init__(self):
+        self._take_tokens = r.register_script(TAKE_TOKENS_SCRIPT)
+        self._adjust_factor = r.register_script(ADJUST_FACTOR_SCRIPT)
+
+    @staticmethod
+    def _key(kind: str, id_value: int) -> str:
+        return f"{RATE_LIMIT_KEY_PREFIX}{kind}:{id_value}"
+
+    def get_factor(self, id_account: int) -> float:
+        """
+        Get the adaptive factor applied to the account rate.
+
+        Args:
+            id_account (int): The ID of the account.
+
+        Returns:
+            float: The factor, between `settings.rate_limit_min_factor` and 1.
+        """
+        factor = r.get(self._key("factor", id_account))
+        return float(factor) if factor is not None else 1.0
+
+    def _change_factor(self, id_account: int, mode: str, value: float) -> float:
+        factor = self._adjust_factor(
+            keys=[self._key("factor", id_account)],
+            args=[mode, value, settings.rate_limit_min_factor, STATE_TTL],
+        )
+        return float(factor)
+
+    def account_rate(self, id_account: int, rate_limit: Optional[float] = None) -> float:
+        """
+        Get the current account rate in messages per minute.
+
+        Args:
+            id_account (int): The ID of the account.
+            rate_limit (Optional[float]): The configured rate of the account, if any.
+
+        Returns:
+            float: The configured rate multiplied by the adaptive factor.
+        """
+        base = rate_limit or settings.rate_limit_account_per_minute
+        return base * self.get_factor(id_account)
+
+    def reserve(self, id_account: int, id_group: int, rate_limit: Optional[float] = None) -> float:
+        """
+        Try to take a token from the account and group buckets.
+
+        Args:
+            id_account (int): The ID of the sending account.
+            id_group (int): The ID of the destination group.
+            rate_limit (Optional[float]): The configured rate of the account, if any.
+
+        Returns:
+            float: 0 when the send may proceed, otherwise the seconds to wait before trying again.
+        """
+        blocked = self.blocked_for(id_account, id_group)
+        if blocked > 0:
+            return blocked
+
+        account_rate = self.account_rate(id_account, rate_limit) / 60
+        group_rate = settings.rate_limit_group_per_minute / 60
+        wait = self._take_tokens(
+            keys=[self._key("account", id_account), self._key("group", id_group)],
+            args=[
+                STATE_TTL,
+                account_rate, settings.rate_limit_account_burst,
+                group_rate, settings.rate_limit_group_burst,
+            ],
+        )
+        return float(wait)
+
+    def blocked_for(self, id_account: int, id_group: Optional[int] = None) -> float:
+        """
+        Get the seconds left on a flood block of an account, or of an account and group pair.
+
+        Args:
+            id_account (int): The ID of the account.
+            id_group (Optional[int]): The ID of the group, to include the block of the pair.
+
+        Returns:
+            float: The seconds left, 0 when the send is not blocked.
+        """
+        keys = [self._key("blocked", id_account)]
+        if id_group is not None:
+            keys.append(self._key("blocked", f"{id_account}:{id_group}"))
+        pipe = r.pipeline()
+        for key in keys:
+            pipe.pttl(key)
+        blocked = max(pipe.execute())
+        return blocked / 1000 if blocked > 0 else 0.0
+
+    def acquire(self, id_account: int, id_group: int, rate_limit: Optional[float] = None,
+                sleep: Callable[[float], None] = time.sleep) -> float:
+        """
+        Wait until the account and the group may send a message.
+
+        Args:
+            id_account (int): The ID of the sending account.
+            id_group (int): The ID of the destination group.
+            rate_limit (Optional[float]): The configured rate of the account, if any.
+            sleep (Callable[[float], None]): The function used to wait.
+
+        Returns:
+            float: The seconds waited.
+        """
+        waited = 0.0
+        while True:
+            wait = self.reserve(id_account, id_group, rate_limit)
+            if wait <= 0:
+                break
+            sleep(wait)
+            waited += wait
+        self._record_wait(id_account, waited)
+        return waited
+
+    async def acquire_async(self, id_account: int, id_group: int, rate_limit: Optional[float] = None) -> float:
+        """
+        Asyncio version of `acquire`. The Redis calls run in the default executor, so they do not
+        block the event loop.
+
+        Args:
+            id_account (int): The ID of the sending account.
+            id_group (int): The ID of the destination group.
+            rate_limit (Optional[float]): The configured rate of the account, if any.
+
+        Returns:
+            float: The seconds waited.
+        """
+        loop = asyncio.get_running_loop()
+        waited = 0.0
+        while True:
+            wait = await loop.run_in_executor(None, self.reserve, id_account, id_group, rate_limit)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        await loop.run_in_executor(None, self._record_wait, id_account, waited)
+        return waited
+
+    def _record_wait(self, id_account: int, waited: float):
+        key = self._key("stats", id_account)
+        pipe = r.pipeline()
+        pipe.hset(key, "last_wait", round(waited, 3))
+        pipe.hincrbyfloat(key, "total_wait", round(waited, 3))
+        pipe.hincrby(key, "acquired", 1)
+        pipe.expire(key, STATE_TTL)
+        pipe.execute()
+
+    def on_success(self, id_account: int):
+        """
+        Speed the account back up after a successful send.
+
+        Args:
+            id_account (int): The ID of the account.
+        """
+        self._change_factor(id_account, "add", settings.rate_limit_increase_step)
+        r.hincrby(self._key("stats", id_account), "successes", 1)
+
+    def on_flood(self, id_account: int, seconds: Optional[int] = None, id_group: Optional[int] = None):
+        """
+        Slow the account down after Telegram reported a flood.
+
+        Args:
+            id_account (int): The ID of the account.
+            seconds (Optional[int]): The wait requested by Telegram, if any.
+            id_group (Optional[int]): The ID of the group the send was addressed to. A wait shorter than
+                `settings.flood_wait_account_threshold` only blocks this group for the account,
+                a longer one blocks the whole account.
+        """
+        factor = self._change_factor(id_account, "mul", settings.rate_limit_decrease_factor)
+        if seconds:
+            if id_group is not None and seconds < settings.flood_wait_account_threshold:
+                r.set(self._key("blocked", f"{id_account}:{id_group}"), 1, ex=int(seconds))
+            else:
+                r.set(self._key("blocked", id_account), 1, ex=int(seconds))
+        r.hincrby(self._key("stats", id_account), "floods", 1)
+        logger.warning("Flood reported for account %s, factor lowered to %.3f", id_account, factor)
+
+    def report(self, id_account: int, rate_limit: Optional[float] = None) -> Dict[str, float]:
+        """
+        Get the current rates and wait times of an account.
+
+        Args:
+            id_account (int): The ID of the account.
+            rate_limit (Optional[float]): The configured rate of the account, if any.
+
+        Returns:
+            Dict[str, float]: The configured and effective rates, the block time left and the wait counters.
+        """
+        blocked = self.blocked_for(id_account)
+        stats = r.hgetall(self._key("stats", id_account))
+        return {
+            "rate_limit": rate_limit or settings.rate_limit_account_per_minute,
+            "factor": self.get_factor(id_account),
+            "effective_rate": self.account_rate(id_account, rate_limit),
+            "blocked_for": blocked,
+            "last_wait": float(stats.get("last_wait", 0)),
+            "total_wait": float(stats.get("total_wait", 0)),
+            "acquired": int(stats.get("acquired", 0)),
+            "successes": int(stats.get("successes", 0)),
+            "floods": int(stats.get("floods", 0)),
+        }
+
+
+rate_limiter = RateLimiter()
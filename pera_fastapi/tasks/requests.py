@@ -1,29 +1,159 @@
+"""
+This module contains the HTTP callbacks from the Celery workers to the API.
+
+All calls share one `requests.Session` per worker process, so connections are pooled and kept
+alive instead of paying a TCP and TLS handshake per call. Calls use `settings.api_base_url`
+(for example `http://fastapi:8070` inside the compose network), a bounded timeout, and are retried
+with exponential backoff and jitter on connection errors and 502/503/504 responses. POST and PATCH
+calls (history inserts, campaign updates) may have been committed by the API when the response is
+lost, so they are only retried when the connection could not be opened and nothing was sent. Every call
+carries `settings.worker_api_token`, required by the endpoints handing out account secrets.
+"""
+import os
+import random
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from pera_fastapi.auth.worker import WORKER_TOKEN_HEADER
+from pera_fastapi.settings import settings
+
+RETRY_STATUS_CODES = (502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+_session = None
+_session_pid = None
+
+
+def get_session() -> requests.Session:
+    """
+    Get the HTTP session of the current process, creating it on first use or after a fork.
+
+    Returns:
+        requests.Session: The pooled keep-alive session.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.api_pool_size,
+            pool_maxsize=settings.api_pool_size,
+            max_retries=0,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if settings.worker_api_token:
+            session.headers[WORKER_TOKEN_HEADER] = settings.worker_api_token
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+def api_request(method: str, path: str, **kwargs) -> requests.Response:
+    """
+    Call the API with the shared session, retrying transient failures.
+
+    Idempotent methods are retried on connection errors, timeouts and 502/503/504 responses. Other
+    methods are only retried when the connection could not be opened, so a call the API may already
+    have committed is never sent twice.
+
+    Args:
+        method (str): The HTTP method.
+        path (str): The path of the endpoint, appended to `settings.api_base_url`.
+        **kwargs: Passed to `requests.Session.request`.
+
+    Returns:
+        requests.Response: The response of the last attempt.
+    """
+    url = f"{settings.api_base_url.rstrip('/')}{path}"
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    for attempt in range(settings.api_retries + 1):
+        try:
+            response = get_session().request(method, url, timeout=settings.api_timeout, **kwargs)
+            if not idempotent or response.status_code not in RETRY_STATUS_CODES or attempt == settings.api_retries:
+                return response
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == settings.api_retries or (not idempotent and _may_have_been_sent(e)):
+                raise
+        time.sleep(settings.api_retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def _may_have_been_sent(error: requests.RequestException) -> bool:
+    """ Check whether a failed call may have reached the API, that is, the connection was opened. """
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return not isinstance(reason, NewConnectionError)
 
 def call_fastapi_endpoint_test_gwt_account(id_account):
-    response = requests.get(f'https://www.api.ionrusu114.me/api/telegram/account/{id_account}')
+    response = api_request('GET', f'/api/telegram/account/{id_account}')
     if response.status_code == 200:
         return response.json()
     else:
         raise Exception(f"Request failed with status {response.status_code}")
 
 def call_update_account_status(id_account, status):
-    response = requests.patch(f'https://www.api.ionrusu114.me/api/telegram/account/{id_account}', params={'account': status})
+    response = api_request('PATCH', f'/api/telegram/account/{id_account}', params={'account': status})
     if response.status_code == 200:
         return response.json()
     else:
         raise Exception(f"Request update account failed with status {response.status_code}")
 
+def call_get_telegram_session(id_account):
+    response = api_request('GET', f'/api/telegram/account/{id_account}/session')
+    if response.status_code == 200:
+        return response.json().get('data')
+    elif response.status_code == 404:
+        return None
+    else:
+        raise Exception(f"Request get session failed with status {response.status_code}")
+
+def call_save_telegram_session(id_account, data):
+    response = api_request('PUT', f'/api/telegram/account/{id_account}/session', json={"data": data})
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request save session failed with status {response.status_code}")
+
+def call_get_group_senders(id_group_senders):
+    response = api_request('GET', f'/api/telegram/group_senders/{id_group_senders}')
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request get group senders failed with status {response.status_code}")
+
+def call_get_media(id_media):
+    response = api_request('GET', f'/api/telegram/media/{id_media}')
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request get media failed with status {response.status_code}")
+
+def call_get_media_content(id_media):
+    response = api_request('GET', f'/api/telegram/media/{id_media}/content')
+    if response.status_code == 200:
+        return response.content
+    else:
+        raise Exception(f"Request get media content failed with status {response.status_code}")
+
 def call_fastapi_update_group_senders(id_group_senders, data):
-    response = requests.put(f'https://www.api.ionrusu114.me/api/telegram/group_senders/{id_group_senders}', json=data)
+    response = api_request('PUT', f'/api/telegram/group_senders/{id_group_senders}', json=data)
     if response.status_code == 200:
         # print(response.json())
         return response.json()
     else:
         raise Exception(f"Request update group senders failed with status {response.status_code}")
 
+def call_update_group_senders_status(id_group_senders, status):
+    response = api_request('PATCH', f'/api/telegram/group_senders/{id_group_senders}', params={'group_senders': status})
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request update group senders status failed with status {response.status_code}")
+
 def call_get_task_id(id_group_sender):
-    response = requests.get(f'https://www.api.ionrusu114.me/tasks/task/{id_group_sender}/group_sender')
+    response = api_request('GET', f'/tasks/task/{id_group_sender}/group_sender')
     if response.status_code == 200:
         # print(response.json())
         return response.json()
@@ -31,21 +161,65 @@ def call_get_task_id(id_group_sender):
         raise Exception(f"Request get task id failed with status {response.status_code}")
 
 def call_update_task_work(id_group_sender, data):
-    task_id = call_get_task_id(id_group_sender)
-
-    response = requests.put(f'https://www.api.ionrusu114.me/tasks/task/{task_id}/worker', json=data)
+    response = api_request('PUT', '/tasks/task/status', json={"id_group_sender": id_group_sender, **data})
     if response.status_code == 200:
-        # print(response.json())
         return response.json()
     else:
         raise Exception(f"Request update task work failed with status {response.status_code}")
 
+def call_update_task_status(task_id, data):
+    response = api_request('PUT', '/tasks/task/status', json={"task_id": task_id, **data})
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request update task status failed with status {response.status_code}")
+
+def call_get_running_campaigns(limit):
+    response = api_request('GET', '/tasks/tasks/running', params={'limit': limit})
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request get running campaigns failed with status {response.status_code}")
+
+def call_finish_campaign(id_group_sender, data):
+    response = api_request('POST', f'/tasks/group_sender/{id_group_sender}/finish', json=data)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request finish campaign failed with status {response.status_code}")
+
+def call_finish_scheduled_run(id_group_sender, task_id, data):
+    response = api_request('POST', f'/tasks/group_sender/{id_group_sender}/run/{task_id}/finish', json=data)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request finish scheduled run failed with status {response.status_code}")
+
+def call_reconcile_counters():
+    response = api_request('POST', '/tasks/counters/reconcile')
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request reconcile counters failed with status {response.status_code}")
+
+def call_rollup_history(max_batches):
+    response = api_request('POST', '/api/telegram/stats/rollup', params={'max_batches': max_batches})
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Request rollup history failed with status {response.status_code}")
+
 def call_create_history(data):
-    response = requests.post(f'https://www.api.ionrusu114.me/api/telegram/history', json=data)
+    response = api_request('POST', f'/api/telegram/history/', json=data)
     if response.status_code == 201:
         # print(response.json())
         return response.json()
     else:
         raise Exception(f"Request create hostory failed with status {response.status_code}")
 
-
+def call_create_histories(data):
+    response = api_request('POST', f'/api/telegram/history/bulk', json=data)
+    if response.status_code == 201:
+        return response.json()
+    else:
+        raise Exception(f"Request create histories failed with status {response.status_code}")
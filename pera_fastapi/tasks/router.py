@@ -3,39 +3,190 @@ This module contains the API router for handling tasks related to sending messag
 
 Functions:
 - run_sender_messages: An endpoint to add a task to send messages to a group of recipients.
+- run_sharded_sender_messages: An endpoint to split a group of recipients across several accounts.
+- run_bulk_sender_messages: An endpoint to add many campaigns in one request.
+- get_progress: An endpoint to retrieve the progress checkpoints of a campaign.
+- resume_campaign: An endpoint to resume a stopped campaign from its checkpoints.
+- get_unavailable_groups: An endpoint to list the groups skipped by the negative cache.
+- clear_unavailable_groups: An endpoint to remove groups from the negative cache.
+- create_schedule: An endpoint to add a recurring campaign run by the scheduler.
+- get_schedules: An endpoint to list the schedules of the recurring campaigns.
+- pause_schedule / resume_schedule: Endpoints to stop and restart the runs of a schedule.
+- delete_schedule: An endpoint to remove a schedule.
 """
 from fastapi import APIRouter,BackgroundTasks, Depends,HTTPException, status,Request,Response
-from typing import Dict, List,Annotated
+from typing import Dict, List,Annotated,Optional
 from fastapi_cache.decorator import cache
 import importlib
-from pera_fastapi.models.schemas import Group_SendersBase,GroupsSendersSelectBase,StatusTasks,TasksBase,TaskUpdateStatusBase, StatusAccount
-from pera_fastapi.models.database import get_db
+import os
+import socket
+from pera_fastapi.models.schemas import Group_SendersBase,GroupsSendersSelectBase,GroupsSendersShardedBase,GroupsSendersScheduleBase,StatusSchedule,StatusGroupSenders,StatusTasks,TasksBase,TaskUpdateStatusBase, StatusAccount
+from pera_fastapi.models.database import get_db, pool_stats
 from pera_fastapi.routes.account_router import get_account,update_account_status
 from pera_fastapi.routes.group_senders_router import create_group_senders
 from pera_fastapi.routes.tasks_router import create_task,update_task_work
 from sqlalchemy.future import select
+from sqlalchemy import insert, update
+from celery.utils import uuid
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from pera_fastapi.models import models
 from sqlalchemy.orm import Session
-from .tasks import send_messages,send_messages_simple
+from .tasks import send_messages,send_messages_simple,enforce_stop
 from fastapi.responses import JSONResponse
 import logging
 from .tasks import celery
+from .client_pool import POOL_STATS_KEY_PREFIX
+from .warmup import READY_KEY_PREFIX
+from .rate_limiter import rate_limiter
+from .message_cache import MessageParseError, cache_message, cache_messages, parse_message
+from .sharding import shards_key, split_groups
+from .checkpoints import get_campaign_progress
+from .stop_flag import request_stop
+from .negative_cache import negative_cache
+from pera_fastapi.settings import settings
+from fastapi.concurrency import run_in_threadpool
+from pera_fastapi.redis_client import get_async_redis
+from pera_fastapi.counters import incr_count
 
 
 DBD = Annotated[Session, Depends(get_db)]
 
 router = APIRouter(prefix="/api/telegram/tasks", tags=["tasks"])
+logger = logging.getLogger(__name__)
+
+async def parse_campaign_message(group_senders: GroupsSendersSelectBase, db: DBD):
+    """
+    Parse the message of a new campaign and check its media file exists.
+
+    Raises:
+    - HTTPException: 400 if the message cannot be sent, 404 if the media file does not exist.
+    """
+    if group_senders.id_media is not None and await db.get(models.Media, group_senders.id_media) is None:
+        raise HTTPException(status_code=404, detail='Media was not found')
+    try:
+        return parse_message(group_senders.message, group_senders.id_media)
+    except MessageParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/stop/{task_id}/{account_id}",status_code=status.HTTP_200_OK)
 async def stop_task(task_id: str,account_id: int, db: DBD):
+    """
+    Endpoint to stop a campaign chain.
+
+    The chain is asked to stop through its Redis stop flag and stops at the next group or rate
+    limiter wait. It is only terminated when it has not stopped after `settings.stop_grace_period` seconds.
+    Stopping one shard of a sharded campaign stops every running shard of the campaign.
+    """
     TaskStop = TaskUpdateStatusBase(status = StatusTasks.stopped)
     
     UpdateStatusAccount =  StatusAccount.inactive
     
     await update_account_status(account_id, UpdateStatusAccount, db)
     await update_task_work(task_id, TaskStop, db)
-    celery.control.revoke(task_id, terminate=True)
-    return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Task stopped"})
+    other_shards = await get_other_shards(task_id, db)
+    if other_shards:
+        await db.execute(
+            update(models.Tasks)
+            .where(models.Tasks.task_id.in_(other_shards))
+            .values(status=StatusTasks.stopped.value, stopped_at=datetime.now())
+        )
+        id_accounts = [id_account for id_account in other_shards.values() if id_account is not None]
+        if id_accounts:
+            await db.execute(
+                update(models.Account)
+                .where(models.Account.id.in_(id_accounts))
+                .values(status=StatusAccount.inactive.value)
+            )
+        await db.commit()
+    for stopped_task_id in [task_id, *other_shards]:
+        await request_stop(get_async_redis(), stopped_task_id)
+        enforce_stop.apply_async(args=(stopped_task_id,), countdown=settings.stop_grace_period)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Task stopped", "task_ids": [task_id, *other_shards]})
+
+async def get_other_shards(task_id: str, db: DBD) -> Dict[str, Optional[int]]:
+    """
+    Get the other running shards of the sharded campaign a task belongs to.
+
+    Args:
+    - task_id (str): The task ID of one shard.
+    - db (DBD): A database connection object.
+
+    Returns:
+    - Dict[str, Optional[int]]: The account of every other running shard keyed by task ID, empty
+      when the campaign is not sharded.
+    """
+    id_group_sender = await db.scalar(select(models.Tasks.id_group_sender).where(models.Tasks.task_id == task_id))
+    if id_group_sender is None or not await get_async_redis().exists(shards_key(id_group_sender)):
+        return {}
+    result = await db.execute(
+        select(models.Tasks.task_id)
+        .where(models.Tasks.id_group_sender == id_group_sender)
+        .where(models.Tasks.status == StatusTasks.running.value)
+        .where(models.Tasks.task_id != task_id)
+    )
+    task_ids = result.scalars().all()
+    if not task_ids:
+        return {}
+    checkpoints = await run_in_threadpool(get_campaign_progress, id_group_sender)
+    accounts = {checkpoint.state.get("task_id"): checkpoint.id_account for checkpoint in checkpoints}
+    return {shard_task_id: accounts.get(shard_task_id) for shard_task_id in task_ids}
+
+@router.get("/pool/stats", status_code=status.HTTP_200_OK)
+async def get_client_pool_stats():
+    """
+    Retrieve the Telegram client pool counters of every running worker process.
+
+    Returns:
+    - Dict[str, Dict]: The pool counters keyed by `<hostname>:<pid>` of the worker process.
+    """
+    redis = get_async_redis()
+    stats = {}
+    async for key in redis.scan_iter(match=f"{POOL_STATS_KEY_PREFIX}*"):
+        stats[key[len(POOL_STATS_KEY_PREFIX):]] = await redis.hgetall(key)
+    return stats
+
+@router.get("/db/pool", status_code=status.HTTP_200_OK)
+async def get_db_pool_stats():
+    """
+    Retrieve the MySQL connection pool counters of the API process serving the request.
+
+    The counters of the worker processes are published with the client pool counters, see `/pool/stats`.
+
+    Returns:
+    - Dict: The process `<hostname>:<pid>`, the pool size and overflow limit, and the connections idle, in use and in overflow.
+    """
+    return {"process": f"{socket.gethostname()}:{os.getpid()}", **pool_stats()}
+
+@router.get("/workers", status_code=status.HTTP_200_OK)
+async def get_ready_workers():
+    """
+    Retrieve the worker processes that finished their warm-up.
+
+    Returns:
+    - Dict[str, Dict]: The warm-up counters and ready time keyed by `<hostname>:<pid>` of the worker process.
+    """
+    redis = get_async_redis()
+    workers = {}
+    async for key in redis.scan_iter(match=f"{READY_KEY_PREFIX}*"):
+        workers[key[len(READY_KEY_PREFIX):]] = await redis.hgetall(key)
+    return workers
+
+@router.get("/rate_limits/{id_account}", status_code=status.HTTP_200_OK)
+async def get_rate_limits(id_account: int, db: DBD):
+    """
+    Retrieve the current send rate and wait times of an account.
+
+    Args:
+    - id_account (int): The ID of the account.
+    - db (DBD): A database connection object.
+
+    Returns:
+    - Dict[str, float]: The configured and effective rates (messages per minute), the seconds left
+      on a flood block and the wait counters of the rate limiter.
+    """
+    account = await get_account(id_account, db)
+    return await run_in_threadpool(rate_limiter.report, id_account, account.rate_limit)
 
 @router.post("/send",status_code=status.HTTP_201_CREATED)
 async def run_sender_messages(
@@ -62,8 +213,11 @@ async def run_sender_messages(
     async def cached_create_group_senders(group_senders, db):
         return await create_group_senders(group_senders, db)
 
+    parsed_message = await parse_campaign_message(group_senders, db)
+
     created_group_senders = await cached_create_group_senders(group_senders, db)
     id_group_senders = created_group_senders.get('id')
+    await run_in_threadpool(cache_message, id_group_senders, parsed_message)
     
     async def cached_get_account(id_account, db):
         return await get_account(id_account, db)
@@ -76,7 +230,8 @@ async def run_sender_messages(
     account_dict = serialize_model_instance(account)
     group_select_dict = [group.dict() for group in group_senders.group_list]
     max_executions = group_senders.max_executions
-    message = group_senders.message
+    # The worker reads the parsed message from the message cache.
+    message = ""
     
     task = send_messages_simple.delay(
         account_dict,
@@ -99,5 +254,465 @@ async def run_sender_messages(
     
     return JSONResponse(status_code=status.HTTP_201_CREATED, content={"message": "Success add task", "task_id": str(task.id)})
 
+@router.post("/send/sharded",status_code=status.HTTP_201_CREATED)
+async def run_sharded_sender_messages(
+        group_senders: GroupsSendersShardedBase,
+        db: DBD,
+    ):
+    """
+    Endpoint to send a campaign with several accounts in parallel.
+
+    The group list is split between `id_account` and `id_accounts` in proportion to the current send
+    rate of every account, and every shard runs as its own task. The shards share one group sender,
+    which is marked as finished when the last shard completes.
+
+    Args:
+    - group_senders (GroupsSendersShardedBase): The campaign and the accounts to split it across.
+    - db (DBD): A database connection object.
+
+    Returns:
+    - JSONResponse: The ID of the group sender and the task ID and group count of every shard.
+    """
+    id_accounts = list(dict.fromkeys([group_senders.id_account, *group_senders.id_accounts]))
+    result = await db.execute(select(models.Account).where(models.Account.id.in_(id_accounts)))
+    accounts = {account.id: account for account in result.scalars().all()}
+    missing = [id_account for id_account in id_accounts if id_account not in accounts]
+    if missing:
+        raise HTTPException(status_code=404, detail=f'Accounts {missing} were not found')
+
+    parsed_message = await parse_campaign_message(group_senders, db)
+
+    def account_rates():
+        return [rate_limiter.account_rate(id_account, accounts[id_account].rate_limit) for id_account in id_accounts]
+
+    weights = await run_in_threadpool(account_rates)
+    group_select_dict = [group.dict() for group in group_senders.group_list]
+    shards = [
+        (id_account, shard)
+        for id_account, shard in zip(id_accounts, split_groups(group_select_dict, weights))
+        if shard
+    ]
+    if not shards:
+        raise HTTPException(status_code=400, detail='The group list is empty')
+
+    created_group_senders = await create_group_senders(
+        GroupsSendersSelectBase(**group_senders.dict(exclude={'id_accounts'})), db
+    )
+    id_group_senders = created_group_senders.get('id')
+    await run_in_threadpool(cache_message, id_group_senders, parsed_message)
+    await get_async_redis().set(shards_key(id_group_senders), len(shards))
+
+    created_shards = []
+    for id_account, shard in shards:
+        account = accounts[id_account]
+        account_dict = {c.name: getattr(account, c.name) for c in account.__table__.columns}
+        task = send_messages_simple.apply_async(
+            args=(account_dict, group_senders.max_executions, "", shard, id_group_senders, group_senders.delay),
+            kwargs={"sharded": True},
+        )
+        db.add(models.Tasks(id_group_sender=id_group_senders, task_id=str(task.id), status=StatusTasks.running.value))
+        account.status = StatusAccount.active.value
+        created_shards.append({"id_account": id_account, "task_id": str(task.id), "groups": len(shard)})
+    await db.commit()
+    await incr_count(models.Tasks, len(shards))
+
+    return JSONResponse(
+        status_code=status.HTTP_201_CREATED,
+        content={"message": "Success add sharded task", "id_group_sender": id_group_senders, "shards": created_shards},
+    )
+
+@router.get("/progress/{id_group_sender}", status_code=status.HTTP_200_OK)
+async def get_progress(id_group_sender: int):
+    """
+    Retrieve the progress of the current cycle of a campaign.
+
+    Args:
+    - id_group_sender (int): The ID of the group sender of the campaign.
+
+    Returns:
+    - List[Dict]: One entry per account running the campaign, with the remaining executions of the
+      current cycle, the number of groups already sent and whether the cycle is done.
+    """
+    checkpoints = await run_in_threadpool(get_campaign_progress, id_group_sender)
+    return [
+        {
+            "id_account": checkpoint.id_account,
+            "task_id": checkpoint.state.get("task_id"),
+            "cycle": checkpoint.cycle,
+            "groups": len(checkpoint.state.get("group_list", [])),
+            "sent": len(checkpoint.sent),
+            "done": checkpoint.done,
+            "closed": checkpoint.closed,
+        }
+        for checkpoint in checkpoints
+    ]
+
+@router.post("/resume/{id_group_sender}", status_code=status.HTTP_201_CREATED)
+async def resume_campaign(id_group_sender: int, db: DBD, force: bool = False):
+    """
+    Resume a stopped or lost campaign from its progress checkpoints.
+
+    Every chain of the campaign is published again as a new task, which continues the interrupted
+    cycle from the first group not sent, or starts the next cycle when the interrupted one was closed.
+    Chains whose task is still running are left alone unless `force` is set.
+
+    Args:
+    - id_group_sender (int): The ID of the group sender of the campaign.
+    - db (DBD): A database connection object.
+    - force (bool): Resume chains whose task is still marked as running.
+
+    Returns:
+    - JSONResponse: The new task ID of every resumed chain.
+    """
+    group_sender = await db.get(models.Group_Senders, id_group_sender)
+    if group_sender is None:
+        raise HTTPException(status_code=404, detail='Group_senders was not found')
+    if group_sender.status == StatusGroupSenders.finished.value:
+        raise HTTPException(status_code=400, detail='The campaign is already finished')
+
+    checkpoints = await run_in_threadpool(get_campaign_progress, id_group_sender)
+    if not checkpoints:
+        raise HTTPException(status_code=404, detail='The campaign has no checkpoint')
 
+    resumed = []
+    created = 0
+    for checkpoint in checkpoints:
+        state = checkpoint.state
+        max_executions = checkpoint.cycle - 1 if checkpoint.closed else checkpoint.cycle
+        if max_executions < 1:
+            continue
+        result = await db.execute(select(models.Tasks).where(models.Tasks.task_id == state.get("task_id")))
+        db_task = result.scalars().first()
+        if db_task is not None and db_task.status == StatusTasks.running.value and not force:
+            continue
 
+        db_account = await db.get(models.Account, checkpoint.id_account)
+        if db_account is None:
+            continue
+        account = {c.name: getattr(db_account, c.name) for c in db_account.__table__.columns}
+        task = send_messages_simple.apply_async(
+            args=(account, max_executions, "", state["group_list"], id_group_sender, state["period"]),
+            kwargs={"sharded": state.get("sharded", False), "run": state.get("run")},
+        )
+        if db_task is None:
+            db.add(models.Tasks(id_group_sender=id_group_sender, task_id=str(task.id), status=StatusTasks.running.value))
+            created += 1
+        else:
+            db_task.task_id = str(task.id)
+            db_task.status = StatusTasks.running.value
+            db_task.stopped_at = None
+        await db.execute(
+            update(models.Account)
+            .where(models.Account.id == account.get("id"))
+            .values(status=StatusAccount.active.value)
+        )
+        resumed.append({"id_account": account.get("id"), "task_id": str(task.id), "max_executions": max_executions})
+    await db.commit()
+    await incr_count(models.Tasks, created)
+
+    return JSONResponse(
+        status_code=status.HTTP_201_CREATED,
+        content={"message": "Success resume task", "id_group_sender": id_group_sender, "tasks": resumed},
+    )
+
+@router.get("/unavailable_groups", status_code=status.HTTP_200_OK)
+async def get_unavailable_groups():
+    """
+    Retrieve the groups the senders currently skip because they rejected a previous send.
+
+    Returns:
+    - List[Dict]: The negative cache entries: group, account (empty when the entry applies to every
+      account), kind (`permanent` or `transient`), error and the seconds left before the entry expires.
+    """
+    return await run_in_threadpool(negative_cache.entries)
+
+@router.delete("/unavailable_groups", status_code=status.HTTP_200_OK)
+async def clear_unavailable_groups(id_group: Optional[int] = None, id_account: Optional[int] = None):
+    """
+    Remove groups from the negative cache, so the senders try them again.
+
+    Args:
+    - id_group (int, optional): Only remove the entries of this group.
+    - id_account (int, optional): Only remove the entries of this account.
+
+    Returns:
+    - JSONResponse: The number of entries removed.
+    """
+    removed = await run_in_threadpool(negative_cache.clear, id_group, id_account)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Success clear unavailable groups", "removed": removed})
+
+@router.post("/send/bulk",status_code=status.HTTP_201_CREATED)
+async def run_bulk_sender_messages(
+        campaigns: List[GroupsSendersSelectBase],
+        db: DBD,
+    ):
+    """
+    Endpoint to add many campaigns in one request.
+
+    Every campaign is validated first, and nothing is created when one of them is invalid. The
+    group senders and the tasks are then inserted with one multi-row INSERT each and the accounts
+    updated with one UPDATE, in a single transaction, and the Celery messages are published over
+    one broker connection. When the broker fails part-way, the tasks not published are marked as
+    stopped and the response status is 503.
+
+    Args:
+    - campaigns (List[GroupsSendersSelectBase]): The campaigns, as accepted by `/send`.
+    - db (DBD): A database connection object.
+
+    Returns:
+    - JSONResponse: The ID of the group sender and the task ID of every campaign, in request order.
+    """
+    if not campaigns:
+        raise HTTPException(status_code=400, detail='No campaign to add')
+    if len(campaigns) > settings.bulk_max_campaigns:
+        raise HTTPException(status_code=400, detail=f'At most {settings.bulk_max_campaigns} campaigns can be added at once')
+
+    id_accounts = {campaign.id_account for campaign in campaigns}
+    result = await db.execute(select(models.Account).where(models.Account.id.in_(id_accounts)))
+    accounts = {account.id: account for account in result.scalars().all()}
+    id_medias = {campaign.id_media for campaign in campaigns if campaign.id_media is not None}
+    found_medias = set()
+    if id_medias:
+        result = await db.execute(select(models.Media.id).where(models.Media.id.in_(id_medias)))
+        found_medias = set(result.scalars().all())
+
+    errors = []
+    parsed_messages = []
+    for index, campaign in enumerate(campaigns):
+        if campaign.id_account not in accounts:
+            errors.append({"index": index, "detail": f'Account {campaign.id_account} was not found'})
+        if campaign.id_media is not None and campaign.id_media not in found_medias:
+            errors.append({"index": index, "detail": f'Media {campaign.id_media} was not found'})
+        try:
+            parsed_messages.append(parse_message(campaign.message, campaign.id_media))
+        except MessageParseError as e:
+            errors.append({"index": index, "detail": str(e)})
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
+    task_ids = [uuid() for _ in campaigns]
+    try:
+        result = await db.execute(insert(models.Group_Senders).values([campaign.dict() for campaign in campaigns]))
+        # The IDs are read back instead of computed from LAST_INSERT_ID(), which only gives the first
+        # one: with auto_increment_increment > 1 they are not consecutive. The transaction snapshot
+        # predates the INSERT, so the rows of concurrent transactions are not visible.
+        result = await db.execute(
+            select(models.Group_Senders.id, models.Group_Senders.id_account)
+            .where(models.Group_Senders.id >= result.lastrowid)
+            .order_by(models.Group_Senders.id)
+            .limit(len(campaigns))
+        )
+        rows = result.all()
+        if [row.id_account for row in rows] != [campaign.id_account for campaign in campaigns]:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail='The created campaigns could not be read back')
+        id_group_senders = [row.id for row in rows]
+        await db.execute(insert(models.Tasks).values([
+            {"id_group_sender": id_group_sender, "task_id": task_id, "status": StatusTasks.running.value}
+            for id_group_sender, task_id in zip(id_group_senders, task_ids)
+        ]))
+        await db.execute(
+            update(models.Account)
+            .where(models.Account.id.in_(id_accounts))
+            .values(status=StatusAccount.active.value)
+        )
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail='Database integrity constraint violated')
+    await incr_count(models.Tasks, len(campaigns))
+
+    await run_in_threadpool(cache_messages, dict(zip(id_group_senders, parsed_messages)))
+
+    def serialize_model_instance(instance):
+        return {c.name: getattr(instance, c.name) for c in instance.__table__.columns}
+
+    account_dicts = {id_account: serialize_model_instance(account) for id_account, account in accounts.items()}
+    published = set()
+    try:
+        with celery.producer_or_acquire() as producer:
+            for campaign, id_group_sender, task_id in zip(campaigns, id_group_senders, task_ids):
+                send_messages_simple.apply_async(
+                    args=(
+                        account_dicts[campaign.id_account],
+                        campaign.max_executions,
+                        "",
+                        [group.dict() for group in campaign.group_list],
+                        id_group_sender,
+                        campaign.delay,
+                    ),
+                    task_id=task_id,
+                    producer=producer,
+                )
+                published.add(task_id)
+    except Exception as e:
+        logger.warning("Could not publish the bulk campaigns: %s", e)
+
+    unpublished = [task_id for task_id in task_ids if task_id not in published]
+    if unpublished:
+        await db.execute(
+            update(models.Tasks)
+            .where(models.Tasks.task_id.in_(unpublished))
+            .values(status=StatusTasks.stopped.value, stopped_at=datetime.now())
+        )
+        busy_accounts = {campaign.id_account for campaign, task_id in zip(campaigns, task_ids) if task_id in published}
+        idle_accounts = id_accounts - busy_accounts
+        if idle_accounts:
+            await db.execute(
+                update(models.Account)
+                .where(models.Account.id.in_(idle_accounts))
+                .values(status=StatusAccount.inactive.value)
+            )
+        await db.commit()
+
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE if unpublished else status.HTTP_201_CREATED,
+        content={
+            "message": "Some tasks could not be published" if unpublished else "Success add tasks",
+            "tasks": [
+                {
+                    "id_group_sender": id_group_sender,
+                    "task_id": task_id,
+                    "status": StatusTasks.running.value if task_id in published else StatusTasks.stopped.value,
+                }
+                for id_group_sender, task_id in zip(id_group_senders, task_ids)
+            ],
+        },
+    )
+
+@router.post("/schedule",status_code=status.HTTP_201_CREATED)
+async def create_schedule(
+        group_senders: GroupsSendersScheduleBase,
+        db: DBD,
+    ):
+    """
+    Endpoint to add a recurring campaign run by the scheduler.
+
+    The campaign runs every `delay` seconds from `start_at`, `max_executions` times or until the
+    schedule is paused or deleted when `unlimited` is set. Every run is a single cycle published by
+    `tasks.dispatch_schedules`, so no worker slot or broker message is held between runs.
+
+    Args:
+    - group_senders (GroupsSendersScheduleBase): The campaign and its schedule.
+    - db (DBD): A database connection object.
+
+    Returns:
+    - JSONResponse: The ID of the group sender and of the schedule, and the time of the first run.
+    """
+    if group_senders.delay < 1:
+        raise HTTPException(status_code=400, detail='The delay must be at least one second')
+    if group_senders.max_executions < 1 and not group_senders.unlimited:
+        raise HTTPException(status_code=400, detail='max_executions must be at least 1')
+    if await db.get(models.Account, group_senders.id_account) is None:
+        raise HTTPException(status_code=404, detail='Account was not found')
+
+    parsed_message = await parse_campaign_message(group_senders, db)
+
+    created_group_senders = await create_group_senders(
+        GroupsSendersSelectBase(**group_senders.dict(exclude={'start_at', 'unlimited'})), db
+    )
+    id_group_senders = created_group_senders.get('id')
+    await run_in_threadpool(cache_message, id_group_senders, parsed_message)
+
+    schedule = models.Schedule(
+        id_group_sender=id_group_senders,
+        interval_seconds=group_senders.delay,
+        remaining_runs=None if group_senders.unlimited else group_senders.max_executions,
+        next_run_at=group_senders.start_at or datetime.now(),
+        status=StatusSchedule.active.value,
+    )
+    try:
+        db.add(schedule)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail='Database integrity constraint violated')
+
+    return JSONResponse(
+        status_code=status.HTTP_201_CREATED,
+        content={
+            "message": "Success add schedule",
+            "id_group_sender": id_group_senders,
+            "id_schedule": schedule.id,
+            "next_run_at": schedule.next_run_at.isoformat(),
+        },
+    )
+
+@router.get("/schedules", status_code=status.HTTP_200_OK)
+async def get_schedules(db: DBD, status_schedule: Optional[StatusSchedule] = None, limit: int = 100):
+    """
+    Retrieve the schedules of the recurring campaigns, the next run first.
+
+    Args:
+    - db (DBD): A database connection object.
+    - status_schedule (StatusSchedule, optional): Only list the schedules with this status.
+    - limit (int): The maximum number of schedules.
+
+    Returns:
+    - List[Schedule]: The schedules.
+    """
+    select_schedules = select(models.Schedule).order_by(models.Schedule.next_run_at).limit(limit)
+    if status_schedule is not None:
+        select_schedules = select_schedules.where(models.Schedule.status == status_schedule.value)
+    result = await db.execute(select_schedules)
+    return result.scalars().all()
+
+async def set_schedule_status(id_schedule: int, from_status: StatusSchedule, to_status: StatusSchedule, db: DBD, **values):
+    """
+    Move a schedule from one status to another.
+
+    Raises:
+    - HTTPException: 404 if the schedule does not exist, 400 if it does not have `from_status`.
+    """
+    schedule = await db.get(models.Schedule, id_schedule)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail='Schedule was not found')
+    if schedule.status != from_status.value:
+        raise HTTPException(status_code=400, detail=f'The schedule is not {from_status.value}')
+    await db.execute(
+        update(models.Schedule)
+        .where(models.Schedule.id == id_schedule)
+        .values(status=to_status.value, **values)
+    )
+    await db.commit()
+
+@router.post("/schedule/{id_schedule}/pause", status_code=status.HTTP_200_OK)
+async def pause_schedule(id_schedule: int, db: DBD):
+    """
+    Endpoint to stop publishing the runs of a schedule. A run already started goes on until it ends.
+    """
+    await set_schedule_status(id_schedule, StatusSchedule.active, StatusSchedule.paused, db)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Schedule paused"})
+
+@router.post("/schedule/{id_schedule}/resume", status_code=status.HTTP_200_OK)
+async def resume_schedule(id_schedule: int, db: DBD, run_now: bool = False):
+    """
+    Endpoint to restart a paused schedule, at its next run or at once when `run_now` is set.
+    """
+    values = {"next_run_at": datetime.now()} if run_now else {}
+    await set_schedule_status(id_schedule, StatusSchedule.paused, StatusSchedule.active, db, **values)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Schedule resumed"})
+
+@router.delete("/schedule/{id_schedule}", status_code=status.HTTP_200_OK)
+async def delete_schedule(id_schedule: int, db: DBD):
+    """
+    Endpoint to remove a schedule. Its campaign is marked as finished unless a run is still going.
+    """
+    schedule = await db.get(models.Schedule, id_schedule)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail='Schedule was not found')
+    running = await db.scalar(
+        select(models.Tasks.id)
+        .where(models.Tasks.id_group_sender == schedule.id_group_sender)
+        .where(models.Tasks.status == StatusTasks.running.value)
+        .limit(1)
+    )
+    if running is None:
+        await db.execute(
+            update(models.Group_Senders)
+            .where(models.Group_Senders.id == schedule.id_group_sender)
+            .values(status=StatusGroupSenders.finished.value, stopped_at=datetime.now())
+        )
+    await db.delete(schedule)
+    await db.commit()
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Schedule deleted"})
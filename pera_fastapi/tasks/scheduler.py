@@ -0,0 +1,171 @@
+"""
+This module contains the database-driven scheduler of the recurring campaigns.
+
+A recurring campaign is a row of `campaign_schedules` holding the time of its next run
+(`next_run_at`), its interval and the runs left. Celery beat publishes `tasks.dispatch_schedules`
+every `settings.scheduler_interval` seconds, and the dispatcher:
+
+- claims up to `settings.scheduler_batch_size` active schedules with `next_run_at <= now()`, in
+  `next_run_at` order, with `SELECT ... FOR UPDATE SKIP LOCKED`, so several dispatchers never claim
+  the same row;
+- moves every claimed schedule to its next run, records the task ID of the run and inserts its
+  `tasks` row, in the same transaction;
+- publishes one single-cycle `send_messages_simple` task per run over one broker connection;
+- claims the next batch while the previous one was full.
+
+The scan reads the `(status, next_run_at)` index, so a dispatch costs O(due schedules) whatever the
+number of schedules. A run whose previous run is still going is skipped until the next interval.
+The dispatcher needs row locks and always uses the direct database connection of the workers.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from celery import Celery
+from celery.utils import uuid
+from sqlalchemy import insert, select, update
+
+from pera_fastapi.counters import incr_count_sync
+from pera_fastapi.models import models
+from pera_fastapi.models.schemas import StatusAccount, StatusSchedule, StatusTasks
+from pera_fastapi.settings import settings
+from . import worker_db
+
+logger = logging.getLogger(__name__)
+
+
+def next_run_after(next_run_at: datetime, interval_seconds: int, now: datetime) -> datetime:
+    """
+    Get the next run of a schedule, skipping the runs missed while the dispatcher was down.
+
+    Args:
+        next_run_at (datetime): The run being dispatched.
+        interval_seconds (int): The seconds between two runs.
+        now (datetime): The current time.
+
+    Returns:
+        datetime: The first run after `now` on the schedule grid, or `now` plus the interval when the schedule fell behind.
+    """
+    interval = timedelta(seconds=max(interval_seconds, 1))
+    next_run = next_run_at + interval
+    return next_run if next_run > now else now + interval
+
+
+async def _claim_due_schedules(batch_size: int) -> Tuple[int, List[Dict]]:
+    now = datetime.now()
+    runs = []
+    async with worker_db.async_session_maker() as session:
+        result = await session.execute(
+            select(models.Schedule)
+            .where(models.Schedule.status == StatusSchedule.active.value)
+            .where(models.Schedule.next_run_at <= now)
+            .order_by(models.Schedule.next_run_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        schedules = result.scalars().all()
+        if not schedules:
+            await session.rollback()
+            return 0, []
+
+        id_group_senders = [schedule.id_group_sender for schedule in schedules]
+        result = await session.execute(
+            select(models.Group_Senders, models.Account)
+            .join(models.Account, models.Account.id == models.Group_Senders.id_account)
+            .where(models.Group_Senders.id.in_(id_group_senders))
+        )
+        campaigns = {group_sender.id: (group_sender, account) for group_sender, account in result.all()}
+        last_task_ids = [schedule.last_task_id for schedule in schedules if schedule.last_task_id]
+        running = set()
+        if last_task_ids:
+            result = await session.execute(
+                select(models.Tasks.task_id)
+                .where(models.Tasks.task_id.in_(last_task_ids))
+                .where(models.Tasks.status == StatusTasks.running.value)
+            )
+            running = set(result.scalars().all())
+
+        schedule_rows = []
+        task_rows = []
+        id_accounts = set()
+        for schedule in schedules:
+            row = {
+                "id": schedule.id,
+                "next_run_at": next_run_after(schedule.next_run_at, schedule.interval_seconds, now),
+                "status": schedule.status,
+                "remaining_runs": schedule.remaining_runs,
+                "last_run_at": schedule.last_run_at,
+                "last_task_id": schedule.last_task_id,
+            }
+            schedule_rows.append(row)
+            campaign = campaigns.get(schedule.id_group_sender)
+            if campaign is None:
+                row["status"] = StatusSchedule.finished.value
+                continue
+            if schedule.last_task_id in running:
+                logger.warning("Schedule %s skipped, its last run %s is still running", schedule.id, schedule.last_task_id)
+                continue
+
+            group_sender, account = campaign
+            task_id = uuid()
+            row["last_run_at"] = now
+            row["last_task_id"] = task_id
+            if schedule.remaining_runs is not None:
+                row["remaining_runs"] = schedule.remaining_runs - 1
+                if row["remaining_runs"] <= 0:
+                    row["status"] = StatusSchedule.finished.value
+            task_rows.append({"id_group_sender": group_sender.id, "task_id": task_id, "status": StatusTasks.running.value})
+            id_accounts.add(account.id)
+            runs.append({
+                "task_id": task_id,
+                "id_group_sender": group_sender.id,
+                "period": schedule.interval_seconds,
+                "group_list": group_sender.group_list or [],
+                "account": {c.name: getattr(account, c.name) for c in account.__table__.columns},
+            })
+
+        await session.execute(update(models.Schedule), schedule_rows)
+        if task_rows:
+            await session.execute(insert(models.Tasks).values(task_rows))
+            await session.execute(
+                update(models.Account)
+                .where(models.Account.id.in_(id_accounts))
+                .values(status=StatusAccount.active.value)
+            )
+        await session.commit()
+    incr_count_sync(models.Tasks, len(task_rows))
+    return len(schedules), runs
+
+
+def dispatch_due_schedules(app: Celery) -> int:
+    """
+    Publish the runs of every due schedule, one batch after the other.
+
+    Args:
+        app (Celery): The Celery application publishing the runs.
+
+    Returns:
+        int: The number of runs published.
+    """
+    published = 0
+    while True:
+        claimed, runs = worker_db._run(_claim_due_schedules(settings.scheduler_batch_size))
+        if runs:
+            with app.producer_or_acquire() as producer:
+                for run in runs:
+                    try:
+                        app.send_task(
+                            "tasks.send_messages_simple",
+                            args=(run["account"], 1, "", run["group_list"], run["id_group_sender"], run["period"]),
+                            kwargs={"run": run["task_id"]},
+                            task_id=run["task_id"],
+                            producer=producer,
+                        )
+                        published += 1
+                    except Exception as e:
+                        logger.warning("Could not publish the scheduled run %s: %s", run["task_id"], e)
+                        worker_db.finish_scheduled_run(
+                            run["id_group_sender"], run["account"]["id"], run["task_id"], StatusTasks.stopped.value
+                        )
+        if claimed < settings.scheduler_batch_size:
+            return published
@@ -0,0 +1,175 @@
+"""
+This module contains the database-backed store of the Telegram sessions.
+
+Sessions used to be SQLite files named after the phone number in the working directory of the
+worker, so an account could only send from the node holding its file, and SQLite locking
+serialized concurrent use. Sessions are now kept in the `telegram_sessions` table as a Fernet-encrypted
+`StringSession` (plus the entities Telegram sent), loaded into memory when the pool creates the client,
+and written back only when the auth key, the data center or the entities changed.
+
+This store is opt-in: set `settings.telegram_session_store` to `"db"` to use it, the default `"file"` keeps
+using the session files. The encryption key is `settings.session_encryption_key`, which is required in
+this mode and checked when the first session is loaded, so processes that never load a session start
+without it. An account without a stored session imports its `<phone>.session` file once, if the
+worker still has it.
+"""
+import json
+import logging
+import os
+from typing import Optional, Union
+
+from cryptography.fernet import Fernet
+from telethon.sessions import SQLiteSession, StringSession
+
+from pera_fastapi.settings import settings
+from . import worker_db
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE_DB = "db"
+SESSION_STORE_FILE = "file"
+
+_fernet = None
+
+
+def get_fernet() -> Fernet:
+    """
+    Get the cipher of the stored sessions.
+
+    Returns:
+        Fernet: The cipher built from `settings.session_encryption_key`.
+
+    Raises:
+        RuntimeError: If no session encryption key is configured.
+    """
+    global _fernet
+    if _fernet is None:
+        if not settings.session_encryption_key:
+            raise RuntimeError('SESSION_ENCRYPTION_KEY is required when TELEGRAM_SESSION_STORE is "db"')
+        _fernet = Fernet(settings.session_encryption_key)
+    return _fernet
+
+
+class DBSession(StringSession):
+    """
+    In-memory Telegram session that tracks whether it changed since it was loaded or stored.
+    """
+
+    def __init__(self, string: str = None, entities=()):
+        super().__init__(string)
+        self._entities |= {tuple(entity) for entity in entities}
+        self.changed = False
+
+    @property
+    def auth_key(self):
+        return self._auth_key
+
+    @auth_key.setter
+    def auth_key(self, value):
+        if value != self._auth_key:
+            self.changed = True
+        self._auth_key = value
+
+    def set_dc(self, dc_id, server_address, port):
+        if (dc_id, server_address, port) != (self._dc_id, self._server_address, self._port):
+            self.changed = True
+        super().set_dc(dc_id, server_address, port)
+
+    def process_entities(self, tlo):
+        count = len(self._entities)
+        super().process_entities(tlo)
+        if len(self._entities) != count:
+            self.changed = True
+
+    def encrypt(self) -> str:
+        """
+        Serialize and encrypt the session.
+
+        Returns:
+            str: The encrypted session and entities.
+        """
+        payload = json.dumps({"session": StringSession.save(self), "entities": list(self._entities)})
+        return get_fernet().encrypt(payload.encode()).decode()
+
+    @classmethod
+    def decrypt(cls, data: str) -> "DBSession":
+        """
+        Decrypt a stored session.
+
+        Args:
+            data (str): The encrypted session, as returned by `encrypt`.
+
+        Returns:
+            DBSession: The session.
+        """
+        payload = json.loads(get_fernet().decrypt(data.encode()))
+        return cls(payload["session"], payload.get("entities", ()))
+
+
+def import_file_session(phone_number: str) -> Optional[DBSession]:
+    """
+    Read the SQLite session file of an account, if the worker has one.
+
+    Args:
+        phone_number (str): The phone number of the account, used as session file name.
+
+    Returns:
+        Optional[DBSession]: The session, marked as changed so it gets stored, or None.
+    """
+    if not os.path.exists(f"{phone_number}.session"):
+        return None
+    file_session = SQLiteSession(phone_number)
+    try:
+        if file_session.auth_key is None:
+            return None
+        session = DBSession(StringSession.save(file_session))
+    finally:
+        file_session.close()
+    session.changed = True
+    logger.info("Imported the session file of %s", phone_number)
+    return session
+
+
+def load_session(id_account: int, phone_number: str) -> Union[DBSession, str]:
+    """
+    Get the session the client of an account is created with.
+
+    Args:
+        id_account (int): The ID of the account.
+        phone_number (str): The phone number of the account.
+
+    Returns:
+        Union[DBSession, str]: The stored session, a new one, or the session file name when the
+        sessions are kept in files.
+
+    Raises:
+        RuntimeError: If the sessions are kept in the database without an encryption key.
+    """
+    if settings.telegram_session_store != SESSION_STORE_DB:
+        return phone_number
+    get_fernet()
+    data = worker_db.get_telegram_session(id_account)
+    if data:
+        try:
+            return DBSession.decrypt(data)
+        except Exception as e:
+            logger.warning("Could not decrypt the session of account %s: %s", id_account, e)
+    return import_file_session(phone_number) or DBSession()
+
+
+def save_session(id_account: int, session) -> bool:
+    """
+    Store the session of an account when it changed.
+
+    Args:
+        id_account (int): The ID of the account.
+        session: The session of the client.
+
+    Returns:
+        bool: True when the session was written.
+    """
+    if not isinstance(session, DBSession) or not session.changed or session.auth_key is None:
+        return False
+    worker_db.save_telegram_session(id_account, session.encrypt())
+    session.changed = False
+    return True
@@ -0,0 +1,74 @@
+"""
+This module contains the helpers used to shard a campaign across several accounts.
+
+The group list of a sharded campaign is split between the accounts in proportion to their current
+send rate, as tracked by the adaptive rate limiter, and every shard runs as its own
+`send_messages_simple` chain. All shards share the campaign's `group_senders` row: the number of
+running shards is kept in Redis under `pera:campaign:shards:<id_group_senders>` and the campaign
+is only marked as finished when the last shard completes.
+
+The counter has no expiry, since a campaign may run for longer than any fixed TTL. A shard finishing
+while the counter is missing is never taken for the last one. Stopping one shard stops every shard
+of the campaign, and the counter is kept so the resumed shards can still finish it.
+"""
+from typing import Dict, List, Sequence
+
+SHARDS_KEY_PREFIX = "pera:campaign:shards:"
+
+# Decrements the shard counter in KEYS[1] when it exists and deletes it once it reaches zero. A
+# missing counter returns nil, so the shard is not taken for the last one.
+FINISH_SHARD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local remaining = redis.call('DECR', KEYS[1])
+if remaining <= 0 then
+    redis.call('DEL', KEYS[1])
+end
+return remaining
+"""
+
+
+def shards_key(id_group_senders: int) -> str:
+    """
+    Get the Redis key counting the running shards of a campaign.
+
+    Args:
+        id_group_senders (int): The ID of the group sender of the campaign.
+
+    Returns:
+        str: The Redis key.
+    """
+    return f"{SHARDS_KEY_PREFIX}{id_group_senders}"
+
+
+def split_groups(groups: List[Dict], weights: Sequence[float]) -> List[List[Dict]]:
+    """
+    Split a group list into one contiguous shard per weight, sized in proportion to the weights.
+
+    Sizes are rounded with the largest remainder method, so they always add up to the number of groups.
+
+    Args:
+        groups (List[Dict]): The groups to split.
+        weights (Sequence[float]): The relative send rate of every shard.
+
+    Returns:
+        List[List[Dict]]: The shards, in the order of the weights. A shard may be empty.
+    """
+    total_weight = sum(weights)
+    if total_weight <= 0:
+        weights = [1.0] * len(weights)
+        total_weight = float(len(weights))
+
+    quotas = [len(groups) * weight / total_weight for weight in weights]
+    sizes = [int(quota) for quota in quotas]
+    by_remainder = sorted(range(len(weights)), key=lambda i: quotas[i] - sizes[i], reverse=True)
+    for i in by_remainder[:len(groups) - sum(sizes)]:
+        sizes[i] += 1
+
+    shards = []
+    start = 0
+    for size in sizes:
+        shards.append(groups[start:start + size])
+        start += size
+    return shards
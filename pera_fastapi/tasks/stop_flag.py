@@ -0,0 +1,126 @@
+"""
+This module contains the cooperative stop channel of the campaign chains.
+
+Stopping a chain sets `pera:stop:<task_id>` and pushes to `pera:stop:wake:<task_id>`. The sender
+checks the flag before every group, and every rate limiter wait is a `BLPOP` on the wake list, so a
+stop interrupts the wait at once instead of after the next sleep. Several waiters may share a chain
+(the next cycle, the deferred sends, the other shards): the waiter popping the wake token pushes it
+back before stopping, so the next waiter wakes up too, and every waiter checks the flag at least
+every `STOP_POLL_INTERVAL` seconds. The worker acknowledges the stop
+under `pera:stop:ack:<task_id>` and returns, leaving its Telegram client and worker slot in a clean
+state. A chain waiting in the broker for its next cycle stops as soon as that cycle starts.
+
+`tasks.enforce_stop` runs `settings.stop_grace_period` seconds after the stop and revokes the task
+with `terminate=True` only when the worker has not acknowledged it by then.
+"""
+import logging
+import time
+
+from redis import asyncio as aioredis
+
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+
+logger = logging.getLogger(__name__)
+
+STOP_KEY_PREFIX = "pera:stop:"
+STOP_POLL_INTERVAL = 1.0
+
+
+class CampaignStopped(Exception):
+    """ Raised inside a campaign cycle when a stop was requested for its chain. """
+
+
+def _keys(task_id: str):
+    return (
+        f"{STOP_KEY_PREFIX}{task_id}",
+        f"{STOP_KEY_PREFIX}wake:{task_id}",
+        f"{STOP_KEY_PREFIX}ack:{task_id}",
+    )
+
+
+async def request_stop(redis: aioredis.Redis, task_id: str):
+    """
+    Ask a campaign chain to stop.
+
+    Args:
+        redis (aioredis.Redis): The asyncio Redis client.
+        task_id (str): The task ID of the chain.
+    """
+    flag_key, wake_key, _ = _keys(task_id)
+    # The flag must outlive the countdown of a cycle waiting in the broker.
+    ttl = settings.celery_visibility_timeout
+    pipe = redis.pipeline()
+    pipe.set(flag_key, 1, ex=ttl)
+    pipe.rpush(wake_key, 1)
+    pipe.expire(wake_key, ttl)
+    await pipe.execute()
+
+
+def is_acknowledged(task_id: str) -> bool:
+    """
+    Check whether the worker running a chain has acknowledged its stop.
+
+    Args:
+        task_id (str): The task ID of the chain.
+
+    Returns:
+        bool: True when the worker stopped the chain by itself.
+    """
+    return bool(r.exists(_keys(task_id)[2]))
+
+
+class StopFlag:
+    """
+    The stop flag of one campaign chain, as seen by the worker.
+    """
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.flag_key, self.wake_key, self.ack_key = _keys(task_id)
+
+    def is_set(self) -> bool:
+        """
+        Check whether a stop was requested.
+
+        Returns:
+            bool: True when the chain must stop.
+        """
+        return bool(r.exists(self.flag_key))
+
+    def check(self):
+        """
+        Raise `CampaignStopped` when a stop was requested.
+        """
+        if self.is_set():
+            raise CampaignStopped(self.task_id)
+
+    def sleep(self, seconds: float):
+        """
+        Wait for `seconds`, or until a stop is requested.
+
+        Used as the `sleep` function of the rate limiter.
+
+        Args:
+            seconds (float): The seconds to wait.
+
+        Raises:
+            CampaignStopped: If a stop is requested before or during the wait.
+        """
+        self.check()
+        deadline = time.monotonic() + seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # BLPOP takes a float timeout; 0 would block forever.
+            woken = r.blpop([self.wake_key], timeout=min(max(remaining, 0.01), STOP_POLL_INTERVAL))
+            if woken is not None and self.is_set():
+                # Hand the token on to the next waiter of the chain before stopping.
+                r.rpush(self.wake_key, 1)
+            self.check()
+
+    def acknowledge(self):
+        """ Record that the chain stopped by itself, so it is not terminated after the grace period. """
+        r.set(self.ack_key, 1, ex=settings.celery_visibility_timeout)
+        logger.info("Campaign chain %s stopped", self.task_id)
@@ -13,12 +13,12 @@ from enum import Enum
 
 from pera_fastapi.models.schemas import GroupSelect, HistoryBase, StatusHistory, GroupsSendersSelectBase, StatusGroupSenders, StatusAccount, TaskUpdateStatusBase, StatusTasks
 from pera_fastapi.settings import settings
+from pera_fastapi.redis_client import redis_url, r
 from pera_fastapi.models.database import get_db, engine
 from .SendMessToChat import Sender
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import Session
 from pera_fastapi.routes.history_routes import create_history
-from pera_fastapi.routes.group_router import get_all_groups_count
 from pera_fastapi.routes.group_senders_router import update_group_senders
 from pera_fastapi.routes.tasks_router import update_task_work,get_task_by_group_sender
 from pera_fastapi.routes.account_router import update_account_status
@@ -40,21 +40,46 @@ from sqlalchemy import text
 
 from .requests import call_fastapi_endpoint_test_gwt_account,call_fastapi_update_group_senders,call_update_account_status,call_update_task_work
 
-from .SenderToGroups import Sender_simple
+from .SenderToGroups import Sender_simple, Sender_deferred
+from .worker_db import engine_async
+from .checkpoints import CampaignProgress
+from .stop_flag import CampaignStopped, StopFlag, is_acknowledged
+from .scheduler import dispatch_due_schedules
+from . import worker_db
+from . import warmup  # registers the worker_process_init warm-up stage
 
 
 
 DBD = Annotated[Session, Depends(get_db)]
 
-redis_url = f"redis://:{settings.redis_password}@{settings.redis_host}:{settings.redis_port}/0"
 celery = Celery("tasks", broker=redis_url, backend=redis_url)
 
-r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, password=settings.redis_password)
 celery.conf.broker_connection_retry_on_startup = True
+# Campaign cycles wait in the broker with a countdown of up to `delay` seconds; the visibility
+# timeout must be longer than that or Redis redelivers the scheduled cycle.
+celery.conf.broker_transport_options = {"visibility_timeout": settings.celery_visibility_timeout}
+# The warm-up stage runs in `worker_process_init`; the parent waits for it before killing the child.
+celery.conf.worker_proc_alive_timeout = settings.worker_warmup_timeout + 30
+# Celery beat (docker/celery_beat.sh) only triggers the schedule dispatcher, the schedules live in
+# `campaign_schedules`, the reconciliation of the cached row counters and the history rollups.
+celery.conf.beat_schedule = {
+    "dispatch-campaign-schedules": {
+        "task": "tasks.dispatch_schedules",
+        "schedule": timedelta(seconds=settings.scheduler_interval),
+        "options": {"expires": settings.scheduler_interval},
+    },
+    "reconcile-row-counters": {
+        "task": "tasks.reconcile_counters",
+        "schedule": timedelta(seconds=settings.counter_reconcile_interval),
+        "options": {"expires": settings.counter_reconcile_interval},
+    },
+    "rollup-history": {
+        "task": "tasks.rollup_history",
+        "schedule": timedelta(seconds=settings.rollup_interval),
+        "options": {"expires": settings.rollup_interval},
+    },
+}
 
-URL_DATABASE = 'mysql+aiomysql://{}:{}@{}:3306/{}'.format(settings.mysql_user, settings.mysql_password, settings.mysql_host, settings.mysql_database)
-
-engine_async = create_async_engine(URL_DATABASE)  # replace with your actual database connection string
 
 
 class DatabaseTask(Task):
@@ -177,7 +202,7 @@ def send_messages(
     
     
     
-@shared_task(bind=True, name="tasks.send_messages_simple")
+@shared_task(bind=True, name="tasks.send_messages_simple", acks_late=True, reject_on_worker_lost=True)
 def send_messages_simple(
     self,
     account: List,
@@ -186,16 +211,52 @@ def send_messages_simple(
     group_list: List[Dict[int, str]],
     id_group_senders: int,
     period: int,
+    sharded: bool = False,
+    run: str = None,
 ):
+    """
+    Run one cycle of a campaign and schedule the next one.
+
+    The worker slot is released between cycles: the next cycle is published with a countdown of
+    `period` seconds under the same task ID, carrying the remaining execution count. Keeping the
+    task ID lets `/api/telegram/tasks/stop/{task_id}/{account_id}` stop the whole chain: the stop
+    flag is checked when a cycle starts, before every group and during the rate limiter waits.
+    When no executions remain, the campaign is marked as finished. A shard of a sharded campaign
+    (`sharded=True`) only marks its own task and account, and the campaign once every shard is done.
+    A run of a recurring campaign (`run` set to its task ID by the scheduler) is a single cycle that
+    marks its own task and account, and the campaign once its schedule is over.
+
+    Progress is checkpointed after every group. The task is acknowledged only when it returns, so a
+    cycle interrupted by a lost worker is redelivered and continues from the first group not sent.
+    A cycle that fails part-way is not marked as done: the chain stops with its task marked as
+    stopped, and `/api/telegram/tasks/resume/{id_group_sender}` continues it from the first group not sent.
+    """
     api_id, api_hash, id_account, phone_number = account.get('telegram_id'), account.get('telegram_hash'), account.get('id'), account.get('phone')
 
     groups = group_list
     id_group_sender = id_group_senders
-    
-    try:
-        while max_executions >= 1:
+    progress = CampaignProgress(id_group_senders, id_account, run)
+    stop = StopFlag(self.request.id)
+    if stop.is_set():
+        stop.acknowledge()
+        print(f'Task stopped {id_group_senders}')
+        return
+
+    if max_executions >= 1:
+        checkpoint = progress.start_cycle(max_executions, {
+            "id_account": id_account,
+            "group_list": group_list,
+            "period": period,
+            "sharded": sharded,
+            "run": run,
+            "task_id": self.request.id,
+        })
+        if checkpoint.closed:
+            print(f'Cycle already closed | max-executions   {max_executions}')
+            return
+
+        if not checkpoint.done:
             try:
-                time.sleep(5)
                 Sender_simple(
                     api_id,
                     api_hash,
@@ -204,40 +265,112 @@ def send_messages_simple(
                     id_group_sender,
                     id_account,
                     message,
+                    rate_limit=account.get('rate_limit'),
+                    progress=progress,
+                    sent=checkpoint.sent,
+                    stop=stop,
                 )
-                
-
+            except CampaignStopped:
+                stop.acknowledge()
+                print(f'Task stopped {id_group_senders}')
+                return
             except Exception as e:
                 print(f"An error occurred: Sender -> {e}")
-            finally:
-                time.sleep(period)
-                max_executions -= 1
-                print(f'Message send | max-executions   {max_executions}')
+                try:
+                    worker_db.stop_chain(id_account, self.request.id, StatusTasks.stopped.value)
+                except Exception as e:
+                    print(f"An error occurred: stop chain {e}")
+                print(f'Cycle interrupted, resume to continue {id_group_senders}')
+                return
+            progress.mark_done()
+
+        max_executions -= 1
+        print(f'Message send | max-executions   {max_executions}')
+
+        if max_executions >= 1:
+            try:
+                self.apply_async(
+                    args=(account, max_executions, message, group_list, id_group_senders, period),
+                    kwargs={"sharded": sharded, "run": run},
+                    task_id=self.request.id,
+                    countdown=period,
+                )
+                progress.mark_closed()
+                return
+            except Exception as e:
+                print(f"An error occurred: schedule next cycle {e}")
+
+    try:
+        if run:
+            worker_db.finish_scheduled_run(id_group_senders, id_account, self.request.id, StatusTasks.success.value)
+        elif sharded:
+            worker_db.finish_shard(id_group_senders, id_account, self.request.id, StatusTasks.success.value)
+        else:
+            worker_db.finish_campaign(id_group_senders, StatusTasks.success.value)
+        progress.mark_closed()
     except Exception as e:
-        print(f"An error occurred: send messages {e}")
-    finally:
-        data = {
-            "id_account": id_account,
-            "max_executions": max_executions,
-            "message": "message",
-            "group_list": group_list,
-            "status": StatusGroupSenders.finished,
-            "delay": period,
-            "created_at": str(datetime.now()),
-        }
+        print(f"An error occurred: finish campaign {e}")
 
-        rs_gs = call_fastapi_update_group_senders(id_group_senders, data)
-        print(f'Update group senders: {rs_gs}')
-        
-        rs_ac = call_update_account_status(id_account, StatusAccount.inactive)
-        print(f'Update account status: {rs_ac}')
-        status_task = {
-            "status": StatusTasks.success,
-        }
-        rs_task = call_update_task_work(id_group_senders, status_task)
-        print(f'Update task status: {rs_task}')
-        
-        
-        print(f'Task finished {id_group_senders}')
-    
-        
+    print(f'Task finished {id_group_senders}')
+
+
+@shared_task(bind=True, name="tasks.send_deferred_group")
+def send_deferred_group(
+    self,
+    account: Dict,
+    message: str,
+    group: Dict[int, str],
+    id_group_senders: int,
+    attempt: int,
+    task_id: str = None,
+):
+    """
+    Retry a single group send that a flood error deferred to the time Telegram asked for.
+
+    The retry is dropped when the campaign chain `task_id` it was deferred from has been stopped.
+    """
+    stop = StopFlag(task_id) if task_id else None
+    if stop is not None and stop.is_set():
+        print(f'Deferred send to {group.get("name")} dropped, task {task_id} was stopped')
+        return
+    Sender_deferred(account, group, id_group_senders, message, attempt, stop=stop)
+
+
+@shared_task(bind=True, name="tasks.enforce_stop")
+def enforce_stop(self, task_id: str):
+    """
+    Terminate a campaign chain that did not stop by itself within the grace period.
+    """
+    if is_acknowledged(task_id):
+        return
+    print(f'Task {task_id} did not stop within {settings.stop_grace_period}s, terminating')
+    celery.control.revoke(task_id, terminate=True)
+
+
+@shared_task(bind=True, name="tasks.dispatch_schedules")
+def dispatch_schedules(self):
+    """
+    Publish the runs of the recurring campaigns that are due, triggered by Celery beat.
+    """
+    published = dispatch_due_schedules(self.app)
+    if published:
+        print(f'Scheduled runs published: {published}')
+
+
+@shared_task(bind=True, name="tasks.reconcile_counters")
+def reconcile_counters(self):
+    """
+    Reset the cached row counters of the count endpoints from SQL COUNT(*), triggered by Celery beat.
+    """
+    counts = worker_db.reconcile_counters()
+    print(f'Row counters reconciled: {counts}')
+
+
+@shared_task(bind=True, name="tasks.rollup_history")
+def rollup_history(self, max_batches: int = 10):
+    """
+    Add the new history rows to the delivery rollups, triggered by Celery beat.
+    """
+    report = worker_db.rollup_history(max_batches)
+    if report.get("batches"):
+        print(f'History rollups: {report}')
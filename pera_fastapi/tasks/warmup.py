@@ -0,0 +1,173 @@
+"""
+This module contains the warm-up stage of the Celery worker processes.
+
+A freshly started worker process used to do nothing until a task arrived, so the first cycle paid
+for the database and HTTP pools, the Telegram connections and the group resolution. When the worker
+process starts, the warm-up stage now:
+
+- opens the Redis, database and HTTP pools;
+- connects the Telegram clients of the accounts with a running campaign (`Tasks.status == running`),
+  up to `settings.worker_warmup_max_accounts` accounts;
+- loads the parsed message of those campaigns and resolves their groups missing from the peer
+  cache, up to `settings.worker_warmup_max_peers` resolutions.
+
+It stops after `settings.worker_warmup_timeout` seconds and then reports the process as ready under
+`pera:worker:ready:<hostname>:<pid>`, which `GET /api/telegram/tasks/workers` lists. The timeout is
+enforced with an alarm, so a connect or a resolution blocked on the network is interrupted too, and
+the resolutions fail on a flood wait instead of sleeping through it: the child must be ready before
+`worker_proc_alive_timeout`, or Celery kills it and forks another one that starts over.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from celery.signals import worker_process_init
+
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+from . import worker_db
+from .client_pool import client_pool
+from .message_cache import get_message
+from .peer_cache import get_cached_peer, resolve_peer
+from .requests import get_session
+
+logger = logging.getLogger(__name__)
+
+READY_KEY_PREFIX = "pera:worker:ready:"
+READY_TTL = 86400
+
+
+class WarmupTimeout(BaseException):
+    """
+    Raised by the warm-up alarm. It is not an `Exception`, so the handlers of the warm-up steps and
+    of Telethon do not swallow it.
+    """
+
+
+def _on_alarm(signum, frame):
+    raise WarmupTimeout()
+
+
+@contextmanager
+def hard_timeout(seconds: float):
+    """
+    Interrupt the block with `WarmupTimeout` after `seconds`, even inside a blocking call.
+
+    The alarm can only be set from the main thread; elsewhere the block runs without it.
+
+    Args:
+        seconds (float): The time limit of the block.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, max(seconds, 0.01))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+@contextmanager
+def no_flood_sleep(client):
+    """
+    Make a client raise `FloodWaitError` at once instead of sleeping through short flood waits.
+
+    Args:
+        client (TelegramClient): The pooled client, whose threshold is restored afterwards.
+    """
+    threshold = client.flood_sleep_threshold
+    client.flood_sleep_threshold = 0
+    try:
+        yield
+    finally:
+        client.flood_sleep_threshold = threshold
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Warm up the current worker process.
+
+    Returns:
+        Dict[str, float]: The warm-up counters: clients connected, peers resolved, errors and duration.
+    """
+    started = time.monotonic()
+    deadline = started + settings.worker_warmup_timeout
+    report = {"clients": 0, "peers": 0, "messages": 0, "errors": 0}
+
+    r.ping()
+    worker_db.open_pool()
+    get_session()
+
+    campaigns = worker_db.get_running_campaigns(settings.worker_warmup_max_accounts)
+    peers_left = settings.worker_warmup_max_peers
+    for campaign in campaigns:
+        if time.monotonic() > deadline:
+            break
+        account = campaign["account"]
+        try:
+            client = client_pool.acquire(
+                account["id"], account["telegram_id"], account["telegram_hash"], account["phone"],
+                interactive=False,
+            )
+            report["clients"] += 1
+            get_message(campaign["id_group_sender"])
+            report["messages"] += 1
+        except Exception as e:
+            report["errors"] += 1
+            logger.warning("Warm-up of account %s failed: %s", account["id"], e)
+            continue
+
+        for group in campaign["group_list"]:
+            if peers_left <= 0 or time.monotonic() > deadline:
+                break
+            if get_cached_peer(account["id"], group["name"]) is not None:
+                continue
+            peers_left -= 1
+            try:
+                with no_flood_sleep(client):
+                    resolve_peer(client, account["id"], group["name"])
+                report["peers"] += 1
+            except Exception as e:
+                report["errors"] += 1
+                logger.warning("Warm-up could not resolve %s: %s", group["name"], e)
+
+    report["duration"] = round(time.monotonic() - started, 3)
+    return report
+
+
+@worker_process_init.connect
+def warm_up_worker(**kwargs):
+    """ Warm up the worker process before it accepts tasks, then report it as ready. """
+    if not settings.worker_warmup_enabled:
+        return
+    client_pool.task_started()
+    try:
+        with hard_timeout(settings.worker_warmup_timeout):
+            report = warm_up()
+    except WarmupTimeout:
+        logger.warning("Worker warm-up interrupted after %ss", settings.worker_warmup_timeout)
+        report = {"error": "timeout"}
+    except Exception as e:
+        logger.warning("Worker warm-up failed: %s", e)
+        report = {"error": str(e)}
+    finally:
+        client_pool.task_finished()
+    client_pool.publish_stats()
+
+    key = f"{READY_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+    try:
+        pipe = r.pipeline()
+        pipe.hset(key, mapping={**report, "ready_at": time.time()})
+        pipe.expire(key, READY_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Could not report the worker as ready: %s", e)
+    logger.info("Worker process ready: %s", report)
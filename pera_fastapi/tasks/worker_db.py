@@ -0,0 +1,481 @@
+"""
+This module contains the data access layer used by the Celery workers.
+
+Workers write history, group sender, account and task status directly to MySQL through the pooled
+async engine of `models/database.py` instead of calling the public API over HTTP. The HTTP callbacks in `tasks/requests.py`
+stay available as a fallback: set `settings.worker_db_mode` to `"http"` to use them. They are also
+used when a function is called from inside a running event loop (the asyncio senders), where the
+worker cannot block on the engine.
+
+The queries run on an event loop private to this module, one per process. A task closing or
+replacing the current event loop of its thread cannot leave the pooled connections on a dead loop.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from celery.signals import worker_process_init
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from pera_fastapi.counters import count_tables, store_counts_sync
+from pera_fastapi.models import models
+from pera_fastapi.models.database import SessionLocal, engine
+from pera_fastapi.rollups import rollup_history as run_rollups
+from pera_fastapi.models.schemas import HistoryBase, StatusAccount, StatusTasks
+from pera_fastapi.models.queries import (
+    finish_group_sender,
+    finish_scheduled_run as finish_run,
+    get_running_campaigns as select_running_campaigns,
+)
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+from .sharding import FINISH_SHARD_SCRIPT, shards_key
+from .requests import (
+    call_create_histories,
+    call_fastapi_endpoint_test_gwt_account,
+    call_update_account_status,
+    call_update_group_senders_status,
+    call_update_task_work,
+    call_update_task_status,
+    call_finish_campaign,
+    call_finish_scheduled_run,
+    call_reconcile_counters,
+    call_rollup_history,
+    call_get_group_senders,
+    call_get_media,
+    call_get_media_content,
+    call_get_telegram_session,
+    call_get_running_campaigns,
+    call_save_telegram_session,
+)
+
+logger = logging.getLogger(__name__)
+
+WORKER_DB_DIRECT = "direct"
+WORKER_DB_HTTP = "http"
+
+engine_async = engine
+async_session_maker = SessionLocal
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+
+
+@worker_process_init.connect
+def reset_engine_pool(**kwargs):
+    """ Drop the connections inherited from the parent process after a fork. """
+    engine_async.sync_engine.dispose(close=False)
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_pid
+    if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+        if _loop is not None and _loop_pid == os.getpid():
+            # The pooled connections belong to the loop being replaced.
+            engine_async.sync_engine.dispose(close=False)
+        _loop = asyncio.new_event_loop()
+        _loop_pid = os.getpid()
+    return _loop
+
+
+def _in_running_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _use_direct() -> bool:
+    if settings.worker_db_mode != WORKER_DB_DIRECT:
+        return False
+    return not _in_running_loop()
+
+
+def _run(coro):
+    return _get_loop().run_until_complete(coro)
+
+
+async def _create_histories(rows: List[Dict]):
+    async with async_session_maker() as session:
+        await session.execute(insert(models.History).values(rows))
+        await session.commit()
+
+
+async def _update_status(statement):
+    async with async_session_maker() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def _finish_campaign(id_group_sender: int, task_status: str):
+    async with async_session_maker() as session:
+        return await finish_group_sender(id_group_sender, task_status, session)
+
+
+async def _finish_scheduled_run(id_group_sender: int, id_account: int, task_id: str, task_status: str):
+    async with async_session_maker() as session:
+        return await finish_run(id_group_sender, task_id, task_status, session, id_account)
+
+
+async def _finish_shard(id_account: int, task_id: str, task_status: str):
+    async with async_session_maker() as session:
+        await session.execute(
+            update(models.Tasks)
+            .where(models.Tasks.task_id == task_id)
+            .values(status=task_status, stopped_at=datetime.now())
+        )
+        await session.execute(
+            update(models.Account)
+            .where(models.Account.id == id_account)
+            .values(status=StatusAccount.inactive.value)
+        )
+        await session.commit()
+
+
+async def _get_group_senders_message(id_group_senders: int):
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(models.Group_Senders.message, models.Group_Senders.id_media)
+            .where(models.Group_Senders.id == id_group_senders)
+        )
+        row = result.first()
+        return (row.message, row.id_media) if row is not None else (None, None)
+
+
+async def _get_media_info(id_media: int):
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(models.Media.name, models.Media.mime_type, models.Media.sha256)
+            .where(models.Media.id == id_media)
+        )
+        row = result.first()
+        return dict(row._mapping) if row is not None else None
+
+
+async def _ping():
+    async with engine_async.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def _get_running_campaigns(limit: int):
+    async with async_session_maker() as session:
+        return await select_running_campaigns(session, limit)
+
+
+async def _get_telegram_session(id_account: int):
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(models.TelegramSession.data).where(models.TelegramSession.id_account == id_account)
+        )
+        return result.scalar_one_or_none()
+
+
+async def _save_telegram_session(id_account: int, data: str):
+    statement = mysql_insert(models.TelegramSession).values(id_account=id_account, data=data, updated_at=datetime.now())
+    statement = statement.on_duplicate_key_update(data=statement.inserted.data, updated_at=statement.inserted.updated_at)
+    async with async_session_maker() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def _get_media_content(id_media: int):
+    async with async_session_maker() as session:
+        result = await session.execute(select(models.Media.data).where(models.Media.id == id_media))
+        return result.scalar_one_or_none()
+
+
+async def _count_tables():
+    async with async_session_maker() as session:
+        return await count_tables(session)
+
+
+async def _rollup_history(max_batches: int):
+    async with async_session_maker() as session:
+        return await run_rollups(session, max_batches=max_batches)
+
+
+async def _get_account(id_account: int):
+    async with async_session_maker() as session:
+        account = await session.get(models.Account, id_account)
+        if account is None:
+            return None
+        return {c.name: getattr(account, c.name) for c in account.__table__.columns}
+
+
+def create_histories(rows: List[Dict]):
+    """
+    Store many history records.
+
+    Args:
+        rows (List[Dict]): The history records, as accepted by `HistoryBase`.
+    """
+    if not rows:
+        return
+    if not _use_direct():
+        call_create_histories(rows)
+        return
+    _run(_create_histories([HistoryBase(**row).dict() for row in rows]))
+
+
+def get_account(id_account: int) -> Dict:
+    """
+    Get an account.
+
+    Args:
+        id_account (int): The ID of the account.
+
+    Returns:
+        Dict: The account columns, or None when the account does not exist.
+    """
+    if not _use_direct():
+        return call_fastapi_endpoint_test_gwt_account(id_account)
+    return _run(_get_account(id_account))
+
+
+def get_group_senders_message(id_group_senders: int) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Get the message of a group sender.
+
+    Args:
+        id_group_senders (int): The ID of the group sender.
+
+    Returns:
+        Tuple[Optional[str], Optional[int]]: The HTML message and the ID of its media file, or
+        (None, None) when the group sender does not exist.
+    """
+    if not _use_direct():
+        group_senders = call_get_group_senders(id_group_senders)
+        return group_senders.get('message'), group_senders.get('id_media')
+    return _run(_get_group_senders_message(id_group_senders))
+
+
+def get_media_info(id_media: int) -> Optional[Dict]:
+    """
+    Get the details of a media file, without its content.
+
+    Args:
+        id_media (int): The ID of the media file.
+
+    Returns:
+        Optional[Dict]: The name, MIME type and SHA-256 digest, or None when the file does not exist.
+    """
+    if not _use_direct():
+        return call_get_media(id_media)
+    return _run(_get_media_info(id_media))
+
+
+def get_media_content(id_media: int) -> bytes:
+    """
+    Get the content of a media file.
+
+    Args:
+        id_media (int): The ID of the media file.
+
+    Returns:
+        bytes: The file content.
+    """
+    if not _use_direct():
+        return call_get_media_content(id_media)
+    return _run(_get_media_content(id_media))
+
+
+def update_group_senders_status(id_group_senders: int, status: str):
+    """
+    Change the status of a group sender.
+
+    Args:
+        id_group_senders (int): The ID of the group sender.
+        status (str): The new status.
+    """
+    if not _use_direct():
+        call_update_group_senders_status(id_group_senders, status)
+        return
+    _run(_update_status(
+        update(models.Group_Senders)
+        .where(models.Group_Senders.id == id_group_senders)
+        .values(status=status, stopped_at=datetime.now())
+    ))
+
+
+def update_account_status(id_account: int, status: str):
+    """
+    Change the status of an account.
+
+    Args:
+        id_account (int): The ID of the account.
+        status (str): The new status.
+    """
+    if not _use_direct():
+        call_update_account_status(id_account, status)
+        return
+    _run(_update_status(
+        update(models.Account)
+        .where(models.Account.id == id_account)
+        .values(status=status)
+    ))
+
+
+def update_task_status(id_group_sender: int, status: str):
+    """
+    Change the status of the task running a group sender.
+
+    Args:
+        id_group_sender (int): The ID of the group sender run by the task.
+        status (str): The new status.
+    """
+    if not _use_direct():
+        call_update_task_work(id_group_sender, {"status": status})
+        return
+    _run(_update_status(
+        update(models.Tasks)
+        .where(models.Tasks.id_group_sender == id_group_sender)
+        .values(status=status, stopped_at=datetime.now())
+    ))
+
+
+def finish_campaign(id_group_sender: int, task_status: str = StatusTasks.success.value):
+    """
+    Mark a campaign as finished: group sender, account and task status in one transaction.
+
+    Args:
+        id_group_sender (int): The ID of the group sender of the campaign.
+        task_status (str): The final status of the task.
+    """
+    if not _use_direct():
+        call_finish_campaign(id_group_sender, {"status": task_status})
+        return
+    _run(_finish_campaign(id_group_sender, task_status))
+
+
+def stop_chain(id_account: int, task_id: str, task_status: str = StatusTasks.stopped.value):
+    """
+    Mark one campaign chain as over: its task and its account, leaving the group sender as it is.
+
+    Args:
+        id_account (int): The account that ran the chain.
+        task_id (str): The task ID of the chain.
+        task_status (str): The final status of the task.
+    """
+    if not _use_direct():
+        call_update_task_status(task_id, {"status": task_status})
+        call_update_account_status(id_account, StatusAccount.inactive.value)
+        return
+    _run(_finish_shard(id_account, task_id, task_status))
+
+
+def finish_shard(id_group_sender: int, id_account: int, task_id: str, task_status: str = StatusTasks.success.value):
+    """
+    Mark one shard of a sharded campaign as finished, and the campaign when it was the last shard.
+
+    Args:
+        id_group_sender (int): The ID of the group sender of the campaign.
+        id_account (int): The account that ran the shard.
+        task_id (str): The task ID of the shard.
+        task_status (str): The final status of the shard task.
+    """
+    stop_chain(id_account, task_id, task_status)
+    remaining = r.eval(FINISH_SHARD_SCRIPT, 1, shards_key(id_group_sender))
+    if remaining is not None and int(remaining) <= 0:
+        finish_campaign(id_group_sender, task_status)
+
+
+def finish_scheduled_run(id_group_sender: int, id_account: int, task_id: str, task_status: str = StatusTasks.success.value):
+    """
+    Mark one run of a recurring campaign as finished, and the campaign when its schedule is over.
+
+    Args:
+        id_group_sender (int): The ID of the group sender of the campaign.
+        id_account (int): The account that ran the campaign.
+        task_id (str): The task ID of the run.
+        task_status (str): The final status of the run.
+    """
+    if not _use_direct():
+        call_finish_scheduled_run(id_group_sender, task_id, {"status": task_status})
+        return
+    _run(_finish_scheduled_run(id_group_sender, id_account, task_id, task_status))
+
+
+def get_telegram_session(id_account: int) -> Optional[str]:
+    """
+    Get the stored Telegram session of an account.
+
+    Args:
+        id_account (int): The ID of the account.
+
+    Returns:
+        Optional[str]: The encrypted session, or None when the account has none.
+    """
+    if not _use_direct():
+        return call_get_telegram_session(id_account)
+    return _run(_get_telegram_session(id_account))
+
+
+def save_telegram_session(id_account: int, data: str):
+    """
+    Store the Telegram session of an account, replacing the previous one.
+
+    Args:
+        id_account (int): The ID of the account.
+        data (str): The encrypted session.
+    """
+    if not _use_direct():
+        call_save_telegram_session(id_account, data)
+        return
+    _run(_save_telegram_session(id_account, data))
+
+
+def open_pool():
+    """
+    Open a first connection of the worker pool, so the first task does not pay for it.
+    """
+    if _use_direct():
+        _run(_ping())
+
+
+def get_running_campaigns(limit: int) -> List[Dict]:
+    """
+    Get the campaigns with a running task and the account sending them.
+
+    Args:
+        limit (int): The maximum number of campaigns.
+
+    Returns:
+        List[Dict]: The ID and group list of every campaign, with its account credentials.
+    """
+    if not _use_direct():
+        return call_get_running_campaigns(limit)
+    return _run(_get_running_campaigns(limit))
+
+
+def reconcile_counters() -> Dict[str, int]:
+    """
+    Reset the cached row counters from SQL COUNT(*).
+
+    Returns:
+        Dict[str, int]: The number of rows keyed by table name.
+    """
+    if not _use_direct():
+        return call_reconcile_counters()
+    counts = _run(_count_tables())
+    store_counts_sync(counts)
+    return counts
+
+
+def rollup_history(max_batches: int) -> Dict[str, int]:
+    """
+    Add the history rows newer than the watermark to the delivery rollups.
+
+    Args:
+        max_batches (int): The largest number of batches of `settings.rollup_batch_size` rows.
+
+    Returns:
+        Dict[str, int]: The number of batches and the watermark reached.
+    """
+    if not _use_direct():
+        return call_rollup_history(max_batches)
+    return _run(_rollup_history(max_batches))
@@ -0,0 +1,22 @@
+import os
+
+import pytest
+import redis
+
+from pera_fastapi.redis_client import r
+
+
+@pytest.fixture
+def redis_server():
+    """
+    Give the Redis client of the workers, skipping the test when Redis is not reachable.
+
+    CI runs a Redis service, so there an unreachable Redis fails the test instead of skipping it.
+    """
+    try:
+        r.ping()
+    except redis.exceptions.ConnectionError:
+        if os.environ.get("CI"):
+            raise
+        pytest.skip("Redis is not reachable")
+    return r
@@ -0,0 +1,157 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from pera_fastapi.models import models
+from pera_fastapi.models.schemas import GroupsSendersSelectBase
+from pera_fastapi.tasks import router
+from pera_fastapi.tasks.router import run_bulk_sender_messages
+
+
+class FakeResult:
+    def __init__(self, rows=(), lastrowid=None):
+        self._rows = list(rows)
+        self.lastrowid = lastrowid
+        self.rowcount = len(self._rows)
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    """ Answers the statements in order with the given results, and records them """
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile()))
+        return self.results.pop(0) if self.results else FakeResult()
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def campaign(id_account, message="<b>Hello</b>"):
+    return GroupsSendersSelectBase(
+        id_account=id_account,
+        max_executions=1,
+        message=message,
+        group_list=[{"id_group": 1, "name": "group1"}],
+    )
+
+
+def account(id_account):
+    return models.Account(id=id_account, phone=f"+{id_account}", telegram_id=123, telegram_hash="hash")
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    """
+    Replace the broker, the counters and the message cache, failing the publish of the given task numbers
+    """
+    published = []
+    broker = SimpleNamespace(published=published, fail_at=None)
+
+    @contextmanager
+    def producer_or_acquire():
+        yield object()
+
+    def apply_async(*args, **kwargs):
+        if len(published) == broker.fail_at:
+            raise ConnectionError("broker down")
+        published.append(kwargs["task_id"])
+
+    async def incr_count(*args):
+        return None
+
+    monkeypatch.setattr(router.celery, "producer_or_acquire", producer_or_acquire)
+    monkeypatch.setattr(router.send_messages_simple, "apply_async", apply_async)
+    monkeypatch.setattr(router, "incr_count", incr_count)
+    monkeypatch.setattr(router, "cache_messages", lambda messages: None)
+    return broker
+
+
+def test_invalid_campaigns_create_nothing():
+    """
+    Test that every invalid campaign is reported with its index and nothing is inserted
+    """
+    db = FakeSession(FakeResult([account(3)]))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run_bulk_sender_messages([campaign(3), campaign(4), campaign(3, message="<b></b>")], db))
+
+    assert error.value.status_code == 400
+    assert [item["index"] for item in error.value.detail] == [1, 2]
+    assert len(db.statements) == 1
+
+
+def test_bulk_campaigns_are_created_in_one_transaction(broker):
+    """
+    Test that the campaigns are inserted with one INSERT per table, read back and all published
+    """
+    db = FakeSession(
+        FakeResult([account(3), account(4)]),
+        FakeResult(lastrowid=10),
+        FakeResult([SimpleNamespace(id=10, id_account=3), SimpleNamespace(id=12, id_account=4)]),
+    )
+
+    response = asyncio.run(run_bulk_sender_messages([campaign(3), campaign(4)], db))
+
+    content = json.loads(response.body)
+    assert response.status_code == 201
+    assert [task["id_group_sender"] for task in content["tasks"]] == [10, 12]
+    assert [task["task_id"] for task in content["tasks"]] == broker.published
+    assert db.commits == 1
+
+
+def test_rows_of_other_transactions_are_not_taken(broker):
+    """
+    Test that the creation is rolled back when the rows read back are not the campaigns of the request
+    """
+    db = FakeSession(
+        FakeResult([account(3), account(4)]),
+        FakeResult(lastrowid=10),
+        FakeResult([SimpleNamespace(id=10, id_account=3), SimpleNamespace(id=11, id_account=9)]),
+    )
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run_bulk_sender_messages([campaign(3), campaign(4)], db))
+
+    assert error.value.status_code == 500
+    assert (db.commits, db.rollbacks) == (0, 1)
+    assert broker.published == []
+
+
+def test_unpublished_tasks_are_stopped(broker):
+    """
+    Test that a broker failure part-way stops the tasks not published and answers 503
+    """
+    broker.fail_at = 1
+    db = FakeSession(
+        FakeResult([account(3), account(4)]),
+        FakeResult(lastrowid=10),
+        FakeResult([SimpleNamespace(id=10, id_account=3), SimpleNamespace(id=11, id_account=4)]),
+    )
+
+    response = asyncio.run(run_bulk_sender_messages([campaign(3), campaign(4)], db))
+
+    content = json.loads(response.body)
+    assert response.status_code == 503
+    assert [task["status"] for task in content["tasks"]] == ["running", "stopped"]
+    assert db.statements[-2].startswith("UPDATE tasks")
+    assert db.statements[-1].startswith("UPDATE accounts")
+    assert db.commits == 2
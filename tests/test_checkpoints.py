@@ -0,0 +1,67 @@
+import uuid
+
+import pytest
+
+from pera_fastapi.tasks.checkpoints import CampaignProgress, Checkpoint
+
+
+@pytest.fixture
+def progress(redis_server):
+    """
+    Give the checkpoint of a chain of its own and delete it after the test
+    """
+    progress = CampaignProgress(5, 3, run=f"test-{uuid.uuid4().hex}")
+    yield progress
+    redis_server.delete(progress.key)
+
+
+def test_checkpoint_from_hash():
+    """
+    Test that the Redis hash of a checkpoint reads back into the cycle, the groups sent and the flags
+    """
+    checkpoint = Checkpoint.from_hash({
+        "cycle": "4",
+        "state": '{"id_account": 3}',
+        "group:1": "1",
+        "group:7": "1",
+        "done": "1",
+    })
+
+    assert (checkpoint.cycle, checkpoint.sent, checkpoint.done, checkpoint.closed) == (4, {1, 7}, True, False)
+    assert checkpoint.id_account == 3
+
+
+def test_checkpoint_account_of_older_checkpoints():
+    """
+    Test that the account is also found in the checkpoints that stored the whole account
+    """
+    assert Checkpoint(cycle=1, state={"account": {"id": 3, "telegram_hash": "hash"}}).id_account == 3
+
+
+def test_redelivered_cycle_skips_the_groups_sent(progress):
+    """
+    Test that a cycle started again picks up the groups already sent
+    """
+    progress.start_cycle(4, {"id_account": 3})
+    progress.mark_sent(1)
+    progress.mark_sent(2)
+
+    checkpoint = progress.start_cycle(4, {"id_account": 3})
+
+    assert checkpoint.sent == {1, 2}
+    assert not checkpoint.done
+
+
+def test_next_cycle_starts_empty(progress):
+    """
+    Test that a new cycle forgets the groups and the flags of the previous one
+    """
+    progress.start_cycle(4, {"id_account": 3})
+    progress.mark_sent(1)
+    progress.mark_done()
+    progress.mark_closed()
+
+    checkpoint = progress.start_cycle(3, {"id_account": 3})
+
+    assert (checkpoint.sent, checkpoint.done, checkpoint.closed) == (set(), False, False)
+    assert progress.load().cycle == 3
@@ -0,0 +1,90 @@
+from pera_fastapi.tasks import client_pool as client_pool_module
+from pera_fastapi.tasks.client_pool import ClientPool
+
+
+class FakeClient:
+    def __init__(self):
+        self.connected = True
+        self.session = None
+
+    def is_connected(self):
+        return self.connected
+
+    def is_user_authorized(self):
+        return True
+
+    def disconnect(self):
+        self.connected = False
+
+
+def make_pool(monkeypatch, idle_timeout=60):
+    now = [1000.0]
+    monkeypatch.setattr(client_pool_module.time, "monotonic", lambda: now[0])
+    pool = ClientPool(idle_timeout=idle_timeout, health_check_interval=30)
+    connected = []
+
+    def connect(id_account, api_id, api_hash, phone_number, interactive=True):
+        client = FakeClient()
+        connected.append(client)
+        return client
+
+    monkeypatch.setattr(pool, "_connect", connect)
+    monkeypatch.setattr(pool, "_save_session", lambda id_account, entry: None)
+    return pool, now, connected
+
+
+def test_acquire_reuses_the_connected_client(monkeypatch):
+    """
+    Test that an account gets the same client back while it stays connected
+    """
+    pool, now, connected = make_pool(monkeypatch)
+
+    first = pool.acquire(1, 123, "hash", "+100")
+    second = pool.acquire(1, 123, "hash", "+100")
+
+    assert first is second
+    assert len(connected) == 1
+    assert (pool.hits, pool.misses) == (1, 1)
+
+
+def test_acquire_replaces_a_disconnected_client(monkeypatch):
+    """
+    Test that a client that lost its connection is discarded and connected again
+    """
+    pool, now, connected = make_pool(monkeypatch)
+
+    first = pool.acquire(1, 123, "hash", "+100")
+    first.connected = False
+    second = pool.acquire(1, 123, "hash", "+100")
+
+    assert second is not first
+    assert pool.evictions == 1
+
+
+def test_reap_idle_disconnects_unused_clients(monkeypatch):
+    """
+    Test that only the clients unused for longer than the idle timeout are disconnected
+    """
+    pool, now, connected = make_pool(monkeypatch, idle_timeout=60)
+    idle = pool.acquire(1, 123, "hash", "+100")
+    now[0] += 50
+    active = pool.acquire(2, 123, "hash", "+200")
+    now[0] += 20
+
+    pool.reap_idle()
+
+    assert not idle.is_connected()
+    assert active.is_connected()
+    assert pool.stats()["size"] == 1
+
+
+def test_busy_count_never_goes_negative():
+    """
+    Test that the task counter used by the reaper thread stays consistent
+    """
+    pool = ClientPool(idle_timeout=60, health_check_interval=30)
+    pool.task_started()
+    pool.task_finished()
+    pool.task_finished()
+
+    assert pool._busy == 0
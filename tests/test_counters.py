@@ -0,0 +1,99 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+from pera_fastapi.counters import counter_key, count_rows, get_count, incr_count_sync
+from pera_fastapi.models import models
+from pera_fastapi.redis_client import r
+
+
+class FakeSession:
+    """ Database session returning a fixed count and recording the statements """
+
+    def __init__(self, count):
+        self.count = count
+        self.statements = []
+
+    async def scalar(self, statement):
+        self.statements.append(str(statement.compile()))
+        return self.count
+
+
+class FakeRedis:
+    """ Asyncio Redis client holding the counters in a dict """
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+
+def test_count_rows_runs_count():
+    """
+    Test that a count is a single SQL COUNT(*) with the filters
+    """
+    db = FakeSession(4)
+
+    assert asyncio.run(count_rows(db, models.Tasks, models.Tasks.status == "running")) == 4
+    assert len(db.statements) == 1
+    assert "count(*)" in db.statements[0]
+    assert "WHERE tasks.status" in db.statements[0]
+
+
+def test_get_count_reads_the_cached_counter():
+    """
+    Test that an unfiltered count is read from Redis without querying the database
+    """
+    db = FakeSession(4)
+    redis = FakeRedis({counter_key(models.Group): b"12"})
+
+    assert asyncio.run(get_count(db, models.Group, redis=redis)) == 12
+    assert db.statements == []
+
+
+def test_get_count_fills_the_counter_on_a_miss():
+    """
+    Test that a missing counter is filled from COUNT(*)
+    """
+    db = FakeSession(4)
+    redis = FakeRedis()
+
+    assert asyncio.run(get_count(db, models.Group, redis=redis)) == 4
+    assert redis.values == {counter_key(models.Group): 4}
+    assert len(db.statements) == 1
+
+
+def test_get_count_with_filters_skips_the_counter():
+    """
+    Test that a filtered count always queries the database
+    """
+    db = FakeSession(2)
+    redis = FakeRedis({counter_key(models.Tasks): b"12"})
+
+    assert asyncio.run(get_count(db, models.Tasks, models.Tasks.status == "running", redis=redis)) == 2
+    assert len(db.statements) == 1
+
+
+def test_incr_count_moves_only_an_existing_counter(redis_server):
+    """
+    Test that the counter is moved while it exists and never created by an increment
+    """
+    model = SimpleNamespace(__tablename__=f"test_{random.randint(1, 10 ** 9)}")
+    key = counter_key(model)
+    try:
+        incr_count_sync(model, 3)
+        assert r.get(key) is None
+
+        r.set(key, 10)
+        incr_count_sync(model, 3)
+        incr_count_sync(model, -1)
+        assert int(r.get(key)) == 12
+    finally:
+        r.delete(key)
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import pytest
+from telethon.errors.rpcerrorlist import FloodWaitError, PeerFloodError
+
+from pera_fastapi.settings import settings
+from pera_fastapi.tasks import SenderToGroups
+from pera_fastapi.tasks.SenderToGroups import Sender_deferred, defer_group_send, defer_seconds
+
+ACCOUNT = {"id": 3, "telegram_id": 123, "telegram_hash": "hash", "phone": "+100", "rate_limit": None}
+GROUP = {"id_group": 1, "name": "group1"}
+
+
+def test_defer_seconds():
+    """
+    Test that a send is deferred by the wait Telegram asked for, or by the default for a peer flood
+    """
+    assert defer_seconds(FloodWaitError(request=None, capture=42)) == 42
+    assert defer_seconds(PeerFloodError(request=None)) == settings.peer_flood_defer_seconds
+
+
+def test_defer_group_send(monkeypatch):
+    """
+    Test that a deferred send is published as its own task with a countdown
+    """
+    sent = []
+    monkeypatch.setattr(SenderToGroups.current_app, "send_task", lambda name, **kwargs: sent.append((name, kwargs)))
+
+    defer_group_send(ACCOUNT, GROUP, 5, "", 30, attempt=2, task_id="task-1")
+
+    assert sent == [("tasks.send_deferred_group", {
+        "args": (ACCOUNT, "", GROUP, 5, 2),
+        "kwargs": {"task_id": "task-1"},
+        "countdown": 31,
+    })]
+
+
+@pytest.fixture
+def deferred(monkeypatch):
+    """
+    Retry a deferred send that Telegram keeps flood-limiting, recording the deferrals and the history
+    """
+    deferrals = []
+    history = []
+    monkeypatch.setattr(SenderToGroups, "skip_unavailable_group", lambda *args: False)
+    monkeypatch.setattr(SenderToGroups.rate_limiter, "blocked_for", lambda *args: 0)
+    monkeypatch.setattr(SenderToGroups.rate_limiter, "acquire", lambda *args, **kwargs: 0)
+    monkeypatch.setattr(SenderToGroups, "get_message", lambda *args: SimpleNamespace())
+    monkeypatch.setattr(SenderToGroups.client_pool, "acquire", lambda *args: SimpleNamespace())
+    monkeypatch.setattr(SenderToGroups.client_pool, "publish_stats", lambda: None)
+    monkeypatch.setattr(SenderToGroups.history_buffer, "add", history.append)
+    monkeypatch.setattr(SenderToGroups.history_buffer, "flush", lambda: 0)
+
+    def flood(*args):
+        raise FloodWaitError(request=None, capture=20)
+
+    monkeypatch.setattr(SenderToGroups, "send_message", flood)
+    monkeypatch.setattr(SenderToGroups, "defer_group_send", lambda *args: deferrals.append(args))
+    return SimpleNamespace(deferrals=deferrals, history=history)
+
+
+def test_flood_defers_the_send_again(deferred):
+    """
+    Test that a send still flood-limited is deferred again with the next attempt number
+    """
+    Sender_deferred(ACCOUNT, GROUP, 5, "", 1)
+
+    assert len(deferred.deferrals) == 1
+    assert deferred.deferrals[0][4:6] == (20, 2)
+    assert deferred.history == []
+
+
+def test_last_attempt_records_a_failure(deferred, monkeypatch):
+    """
+    Test that the send gives up after `flood_defer_max_attempts` attempts and records a failed send
+    """
+    monkeypatch.setattr(settings, "flood_defer_max_attempts", 3)
+
+    Sender_deferred(ACCOUNT, GROUP, 5, "", 3)
+
+    assert deferred.deferrals == []
+    assert [row["status"] for row in deferred.history] == [SenderToGroups.StatusHistory.failed]
@@ -0,0 +1,73 @@
+from pera_fastapi.tasks import history_buffer as history_buffer_module
+from pera_fastapi.tasks.history_buffer import HistoryBuffer
+
+
+def test_flush_when_full():
+    """
+    Test that the buffer is written once `max_size` records are buffered
+    """
+    written = []
+    buffer = HistoryBuffer(max_size=3, max_age=3600, write=written.append)
+
+    buffer.add({"id": 1})
+    buffer.add({"id": 2})
+    assert written == []
+
+    buffer.add({"id": 3})
+    assert written == [[{"id": 1}, {"id": 2}, {"id": 3}]]
+
+
+def test_flush_when_too_old(monkeypatch):
+    """
+    Test that the buffer is written when its oldest record is `max_age` seconds old
+    """
+    now = [1000.0]
+    monkeypatch.setattr(history_buffer_module.time, "monotonic", lambda: now[0])
+    written = []
+    buffer = HistoryBuffer(max_size=100, max_age=5, write=written.append)
+
+    buffer.add({"id": 1})
+    now[0] += 4
+    buffer.add({"id": 2})
+    assert written == []
+
+    now[0] += 1
+    buffer.add({"id": 3})
+    assert written == [[{"id": 1}, {"id": 2}, {"id": 3}]]
+
+
+def test_age_restarts_after_flush(monkeypatch):
+    """
+    Test that the age of the buffer is counted from the first record added after a flush
+    """
+    now = [1000.0]
+    monkeypatch.setattr(history_buffer_module.time, "monotonic", lambda: now[0])
+    written = []
+    buffer = HistoryBuffer(max_size=100, max_age=5, write=written.append)
+
+    buffer.add({"id": 1})
+    assert buffer.flush() == 1
+    now[0] += 10
+    buffer.add({"id": 2})
+    assert written == [[{"id": 1}]]
+
+
+def test_failed_write_keeps_the_records():
+    """
+    Test that records are kept for the next flush when the write fails
+    """
+    calls = []
+
+    def write(rows):
+        calls.append(list(rows))
+        if len(calls) == 1:
+            raise ConnectionError("database down")
+
+    buffer = HistoryBuffer(max_size=100, max_age=3600, write=write)
+    buffer.add({"id": 1})
+    assert buffer.flush() == 0
+
+    buffer.add({"id": 2})
+    assert buffer.flush() == 2
+    assert calls[-1] == [{"id": 1}, {"id": 2}]
+    assert buffer.flush() == 0
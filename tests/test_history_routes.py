@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Response
+
+from pera_fastapi.routes.history_routes import get_all_histories, get_history_account, get_history_group_senders
+from pera_fastapi.routes.pagination import MAX_PAGE_SIZE, encode_cursor
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    """ Returns the given rows for any query and keeps the queries it received """
+
+    def __init__(self, ids):
+        self.rows = [SimpleNamespace(id=id_value) for id_value in ids]
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.rows)
+
+
+def test_history_list_is_capped():
+    """
+    Test that the list endpoints return `limit` histories and the cursor of the next page in a header
+    """
+    db = FakeSession([9, 8, 7])
+    response = Response()
+
+    histories = asyncio.run(get_history_account(5, db, response, limit=2))
+
+    assert [history.id for history in histories] == [9, 8]
+    assert response.headers["X-Next-Cursor"] == encode_cursor(8)
+    assert "X-Prev-Cursor" not in response.headers
+    statement = db.statements[0].compile()
+    assert "history.id_account = " in str(statement)
+    assert 3 in statement.params.values()
+
+
+def test_history_list_limit_has_a_maximum():
+    """
+    Test that a limit above the page maximum is refused
+    """
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_history_group_senders(5, FakeSession([]), Response(), limit=MAX_PAGE_SIZE + 1))
+    assert error.value.status_code == 400
+
+
+def test_empty_history_list():
+    """
+    Test that an empty first page is a 404, and an empty later page an empty list
+    """
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_all_histories(FakeSession([]), [], Response()))
+    assert error.value.status_code == 404
+
+    assert asyncio.run(get_all_histories(FakeSession([]), [], Response(), after=encode_cursor(1))) == []
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+from telethon.tl.types import MessageEntityBold, MessageEntityTextUrl
+
+from pera_fastapi.cache_keys import message_key
+from pera_fastapi.redis_client import r
+from pera_fastapi.tasks import message_cache
+from pera_fastapi.tasks.message_cache import (
+    MAX_CAPTION_LENGTH,
+    MAX_MESSAGE_LENGTH,
+    MessageParseError,
+    cache_message,
+    get_cached_message,
+    get_message,
+    parse_message,
+)
+
+
+def test_parse_message():
+    """
+    Test that the HTML is split into plain text and entities
+    """
+    parsed = parse_message('<b>Hello</b> <a href="https://example.com">world</a>')
+
+    assert parsed.text == "Hello world"
+    assert [type(entity) for entity in parsed.entities] == [MessageEntityBold, MessageEntityTextUrl]
+    assert parsed.entities[1].url == "https://example.com"
+    assert parsed.raw
+    assert parsed.id_media is None
+
+
+def test_parse_message_limits():
+    """
+    Test the empty message and the text and caption length limits
+    """
+    with pytest.raises(MessageParseError):
+        parse_message("<b></b>")
+    assert parse_message("", id_media=7).text == ""
+
+    with pytest.raises(MessageParseError):
+        parse_message("a" * (MAX_MESSAGE_LENGTH + 1))
+    with pytest.raises(MessageParseError):
+        parse_message("a" * (MAX_CAPTION_LENGTH + 1), id_media=7)
+
+
+def test_cached_message_round_trip(redis_server):
+    """
+    Test that a parsed message reads back from the cache unchanged
+    """
+    id_group_senders = -random.randint(1, 10 ** 9)
+    parsed = parse_message('<b>Hello</b> <a href="https://example.com">world</a>', id_media=7)
+    try:
+        cache_message(id_group_senders, parsed)
+        cached = get_cached_message(id_group_senders)
+    finally:
+        r.delete(message_key(id_group_senders))
+
+    assert cached == parsed
+    assert get_cached_message(id_group_senders) is None
+
+
+def test_get_message_reads_the_cache_first(monkeypatch):
+    """
+    Test that a cached message is used even when the caller passes the HTML, without reading the database
+    """
+    cached = parse_message("<b>cached</b>", id_media=7)
+    monkeypatch.setattr(message_cache, "get_cached_message", lambda id_group_senders: cached)
+    monkeypatch.setattr(message_cache.worker_db, "get_group_senders_message", pytest.fail)
+
+    assert get_message(1, "<b>cached</b>") is cached
+
+
+def test_get_message_parses_and_caches_on_a_miss(monkeypatch):
+    """
+    Test that a miss parses the stored message with its media file and caches it
+    """
+    stored = []
+    monkeypatch.setattr(message_cache, "get_cached_message", lambda id_group_senders: None)
+    monkeypatch.setattr(message_cache.worker_db, "get_group_senders_message", lambda id_group_senders: ("<b>stored</b>", 7))
+    monkeypatch.setattr(message_cache, "cache_message", lambda id_group_senders, parsed: stored.append((id_group_senders, parsed)))
+
+    parsed = get_message(1, "<b>stored</b>")
+
+    assert (parsed.text, parsed.id_media) == ("stored", 7)
+    assert stored == [(1, parsed)]
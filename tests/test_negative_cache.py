@@ -0,0 +1,52 @@
+import pytest
+from telethon.errors.rpcerrorlist import (
+    ChannelInvalidError,
+    ChannelPrivateError,
+    ChatIdInvalidError,
+    ChatWriteForbiddenError,
+    PeerIdInvalidError,
+    UserBannedInChannelError,
+    UsernameNotOccupiedError,
+)
+
+from pera_fastapi.tasks.negative_cache import PERMANENT, TRANSIENT, classify, is_stale_peer
+
+
+@pytest.mark.parametrize("error, expected", [
+    (ChatIdInvalidError(request=None), (PERMANENT, False)),
+    (UsernameNotOccupiedError(request=None), (PERMANENT, False)),
+    (ChannelPrivateError(request=None), (PERMANENT, True)),
+    (UserBannedInChannelError(request=None), (PERMANENT, True)),
+    (ChatWriteForbiddenError(request=None), (TRANSIENT, True)),
+    (ChannelInvalidError(request=None), (TRANSIENT, True)),
+    (PeerIdInvalidError(request=None), (TRANSIENT, True)),
+    (ValueError('No user has "somegroup" as username'), (TRANSIENT, True)),
+    (ValueError("Cannot find any entity corresponding to \"somegroup\""), (TRANSIENT, True)),
+])
+def test_classify(error, expected):
+    """
+    Test the kind and the scope of the cached send errors
+    """
+    assert classify(error) == expected
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("invalid literal for int()"),
+    ConnectionError("network down"),
+    RuntimeError("unexpected"),
+])
+def test_classify_ignores_other_errors(error):
+    """
+    Test that errors saying nothing about the group are not cached
+    """
+    assert classify(error) is None
+
+
+def test_stale_peer():
+    """
+    Test that only invalid peers and unresolved entities are retried after dropping the cached peer
+    """
+    assert is_stale_peer(PeerIdInvalidError(request=None))
+    assert is_stale_peer(ValueError("Cannot find any entity corresponding to \"somegroup\""))
+    assert not is_stale_peer(ChatIdInvalidError(request=None))
+    assert not is_stale_peer(ValueError("invalid literal for int()"))
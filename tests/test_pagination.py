@@ -0,0 +1,137 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from pera_fastapi.models import models
+from pera_fastapi.routes.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, keyset_page
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    """ Returns the given rows for any query and keeps the queries it received """
+
+    def __init__(self, ids):
+        self.rows = [SimpleNamespace(id=id_value) for id_value in ids]
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.rows)
+
+
+def page(db, limit, after=None, before=None):
+    return asyncio.run(keyset_page(db, select(models.Tasks), models.Tasks.id, limit, after, before))
+
+
+def ids(result):
+    return [row.id for row in result["items"]]
+
+
+def test_cursor_round_trip():
+    """
+    Test that a cursor decodes back to its ID
+    """
+    for id_value in (1, 42, 2 ** 40):
+        assert decode_cursor(encode_cursor(id_value)) == id_value
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "aWQ6eA", "eDox", 42, None, ["aWQ6MQ"]])
+def test_invalid_cursor(cursor):
+    """
+    Test that a malformed, foreign or non-string cursor is a 400
+    """
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_invalid_page_arguments():
+    """
+    Test that both cursors at once and a limit out of range are a 400
+    """
+    for kwargs in (
+        {"limit": 10, "after": encode_cursor(1), "before": encode_cursor(2)},
+        {"limit": 0},
+        {"limit": MAX_PAGE_SIZE + 1},
+    ):
+        with pytest.raises(HTTPException) as error:
+            page(FakeSession([]), **kwargs)
+        assert error.value.status_code == 400
+
+
+def test_first_page():
+    """
+    Test that the first page reads one row more than the limit to know whether a next page exists
+    """
+    db = FakeSession([5, 4, 3])
+    result = page(db, 2)
+
+    assert ids(result) == [5, 4]
+    assert result["next_cursor"] == encode_cursor(4)
+    assert result["prev_cursor"] is None
+    statement = db.statements[0].compile()
+    assert "ORDER BY tasks.id DESC" in str(statement)
+    assert 3 in statement.params.values()
+
+
+def test_last_page_after_a_cursor():
+    """
+    Test that a page after a cursor has a previous page and, when short, no next page
+    """
+    db = FakeSession([5, 4])
+    result = page(db, 2, after=encode_cursor(6))
+
+    assert ids(result) == [5, 4]
+    assert result["next_cursor"] is None
+    assert result["prev_cursor"] == encode_cursor(5)
+    statement = db.statements[0].compile()
+    assert "tasks.id < " in str(statement)
+    assert 6 in statement.params.values()
+
+
+def test_page_before_a_cursor():
+    """
+    Test that a page before a cursor is read in reverse and returned newest first
+    """
+    db = FakeSession([4, 5, 6])
+    result = page(db, 2, before=encode_cursor(3))
+
+    assert ids(result) == [5, 4]
+    assert result["next_cursor"] == encode_cursor(4)
+    assert result["prev_cursor"] == encode_cursor(5)
+    statement = db.statements[0].compile()
+    assert "tasks.id > " in str(statement)
+    assert "ORDER BY tasks.id ASC" in str(statement)
+
+
+def test_first_page_reached_backward():
+    """
+    Test that going back to the first page gives no previous cursor
+    """
+    result = page(FakeSession([5, 6]), 2, before=encode_cursor(4))
+
+    assert ids(result) == [6, 5]
+    assert result["prev_cursor"] is None
+    assert result["next_cursor"] == encode_cursor(5)
+
+
+def test_empty_page():
+    """
+    Test that an empty page has no cursors
+    """
+    result = page(FakeSession([]), 10, after=encode_cursor(1))
+
+    assert result == {"items": [], "next_cursor": None, "prev_cursor": None}
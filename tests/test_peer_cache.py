@@ -0,0 +1,63 @@
+import uuid
+
+import pytest
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+from pera_fastapi.tasks.peer_cache import cache_peer, get_cached_peer, invalidate_peer, resolve_peer
+
+
+@pytest.fixture
+def id_account(redis_server):
+    """
+    Give an account ID of its own and delete its cached peers after the test
+    """
+    id_account = f"test-{uuid.uuid4().hex}"
+    yield id_account
+    keys = list(redis_server.scan_iter(f"pera:peer:{id_account}:*"))
+    if keys:
+        redis_server.delete(*keys)
+
+
+class FakeClient:
+    def __init__(self, entity):
+        self.entity = entity
+        self.resolved = []
+
+    def get_entity(self, group_name):
+        self.resolved.append(group_name)
+        return self.entity
+
+
+@pytest.mark.parametrize("peer", [
+    InputPeerChannel(1001, 555),
+    InputPeerChat(1002),
+    InputPeerUser(1003, 777),
+])
+def test_cached_peer_round_trip(id_account, peer):
+    """
+    Test that every kind of peer reads back from the cache unchanged
+    """
+    cache_peer(id_account, "SomeGroup", peer)
+
+    assert get_cached_peer(id_account, "somegroup") == peer
+
+
+def test_invalidate_peer(id_account):
+    """
+    Test that an invalidated peer is a cache miss
+    """
+    cache_peer(id_account, "somegroup", InputPeerChannel(1001, 555))
+    invalidate_peer(id_account, "somegroup")
+
+    assert get_cached_peer(id_account, "somegroup") is None
+
+
+def test_resolve_peer_resolves_once(id_account):
+    """
+    Test that a group is resolved by Telegram once and then read from the cache
+    """
+    client = FakeClient(InputPeerChannel(1001, 555))
+
+    assert resolve_peer(client, id_account, "somegroup") == InputPeerChannel(1001, 555)
+    assert resolve_peer(client, id_account, "somegroup") == InputPeerChannel(1001, 555)
+    assert client.resolved == ["somegroup"]
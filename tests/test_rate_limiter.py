@@ -0,0 +1,100 @@
+import uuid
+
+import pytest
+
+from pera_fastapi.redis_client import r
+from pera_fastapi.settings import settings
+from pera_fastapi.tasks.rate_limiter import RATE_LIMIT_KEY_PREFIX, STATE_TTL, rate_limiter
+
+
+@pytest.fixture
+def bucket_keys(redis_server):
+    """
+    Give unique bucket keys and delete them after the test
+    """
+    prefix = f"{RATE_LIMIT_KEY_PREFIX}test:{uuid.uuid4().hex}:"
+    keys = [f"{prefix}{i}" for i in range(2)]
+    yield keys
+    r.delete(*keys)
+
+
+def take(keys, *buckets):
+    args = [STATE_TTL]
+    for rate, capacity in buckets:
+        args += [rate, capacity]
+    return float(rate_limiter._take_tokens(keys=keys, args=args))
+
+
+def redis_now():
+    seconds, microseconds = r.time()
+    return seconds + microseconds / 1000000
+
+
+def test_full_bucket_grants_its_burst_then_waits(bucket_keys):
+    """
+    Test that a new bucket grants `capacity` tokens and then asks to wait for the next one
+    """
+    assert take(bucket_keys[:1], (1, 2)) == 0
+    assert take(bucket_keys[:1], (1, 2)) == 0
+    wait = take(bucket_keys[:1], (1, 2))
+    assert 0 < wait <= 1
+
+
+def test_empty_bucket_refills_at_its_rate(bucket_keys):
+    """
+    Test that the wait of an empty bucket is what is missing of a token at the bucket rate
+    """
+    r.hset(bucket_keys[0], mapping={"tokens": 0.5, "ts": redis_now()})
+    wait = take(bucket_keys[:1], (0.5, 1))
+    assert 0.9 <= wait <= 1
+
+
+def test_refill_is_capped_at_the_capacity(bucket_keys):
+    """
+    Test that a bucket idle for a long time only holds `capacity` tokens
+    """
+    r.hset(bucket_keys[0], mapping={"tokens": 0, "ts": redis_now() - 3600})
+    assert take(bucket_keys[:1], (1, 2)) == 0
+    assert float(r.hget(bucket_keys[0], "tokens")) == pytest.approx(1, abs=0.01)
+
+
+def test_tokens_are_taken_from_every_bucket_or_none(bucket_keys):
+    """
+    Test that an empty group bucket does not consume a token of the account bucket
+    """
+    r.hset(bucket_keys[1], mapping={"tokens": 0, "ts": redis_now()})
+    wait = take(bucket_keys, (1, 5), (0.1, 1))
+    assert 9 <= wait <= 10
+    assert not r.exists(bucket_keys[0])
+
+
+def test_factor_is_clamped(bucket_keys, monkeypatch):
+    """
+    Test that the adaptive factor stays between the minimum factor and 1
+    """
+    monkeypatch.setattr(settings, "rate_limit_min_factor", 0.25)
+    id_account = f"test:{uuid.uuid4().hex}"
+    key = rate_limiter._key("factor", id_account)
+    try:
+        assert rate_limiter._change_factor(id_account, "add", 0.5) == 1
+        assert not r.exists(key)
+        assert rate_limiter._change_factor(id_account, "mul", 0.5) == 0.5
+        assert rate_limiter._change_factor(id_account, "mul", 0.1) == 0.25
+        assert rate_limiter._change_factor(id_account, "add", 2) == 1
+    finally:
+        r.delete(key)
+
+
+def test_acquire_sleeps_until_granted(monkeypatch):
+    """
+    Test that acquire sleeps for every wait returned by reserve and returns their sum
+    """
+    waits = iter([0.5, 0.25, 0])
+    recorded = []
+    slept = []
+    monkeypatch.setattr(rate_limiter, "reserve", lambda *args: next(waits))
+    monkeypatch.setattr(rate_limiter, "_record_wait", lambda id_account, waited: recorded.append(waited))
+
+    assert rate_limiter.acquire(1, 2, sleep=slept.append) == 0.75
+    assert slept == [0.5, 0.25]
+    assert recorded == [0.75]
@@ -0,0 +1,66 @@
+import asyncio
+
+from sqlalchemy.dialects import mysql
+
+from pera_fastapi.rollups import rollup_batch, rollup_history
+from pera_fastapi.settings import settings
+
+
+class FakeSession:
+    """ Database session answering the scalar queries in order and recording the MySQL statements """
+
+    def __init__(self, *scalars):
+        self.scalars = list(scalars)
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=mysql.dialect())))
+
+    async def scalar(self, statement):
+        self.statements.append(str(statement.compile(dialect=mysql.dialect())))
+        return self.scalars.pop(0)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_rollup_batch_stops_before_young_rows():
+    """
+    Test that the batch is cut on inserted_at before the first young row and moves the watermark in one commit
+    """
+    # Watermark, first young row, last ID of the batch.
+    db = FakeSession(100, 180, 150)
+
+    assert asyncio.run(rollup_batch(db, 500)) == {"from_id": 101, "to_id": 150}
+
+    young, batch = db.statements[2], db.statements[3]
+    assert "FOR UPDATE" in db.statements[1]
+    assert "history.inserted_at >=" in young
+    assert f"NOW() - INTERVAL {int(settings.rollup_lag)} SECOND" in young
+    assert "created_at" not in young
+    assert "history.id <" in batch
+    assert "ON DUPLICATE KEY UPDATE" in db.statements[4]
+    assert db.statements[5].startswith("UPDATE rollup_watermarks")
+    assert db.commits == 1
+
+
+def test_rollup_batch_up_to_date():
+    """
+    Test that nothing is written when no history row is past the watermark
+    """
+    db = FakeSession(100, None, None)
+
+    assert asyncio.run(rollup_batch(db, 500)) is None
+    assert not any("history_rollups" in statement for statement in db.statements)
+    assert db.commits == 1
+
+
+def test_rollup_history_runs_batches_until_up_to_date():
+    """
+    Test that the batches go on until the rollups are up to date and report the watermark
+    """
+    db = FakeSession(0, None, 10, 10, None, 20, 20, None, None)
+
+    assert asyncio.run(rollup_history(db, 10)) == {"batches": 2, "last_id": 20}
+    assert db.commits == 3
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from pera_fastapi.tasks.scheduler import next_run_after
+
+
+def test_next_run_on_the_grid():
+    """
+    Test that a run dispatched on time schedules the next one an interval later
+    """
+    next_run_at = datetime(2026, 1, 1, 12, 0)
+    now = next_run_at + timedelta(seconds=5)
+
+    assert next_run_after(next_run_at, 3600, now) == datetime(2026, 1, 1, 13, 0)
+
+
+def test_missed_runs_are_skipped():
+    """
+    Test that a schedule that fell behind runs an interval after now instead of catching up
+    """
+    next_run_at = datetime(2026, 1, 1, 12, 0)
+    now = datetime(2026, 1, 1, 15, 30)
+
+    assert next_run_after(next_run_at, 3600, now) == now + timedelta(hours=1)
+
+
+def test_next_run_exactly_now_is_skipped():
+    """
+    Test that the next run is always after now
+    """
+    next_run_at = datetime(2026, 1, 1, 12, 0)
+    now = next_run_at + timedelta(hours=1)
+
+    assert next_run_after(next_run_at, 3600, now) == now + timedelta(hours=1)
+
+
+def test_interval_is_at_least_one_second():
+    """
+    Test that a zero or negative interval cannot schedule the run in the past
+    """
+    now = datetime(2026, 1, 1, 12, 0)
+
+    assert next_run_after(now, 0, now) == now + timedelta(seconds=1)
+    assert next_run_after(now, -60, now) == now + timedelta(seconds=1)
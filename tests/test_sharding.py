@@ -0,0 +1,40 @@
+from pera_fastapi.tasks.sharding import split_groups
+
+
+def groups(count):
+    return [{"id_group": i, "name": f"group{i}"} for i in range(count)]
+
+
+def test_split_in_proportion_to_the_weights():
+    """
+    Test that every shard gets its share of the groups, in order and without overlap
+    """
+    shards = split_groups(groups(10), [3, 1, 1])
+
+    assert [len(shard) for shard in shards] == [6, 2, 2]
+    assert [group for shard in shards for group in shard] == groups(10)
+
+
+def test_largest_remainders_get_the_leftover_groups():
+    """
+    Test that the rounded sizes add up to the number of groups
+    """
+    assert [len(shard) for shard in split_groups(groups(10), [1, 1, 1])] == [4, 3, 3]
+    assert [len(shard) for shard in split_groups(groups(7), [0.5, 0.3, 0.2])] == [4, 2, 1]
+
+
+def test_more_shards_than_groups():
+    """
+    Test that extra shards are empty
+    """
+    shards = split_groups(groups(2), [1, 1, 1, 1])
+
+    assert sum(len(shard) for shard in shards) == 2
+    assert shards.count([]) == 2
+
+
+def test_zero_weights_split_evenly():
+    """
+    Test that accounts without a measured rate share the groups evenly
+    """
+    assert [len(shard) for shard in split_groups(groups(6), [0, 0, 0])] == [2, 2, 2]
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+import uuid
+
+import pytest
+from redis import asyncio as aioredis
+
+from pera_fastapi.redis_client import redis_url
+from pera_fastapi.tasks.stop_flag import CampaignStopped, StopFlag, _keys, request_stop
+
+
+def stop(task_id):
+    async def run():
+        redis = aioredis.from_url(redis_url, decode_responses=True)
+        try:
+            await request_stop(redis, task_id)
+        finally:
+            await redis.close()
+
+    asyncio.run(run())
+
+
+def test_stop_wakes_every_sleeper(redis_server):
+    """
+    Test that a stop interrupts every wait on the chain, not only the first one
+    """
+    task_id = f"test-{uuid.uuid4().hex}"
+    stopped_after = []
+
+    def sleeper():
+        started = time.monotonic()
+        try:
+            StopFlag(task_id).sleep(30)
+        except CampaignStopped:
+            stopped_after.append(time.monotonic() - started)
+
+    threads = [threading.Thread(target=sleeper) for _ in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        stop(task_id)
+        for thread in threads:
+            thread.join(timeout=5)
+    finally:
+        redis_server.delete(*_keys(task_id))
+
+    assert len(stopped_after) == 2
+    assert max(stopped_after) < 2
+
+
+def test_sleep_without_stop(redis_server):
+    """
+    Test that a wait without a stop lasts its full time
+    """
+    started = time.monotonic()
+    StopFlag(f"test-{uuid.uuid4().hex}").sleep(0.3)
+
+    assert time.monotonic() - started >= 0.3
+
+
+def test_stopped_chain_does_not_sleep(redis_server):
+    """
+    Test that a wait raises at once when the chain is already stopped
+    """
+    task_id = f"test-{uuid.uuid4().hex}"
+    stop(task_id)
+    try:
+        started = time.monotonic()
+        with pytest.raises(CampaignStopped):
+            StopFlag(task_id).sleep(30)
+        assert time.monotonic() - started < 1
+    finally:
+        redis_server.delete(*_keys(task_id))
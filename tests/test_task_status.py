@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from pera_fastapi.models.queries import finish_group_sender
+from pera_fastapi.models.schemas import TaskStatusByKeyBase
+from pera_fastapi.routes.tasks_router import update_task_status
+
+
+class FakeSession:
+    """ Answers every statement with the given row count and records the statements and the commits """
+
+    def __init__(self, rowcount=1):
+        self.rowcount = rowcount
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile()))
+        return SimpleNamespace(rowcount=self.rowcount)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def test_status_update_is_a_single_update():
+    """
+    Test that a status update by group sender runs one UPDATE, without reading the task first
+    """
+    db = FakeSession()
+    response = asyncio.run(update_task_status(TaskStatusByKeyBase(id_group_sender=5, status="stopped"), db))
+
+    assert response.status_code == 200
+    assert len(db.statements) == 1
+    assert db.statements[0].startswith("UPDATE tasks")
+    assert "tasks.id_group_sender = " in db.statements[0]
+    assert db.commits == 1
+
+
+@pytest.mark.parametrize("task_update", [
+    TaskStatusByKeyBase(status="stopped"),
+    TaskStatusByKeyBase(task_id="task-1", id_group_sender=5, status="stopped"),
+])
+def test_status_update_needs_exactly_one_key(task_update):
+    """
+    Test that the task must be selected by task ID or by group sender, not both or neither
+    """
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(update_task_status(task_update, FakeSession()))
+    assert error.value.status_code == 400
+
+
+def test_status_update_of_a_missing_task():
+    """
+    Test that updating no row is a 404 and is rolled back
+    """
+    db = FakeSession(rowcount=0)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(update_task_status(TaskStatusByKeyBase(task_id="task-1", status="stopped"), db))
+
+    assert error.value.status_code == 404
+    assert (db.commits, db.rollbacks) == (0, 1)
+
+
+def test_finish_campaign_in_one_transaction():
+    """
+    Test that finishing a campaign updates the group sender, the account and the tasks with one commit
+    """
+    db = FakeSession()
+
+    assert asyncio.run(finish_group_sender(5, "success", db, id_account=3))
+    assert [statement.split()[1] for statement in db.statements] == ["group_senders", "accounts", "tasks"]
+    assert db.commits == 1
+
+
+def test_finish_missing_campaign():
+    """
+    Test that finishing a missing group sender changes nothing
+    """
+    db = FakeSession(rowcount=0)
+
+    assert not asyncio.run(finish_group_sender(5, "success", db))
+    assert len(db.statements) == 1
+    assert (db.commits, db.rollbacks) == (0, 1)
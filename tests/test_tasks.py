@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+from pera_fastapi.tasks import tasks
+from pera_fastapi.tasks.tasks import send_messages_simple
+
+ACCOUNT = {"id": 3, "telegram_id": 123, "telegram_hash": "hash", "phone": "+100"}
+GROUPS = [{"id_group": 1, "name": "group1"}, {"id_group": 2, "name": "group2"}]
+
+
+class FakeProgress:
+    """ Checkpoint of a new cycle, recording the calls of the task """
+
+    def __init__(self, *args):
+        self.calls = []
+
+    def start_cycle(self, cycle, state):
+        self.calls.append("start")
+        return SimpleNamespace(closed=False, done=False, sent=set())
+
+    def mark_done(self):
+        self.calls.append("done")
+
+    def mark_closed(self):
+        self.calls.append("closed")
+
+
+@pytest.fixture
+def cycle(monkeypatch):
+    """
+    Run one cycle of a campaign chain without Redis, Telegram or the broker
+    """
+    progress = FakeProgress()
+    published = []
+    finished = []
+    stopped = []
+    monkeypatch.setattr(tasks, "CampaignProgress", lambda *args: progress)
+    monkeypatch.setattr(tasks, "StopFlag", lambda task_id: SimpleNamespace(is_set=lambda: False, task_id=task_id))
+    monkeypatch.setattr(tasks, "Sender_simple", lambda *args, **kwargs: None)
+    monkeypatch.setattr(tasks.time, "sleep", pytest.fail)
+    monkeypatch.setattr(send_messages_simple, "apply_async", lambda *args, **kwargs: published.append(kwargs))
+    monkeypatch.setattr(tasks.worker_db, "finish_campaign", lambda *args: finished.append(args))
+    monkeypatch.setattr(tasks.worker_db, "stop_chain", lambda *args: stopped.append(args))
+
+    def run(max_executions, period=600):
+        send_messages_simple.push_request(id="task-1")
+        try:
+            send_messages_simple.run(ACCOUNT, max_executions, "", GROUPS, 5, period)
+        finally:
+            send_messages_simple.pop_request()
+
+    return SimpleNamespace(run=run, progress=progress, published=published, finished=finished, stopped=stopped)
+
+
+def test_next_cycle_is_published_with_a_countdown(cycle):
+    """
+    Test that a cycle publishes the next one under the same task ID instead of sleeping for the period
+    """
+    cycle.run(3, period=600)
+
+    assert len(cycle.published) == 1
+    assert cycle.published[0]["task_id"] == "task-1"
+    assert cycle.published[0]["countdown"] == 600
+    assert cycle.published[0]["args"][1] == 2
+    assert cycle.progress.calls == ["start", "done", "closed"]
+    assert cycle.finished == []
+
+
+def test_last_cycle_finishes_the_campaign(cycle):
+    """
+    Test that the last execution finishes the campaign and publishes nothing
+    """
+    cycle.run(1)
+
+    assert cycle.published == []
+    assert cycle.finished == [(5, tasks.StatusTasks.success.value)]
+    assert cycle.progress.calls == ["start", "done", "closed"]
+
+
+def test_failed_cycle_stays_resumable(cycle, monkeypatch):
+    """
+    Test that a cycle failing part-way stops the chain without marking the cycle as done
+    """
+    def fail(*args, **kwargs):
+        raise ConnectionError("Telegram unreachable")
+
+    monkeypatch.setattr(tasks, "Sender_simple", fail)
+
+    cycle.run(3)
+
+    assert cycle.progress.calls == ["start"]
+    assert cycle.published == []
+    assert cycle.finished == []
+    assert cycle.stopped == [(3, "task-1", tasks.StatusTasks.stopped.value)]